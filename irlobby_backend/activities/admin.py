@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Activity, ActivityParticipant, Ticket, TicketRedemptionLog
+from .models import (
+    Activity,
+    ActivityParticipant,
+    StripeWebhookEvent,
+    Ticket,
+    TicketRedemptionLog,
+    TicketRollup,
+)
+from .signals import activities_approval_changed
 
 
 @admin.register(Activity)
@@ -13,11 +21,15 @@ class ActivityAdmin(admin.ModelAdmin):
 
     @admin.action(description="Approve selected activities")
     def approve_activities(self, request, queryset):
+        points = list(queryset.values_list("latitude", "longitude"))
         queryset.update(is_approved=True)
+        activities_approval_changed.send(sender=Activity, points=points)
 
     @admin.action(description="Reject (unapprove) selected activities")
     def reject_activities(self, request, queryset):
+        points = list(queryset.values_list("latitude", "longitude"))
         queryset.update(is_approved=False)
+        activities_approval_changed.send(sender=Activity, points=points)
 
 
 @admin.register(ActivityParticipant)
@@ -42,3 +54,18 @@ class TicketRedemptionLogAdmin(admin.ModelAdmin):
     search_fields = ("ticket__ticket_id", "host__username")
     list_filter = ("successful", "scanned_at")
     raw_id_fields = ("ticket", "activity", "host")
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "event_type", "received_at", "processed_at", "attempts")
+    search_fields = ("event_id",)
+    list_filter = ("event_type", "processed_at")
+    readonly_fields = ("received_at",)
+
+
+@admin.register(TicketRollup)
+class TicketRollupAdmin(admin.ModelAdmin):
+    list_display = ("activity", "kind", "bucket", "reason", "count")
+    list_filter = ("kind",)
+    raw_id_fields = ("activity",)
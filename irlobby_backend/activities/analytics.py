@@ -0,0 +1,127 @@
+"""Incrementally maintained ticket analytics.
+
+Sales are counted per hour and scans per five minutes in ``TicketRollup`` rows,
+bumped from the purchase and redemption paths as events happen. Reports read
+one activity's rollups in a single indexed query. ``rebuild_ticket_rollups``
+recomputes them from raw rows after a deploy or a data repair.
+"""
+
+from collections import Counter
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+
+from .models import Ticket, TicketRedemptionLog, TicketRollup
+
+SOLD_BUCKET_SECONDS = 3600
+SCAN_BUCKET_SECONDS = 300
+
+FAILURE_ALREADY_USED = "already_used"
+FAILURE_NOT_REDEEMABLE = "not_redeemable"
+
+
+def bucket_start(moment, seconds):
+    timestamp = int(moment.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, tz=dt_timezone.utc)
+
+
+def sold_event(activity_id, purchased_at):
+    return activity_id, "sold", bucket_start(purchased_at, SOLD_BUCKET_SECONDS), ""
+
+
+def scan_event(activity_id, scanned_at, failure_reason=""):
+    kind = "failed" if failure_reason else "redeemed"
+    return activity_id, kind, bucket_start(scanned_at, SCAN_BUCKET_SECONDS), failure_reason
+
+
+def _increment(key, amount):
+    activity_id, kind, bucket, reason = key
+    rollups = TicketRollup.objects.filter(
+        activity_id=activity_id, kind=kind, bucket=bucket, reason=reason
+    )
+    if rollups.update(count=F("count") + amount):
+        return
+    try:
+        with transaction.atomic():
+            TicketRollup.objects.create(
+                activity_id=activity_id, kind=kind, bucket=bucket, reason=reason, count=amount
+            )
+    except IntegrityError:
+        # A concurrent writer created the bucket first.
+        rollups.update(count=F("count") + amount)
+
+
+def record_ticket_events(events):
+    """Add ``events`` (from ``sold_event``/``scan_event``) to their rollup buckets.
+
+    Events sharing a bucket are merged, so a batch costs one UPDATE per bucket.
+    """
+
+    for key, amount in sorted(Counter(events).items()):
+        _increment(key, amount)
+
+
+def ticket_analytics(activity):
+    rollups = TicketRollup.objects.filter(activity=activity).order_by("bucket", "reason")
+    report = {
+        "activityId": activity.id,
+        "sold": {"total": 0, "hourly": []},
+        "redeemed": {"total": 0, "series": []},
+        "failures": {"total": 0, "reasons": {}, "series": []},
+    }
+    sections = {
+        "sold": report["sold"]["hourly"],
+        "redeemed": report["redeemed"]["series"],
+        "failed": report["failures"]["series"],
+    }
+    for kind, bucket, reason, count in rollups.values_list("kind", "bucket", "reason", "count"):
+        section = report["failures" if kind == "failed" else kind]
+        section["total"] += count
+        point = {"bucket": bucket, "count": count}
+        if kind == "failed":
+            section["reasons"][reason] = section["reasons"].get(reason, 0) + count
+            point["reason"] = reason
+        sections[kind].append(point)
+    return report
+
+
+def _failure_reason(message):
+    return FAILURE_ALREADY_USED if "already used" in message else FAILURE_NOT_REDEEMABLE
+
+
+def rebuild_ticket_rollups(activity_ids):
+    """Recompute rollups for ``activity_ids`` from ``Ticket`` and redemption logs."""
+    events = Counter()
+    sold = (
+        Ticket.objects.filter(activity_id__in=activity_ids, purchased_at__isnull=False)
+        .exclude(status__in=["pending", "cancelled"])
+        .annotate(hour=TruncHour("purchased_at"))
+        .values_list("activity_id", "hour")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    for activity_id, hour, total in sold:
+        events[sold_event(activity_id, hour)] += total
+
+    logs = TicketRedemptionLog.objects.filter(activity_id__in=activity_ids).values_list(
+        "activity_id", "scanned_at", "successful", "message"
+    )
+    for activity_id, scanned_at, successful, message in logs.iterator(chunk_size=2000):
+        reason = "" if successful else _failure_reason(message)
+        events[scan_event(activity_id, scanned_at, reason)] += 1
+
+    with transaction.atomic():
+        TicketRollup.objects.filter(activity_id__in=activity_ids).delete()
+        TicketRollup.objects.bulk_create(
+            [
+                TicketRollup(
+                    activity_id=activity_id, kind=kind, bucket=bucket, reason=reason, count=count
+                )
+                for (activity_id, kind, bucket, reason), count in events.items()
+            ],
+            batch_size=1000,
+        )
+    return len(events)
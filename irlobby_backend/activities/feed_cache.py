@@ -0,0 +1,263 @@
+"""Shared tile cache for location-filtered activity feeds.
+
+Nearby users issue nearly identical ``latitude/longitude/radius`` queries. The
+approved candidates for a geohash cell are cached once per (cell, radius,
+filters, time bucket) and every request re-ranks them against its exact point,
+so PostGIS distance work is only paid on a cache miss. Per-user concerns
+(blocked hosts, the user's own unapproved activities) are applied afterwards.
+
+Tile keys carry the versions of the coarse region cells their search area
+touches, so an activity edit only invalidates tiles around that activity.
+"""
+
+import hashlib
+import json
+import math
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+
+FEED_TILE_GEOHASH_PRECISION = 5
+FEED_TILE_TIME_BUCKET_SECONDS = 300
+FEED_TILE_VERSION_CACHE_KEY = "activities:feed_tile_version"
+FEED_TILE_WIDE_VERSION_CACHE_KEY = f"{FEED_TILE_VERSION_CACHE_KEY}:wide"
+# Invalidation granularity: precision 3 cells are roughly 156 x 156 km.
+FEED_TILE_REGION_PRECISION = 3
+FEED_TILE_REGION_MAX_REACH_KM = 300
+EARTH_RADIUS_KM = 6371.0088
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude, longitude, precision=FEED_TILE_GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even_bit = True
+
+    while len(geohash) < precision:
+        value, value_range = (longitude, lng_range) if even_bit else (latitude, lat_range)
+        midpoint = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= midpoint:
+            bits |= 1
+            value_range[0] = midpoint
+        else:
+            value_range[1] = midpoint
+        even_bit = not even_bit
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+def decode_geohash_bounds(geohash):
+    """Return ``(lat_min, lat_max, lng_min, lng_max)`` for a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even_bit = True
+
+    for char in geohash:
+        bits = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even_bit else lat_range
+            midpoint = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = midpoint
+            else:
+                value_range[1] = midpoint
+            even_bit = not even_bit
+
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def _wrap_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def covering_geohashes(latitude, longitude, radius_km, precision=FEED_TILE_GEOHASH_PRECISION):
+    """Return every geohash cell intersecting the radius around a point.
+
+    The bounding box is walked in steps no larger than one cell, so no cell
+    inside it is skipped.
+    """
+
+    if not all(math.isfinite(value) for value in (latitude, longitude, radius_km)):
+        # NaN never reaches the loop bounds below, so the walk would not end.
+        raise ValueError("covering_geohashes() needs finite coordinates and radius.")
+    if radius_km < 0:
+        raise ValueError("covering_geohashes() needs a non-negative radius.")
+
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angular_radius)
+    cos_lat = math.cos(math.radians(latitude))
+    if angular_radius >= math.pi / 2 or cos_lat <= math.sin(angular_radius):
+        lng_delta = 180.0
+    else:
+        lng_delta = math.degrees(math.asin(math.sin(angular_radius) / cos_lat))
+
+    lat_min, lat_max, lng_min, lng_max = decode_geohash_bounds(
+        encode_geohash(latitude, longitude, precision)
+    )
+    cell_height = lat_max - lat_min
+    cell_width = lng_max - lng_min
+
+    cells = set()
+    lat_end = min(latitude + lat_delta, 90.0)
+    lng_start = longitude - lng_delta
+    lng_end = longitude + lng_delta
+    lat = max(latitude - lat_delta, -90.0)
+    while True:
+        lng = lng_start
+        while True:
+            cells.add(encode_geohash(lat, _wrap_longitude(lng), precision))
+            if lng >= lng_end:
+                break
+            lng = min(lng + cell_width, lng_end)
+        if lat >= lat_end:
+            break
+        lat = min(lat + cell_height, lat_end)
+    return sorted(cells)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def feed_tile_cache_enabled():
+    return getattr(settings, "ACTIVITY_FEED_TILE_CACHE_ENABLED", True)
+
+
+def feed_region_cells(latitude, longitude, reach_km):
+    """Return the region cells a tile reaching ``reach_km`` depends on.
+
+    ``None`` means the tile reaches too far to track per region and is keyed
+    by the wide version instead.
+    """
+
+    if reach_km > FEED_TILE_REGION_MAX_REACH_KM:
+        return None
+    # Small margin for PostGIS measuring on the spheroid rather than a sphere.
+    return covering_geohashes(latitude, longitude, reach_km * 1.01, FEED_TILE_REGION_PRECISION)
+
+
+def _region_version_key(cell):
+    return f"{FEED_TILE_VERSION_CACHE_KEY}:{cell}"
+
+
+def get_feed_tile_version(region_cells):
+    """Version tag for a tile: the wide counter, or a digest of its region counters."""
+    if region_cells is None:
+        return f"w{cache.get_or_set(FEED_TILE_WIDE_VERSION_CACHE_KEY, 1, None)}"
+    keys = [_region_version_key(cell) for cell in region_cells]
+    versions = cache.get_many(keys)
+    tag = ",".join(f"{cell}={versions.get(key, 1)}" for cell, key in zip(region_cells, keys))
+    return hashlib.sha1(tag.encode("utf-8"), usedforsecurity=False).hexdigest()[:16]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def bump_feed_tile_versions(points):
+    """Invalidate the tiles that can contain any of the ``(latitude, longitude)`` points.
+
+    Only the region cells holding the points move, plus the wide counter used
+    by tiles too large to track per region; tiles elsewhere stay cached.
+    """
+
+    cells = {
+        encode_geohash(latitude, longitude, FEED_TILE_REGION_PRECISION)
+        for latitude, longitude in points
+    }
+    for cell in sorted(cells):
+        _bump(_region_version_key(cell))
+    _bump(FEED_TILE_WIDE_VERSION_CACHE_KEY)
+
+
+def _filter_hash(filter_params):
+    normalized = json.dumps(sorted(filter_params.items()), separators=(",", ":"))
+    return hashlib.sha1(normalized.encode("utf-8"), usedforsecurity=False).hexdigest()[:16]
+
+
+def feed_tile_key(cell, radius_km, filter_params, region_cells):
+    time_bucket = int(time.time() // FEED_TILE_TIME_BUCKET_SECONDS)
+    return (
+        f"activities:feed_tile:v{get_feed_tile_version(region_cells)}:{cell}:{radius_km:g}:"
+        f"{_filter_hash(filter_params)}:{time_bucket}"
+    )
+
+
+def candidate_rows(queryset):
+    return [
+        (activity_id, host_id, latitude, longitude, created_at.timestamp())
+        for activity_id, host_id, latitude, longitude, created_at in queryset.values_list(
+            "id", "host_id", "latitude", "longitude", "created_at"
+        )
+    ]
+
+
+def get_feed_tile(latitude, longitude, radius_km, filter_params, queryset):
+    """Return cached candidate rows for the geohash cell containing the point.
+
+    ``queryset`` must already be restricted to approved activities and carry
+    the non-geographic filters described by ``filter_params``. On a miss it is
+    searched around the cell centre with the radius widened by the cell's
+    half-diagonal, so every point inside the cell is fully covered.
+    """
+
+    cell = encode_geohash(latitude, longitude)
+    lat_min, lat_max, lng_min, lng_max = decode_geohash_bounds(cell)
+    center_lat = (lat_min + lat_max) / 2
+    center_lng = (lng_min + lng_max) / 2
+    reach_km = radius_km + haversine_km(center_lat, center_lng, lat_max, lng_max)
+
+    cache_key = feed_tile_key(
+        cell, radius_km, filter_params, feed_region_cells(center_lat, center_lng, reach_km)
+    )
+    rows = cache.get(cache_key)
+    if rows is not None:
+        return rows
+
+    center = Point(center_lng, center_lat, srid=4326)
+    rows = candidate_rows(queryset.filter(location_point__dwithin=(center, D(km=reach_km))))
+    cache.set(cache_key, rows, FEED_TILE_TIME_BUCKET_SECONDS)
+    return rows
+
+
+def rank_feed_rows(rows, latitude, longitude, radius_km, exclude_host_ids=()):
+    """Filter candidate rows to the exact radius and order them like the feed.
+
+    Matches the uncached ordering of nearest first, then newest first.
+    """
+
+    ranked = []
+    seen_ids = set()
+    for activity_id, host_id, row_latitude, row_longitude, created_ts in rows:
+        if activity_id in seen_ids or host_id in exclude_host_ids:
+            continue
+        distance_km = haversine_km(latitude, longitude, row_latitude, row_longitude)
+        if distance_km <= radius_km:
+            seen_ids.add(activity_id)
+            ranked.append((distance_km, -created_ts, activity_id))
+    ranked.sort()
+    return [activity_id for _, _, activity_id in ranked]
@@ -0,0 +1,66 @@
+import base64
+import binascii
+
+from django.core.management.base import BaseCommand
+
+from activities.models import Ticket
+from activities.qr import QR_CONTENT_TYPES, store_qr_image
+
+_EXTENSIONS = {content_type: extension for extension, content_type in QR_CONTENT_TYPES.items()}
+
+
+def _decode_data_url(data_url):
+    header, _, encoded = data_url.partition(",")
+    content_type = header.removeprefix("data:").removesuffix(";base64")
+    extension = _EXTENSIONS.get(content_type)
+    if extension is None or not header.endswith(";base64"):
+        return None, None
+    try:
+        return base64.b64decode(encoded, validate=True), extension
+    except (binascii.Error, ValueError):
+        return None, None
+
+
+class Command(BaseCommand):
+    help = "Move inline base64 ticket QR codes into the content-addressed ticket_qr storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        pending = (
+            Ticket.objects.exclude(qr_code_data_url="")
+            .filter(qr_code_image="")
+            .only("id", "qr_code_data_url", "qr_code_image")
+            .order_by("id")
+        )
+
+        migrated = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            updated = []
+            for ticket in batch:
+                content, extension = _decode_data_url(ticket.qr_code_data_url)
+                if content is None:
+                    skipped += 1
+                    self.stderr.write(f"Skipping ticket {ticket.id}: unrecognised QR data URL")
+                    continue
+                if not dry_run:
+                    ticket.qr_code_image = store_qr_image(content, extension)
+                    ticket.qr_code_data_url = ""
+                updated.append(ticket)
+
+            if updated and not dry_run:
+                Ticket.objects.bulk_update(updated, ["qr_code_image", "qr_code_data_url"])
+            migrated += len(updated)
+
+        verb = "Would migrate" if dry_run else "Migrated"
+        self.stdout.write(f"{verb} {migrated} ticket QR codes; skipped {skipped}.")
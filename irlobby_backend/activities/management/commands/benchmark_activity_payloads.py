@@ -0,0 +1,74 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from activities.models import Activity
+from activities.serializers import ActivityCardSerializer, ActivitySerializer
+from users.models import User
+
+
+def build_sample_page(page_size):
+    """Build unsaved activities shaped like a typical feed page."""
+    host = User(id=1, username="benchmark-host", email="benchmark-host@example.com")
+    now = timezone.now()
+    activities = []
+    for index in range(page_size):
+        activity = Activity(
+            id=index + 1,
+            host=host,
+            is_approved=True,
+            title=f"Sunset run #{index}",
+            description="Easy-paced group run along the river, coffee afterwards. " * 6,
+            category="Fitness",
+            location="Riverside Park",
+            latitude=40.7812 + index / 1000,
+            longitude=-73.9665,
+            time=now + timedelta(days=1, hours=index),
+            end_time=now + timedelta(days=1, hours=index + 2),
+            capacity=10,
+            visibility=["everyone"],
+            price=Decimal("0.00"),
+            tags=["running", "outdoors", "social"],
+            images=[f"https://cdn.irlobby.com/activities/{index}/{n}.jpg" for n in range(4)],
+            created_at=now,
+        )
+        activity.confirmed_participant_count = index % 10
+        activities.append(activity)
+    return activities
+
+
+class Command(BaseCommand):
+    help = "Measure serialization time and payload size of one activity feed page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        iterations = options["iterations"]
+        activities = build_sample_page(page_size)
+        renderer = JSONRenderer()
+
+        self.stdout.write(f"page_size={page_size} iterations={iterations}")
+        for label, serializer_class in [
+            ("full", ActivitySerializer),
+            ("compact", ActivityCardSerializer),
+        ]:
+            timings = []
+            payload = b""
+            for _ in range(iterations):
+                started = time.perf_counter()
+                payload = renderer.render(serializer_class(activities, many=True).data)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f"{label:8} median_ms={statistics.median(timings):.3f} "
+                f"p95_ms={sorted(timings)[int(len(timings) * 0.95) - 1]:.3f} "
+                f"bytes={len(payload)}"
+            )
@@ -0,0 +1,36 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from activities.models import Ticket
+from activities.qr import render_qr_png, render_qr_svg
+
+
+class Command(BaseCommand):
+    help = "Measure QR render cost per ticket for PNG and SVG"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tickets", type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = options["tickets"]
+        payloads = [
+            Ticket(ticket_id=uuid.uuid4(), activity_id=index + 1).get_qr_token()
+            for index in range(total)
+        ]
+        self.stdout.write(f"tickets={total} payload_bytes={len(payloads[0])}")
+
+        for label, render in [("png", render_qr_png), ("svg", render_qr_svg)]:
+            timings, sizes = [], []
+            for payload in payloads:
+                started = time.perf_counter()
+                content = render(payload)
+                timings.append((time.perf_counter() - started) * 1000)
+                sizes.append(len(content))
+            self.stdout.write(
+                f"{label}  median_ms={statistics.median(timings):.3f} "
+                f"p95_ms={sorted(timings)[int(len(timings) * 0.95) - 1]:.3f} "
+                f"mean_bytes={statistics.mean(sizes):,.0f}"
+            )
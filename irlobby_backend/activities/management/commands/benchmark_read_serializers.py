@@ -0,0 +1,96 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from activities.management.commands.benchmark_activity_payloads import build_sample_page
+from activities.models import Ticket
+from activities.serializers import ActivitySerializer, TicketSerializer
+from chat.models import Message
+from chat.serializers import MessageSerializer
+from matches.models import Match
+from matches.serializers import MatchSerializer
+from users.models import User
+from utils.fast_serializers import FastReadSerializer
+
+
+def build_sample_rows(page_size):
+    """Build unsaved rows for every hot list serializer."""
+    activities = build_sample_page(page_size)
+    guest = User(id=2, username="benchmark-guest", email="benchmark-guest@example.com")
+    host = activities[0].host
+    now = timezone.now()
+
+    tickets = [
+        Ticket(
+            id=index + 1,
+            ticket_id=uuid.uuid4(),
+            activity=activity,
+            buyer=guest,
+            status="paid",
+            purchased_at=now,
+            qr_code_image="ab/" + "ab" * 32 + ".png",
+            created_at=now,
+        )
+        for index, activity in enumerate(activities)
+    ]
+    matches = [
+        Match(id=index + 1, activity=activity, user_a=host, user_b=guest, created_at=now)
+        for index, activity in enumerate(activities)
+    ]
+    messages = [
+        Message(
+            id=index + 1,
+            sender=host if index % 2 else guest,
+            text=f"See you at the river at {index % 12 + 1}pm?",
+            created_at=now,
+        )
+        for index in range(page_size)
+    ]
+    return [
+        ("activity", ActivitySerializer, activities),
+        ("ticket", TicketSerializer, tickets),
+        ("match", MatchSerializer, matches),
+        ("message", MessageSerializer, messages),
+    ]
+
+
+def _median_ms(callback, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        callback()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = "Compare DRF and fast read-path serialization throughput for hot list endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        page_size = options["page_size"]
+        iterations = options["iterations"]
+        renderer = JSONRenderer()
+
+        self.stdout.write(f"page_size={page_size} iterations={iterations}")
+        for label, serializer_class, rows in build_sample_rows(page_size):
+            expected = renderer.render(serializer_class(rows, many=True).data)
+            actual = renderer.render(FastReadSerializer(serializer_class()).serialize_many(rows))
+            if actual != expected:
+                raise CommandError(f"{label}: fast serializer output differs from DRF")
+
+            drf_ms = _median_ms(lambda: serializer_class(rows, many=True).data, iterations)
+            fast_ms = _median_ms(
+                lambda: FastReadSerializer(serializer_class()).serialize_many(rows), iterations
+            )
+            self.stdout.write(
+                f"{label:8} drf_ms={drf_ms:.3f} fast_ms={fast_ms:.3f} "
+                f"rows_per_s={page_size / fast_ms * 1000:,.0f} speedup={drf_ms / fast_ms:.2f}x"
+            )
@@ -0,0 +1,87 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import stripe
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from activities.models import Activity, Ticket
+from activities.payments import create_checkout_session
+from activities.stripe_stub import StripeStubServer
+
+
+def _legacy_create(activity, ticket, success_url, cancel_url):
+    # The pre-pooling call shape: global api key and the module-level client.
+    stripe.api_key = "sk_test_stub"
+    return stripe.checkout.Session.create(
+        payment_method_types=["card"],
+        mode="payment",
+        line_items=[
+            {
+                "price_data": {
+                    "currency": activity.currency.lower(),
+                    "product_data": {"name": f"Ticket for {activity.title}"},
+                    "unit_amount": int(activity.ticket_price * 100),
+                },
+                "quantity": 1,
+            }
+        ],
+        metadata={"ticket_id": str(ticket.ticket_id), "activity_id": str(activity.id)},
+        success_url=success_url,
+        cancel_url=cancel_url,
+    )
+
+
+class Command(BaseCommand):
+    help = "Measure checkout session latency and worker occupancy against a local Stripe stub"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--latency-ms", type=float, default=50.0)
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        workers = options["workers"]
+        activity = Activity(id=1, title="Benchmark", description="", ticket_price=10)
+        ticket = Ticket(
+            ticket_id=uuid.uuid4(),
+            activity=activity,
+            reserved_until=timezone.now() + timedelta(minutes=31),
+        )
+
+        self.stdout.write(
+            f"requests={total} workers={workers} stub_latency_ms={options['latency_ms']:g}"
+        )
+        for label, create in [("legacy", _legacy_create), ("pooled", create_checkout_session)]:
+            with StripeStubServer(latency=options["latency_ms"] / 1000) as stub:
+                previous_api_base = stripe.api_base
+                stripe.api_base = stub.url
+                try:
+                    with override_settings(STRIPE_API_BASE=stub.url, STRIPE_API_KEY="sk_test_stub"):
+                        timings, elapsed = self._run(create, activity, ticket, total, workers)
+                finally:
+                    stripe.api_base = previous_api_base
+
+                occupancy = sum(timings) / 1000 / (elapsed * workers)
+                self.stdout.write(
+                    f"{label:7} median_ms={statistics.median(timings):.2f} "
+                    f"p95_ms={sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} "
+                    f"throughput={total / elapsed:,.0f}/s occupancy={occupancy:.0%} "
+                    f"connections={stub.connection_count}"
+                )
+
+    def _run(self, create, activity, ticket, total, workers):
+        def call(_):
+            started = time.perf_counter()
+            create(activity, ticket, "http://localhost/success", "http://localhost/cancel")
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            timings = list(executor.map(call, range(total)))
+        return timings, time.perf_counter() - started
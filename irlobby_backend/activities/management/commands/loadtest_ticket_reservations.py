@@ -0,0 +1,81 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from activities.models import Activity, Ticket
+from activities.reservations import create_ticket_hold
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Race concurrent buyers for a limited ticket drop against the configured database "
+        "and verify that holds never exceed inventory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=500)
+        parser.add_argument("--max-tickets", type=int, default=50)
+        parser.add_argument("--workers", type=int, default=32)
+
+    def handle(self, *args, **options):
+        buyers = options["buyers"]
+        max_tickets = options["max_tickets"]
+        stamp = int(time.time() * 1000)
+
+        host = User.objects.create_user(
+            username=f"loadtest-host-{stamp}", email=f"loadtest-host-{stamp}@example.com"
+        )
+        buyer = User.objects.create_user(
+            username=f"loadtest-buyer-{stamp}", email=f"loadtest-buyer-{stamp}@example.com"
+        )
+        activity = Activity.objects.create(
+            host=host,
+            title="Reservation load test",
+            description="Temporary fixture.",
+            location="Load test",
+            latitude=0.0,
+            longitude=0.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=10,
+            is_ticketed=True,
+            max_tickets=max_tickets,
+        )
+
+        def attempt(_):
+            try:
+                started = time.perf_counter()
+                held = create_ticket_hold(activity, buyer) is not None
+                return held, (time.perf_counter() - started) * 1000
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                results = list(executor.map(attempt, range(buyers)))
+            elapsed = time.perf_counter() - started
+
+            activity.refresh_from_db()
+            held = sum(1 for success, _ in results if success)
+            tickets = Ticket.objects.filter(activity=activity).count()
+            timings = sorted(latency for _, latency in results)
+
+            self.stdout.write(
+                f"buyers={buyers} max_tickets={max_tickets} held={held} "
+                f"rejected={buyers - held} tickets={tickets} reserved={activity.tickets_reserved}"
+            )
+            self.stdout.write(
+                f"throughput={buyers / elapsed:,.0f}/s median_ms={statistics.median(timings):.2f} "
+                f"p95_ms={timings[int(len(timings) * 0.95) - 1]:.2f}"
+            )
+            if held != min(buyers, max_tickets) or tickets != held:
+                raise CommandError("Reservation invariant violated")
+        finally:
+            host.delete()
+            buyer.delete()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from activities.analytics import rebuild_ticket_rollups
+from activities.models import Activity
+
+
+class Command(BaseCommand):
+    help = "Recompute ticket analytics rollups from raw tickets and redemption logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("activity_ids", nargs="*", type=int)
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        activity_ids = options["activity_ids"] or list(
+            Activity.objects.filter(is_ticketed=True).order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+        buckets = 0
+        for start in range(0, len(activity_ids), batch_size):
+            buckets += rebuild_ticket_rollups(activity_ids[start : start + batch_size])
+        self.stdout.write(f"Rebuilt {buckets} rollup buckets for {len(activity_ids)} activities.")
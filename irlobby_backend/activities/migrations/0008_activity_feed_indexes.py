@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activities", "0007_activity_location_point"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activity",
+            index=models.Index(
+                condition=models.Q(("is_approved", True)),
+                fields=["-created_at"],
+                name="activity_approved_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="activity",
+            index=models.Index(
+                condition=models.Q(("is_approved", True)),
+                fields=["time"],
+                name="activity_approved_time_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activities", "0008_activity_feed_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UpcomingActivitySlot",
+            fields=[
+                (
+                    "activity",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="upcoming_slot",
+                        serialize=False,
+                        to="activities.activity",
+                    ),
+                ),
+                ("geohash", models.CharField(max_length=12)),
+                ("hour_bucket", models.DateTimeField()),
+                ("time", models.DateTimeField()),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                (
+                    "host",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["geohash", "hour_bucket"],
+                        include=("time", "latitude", "longitude", "host", "activity"),
+                        name="upcoming_slot_cell_hour_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activities", "0009_upcomingactivityslot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="activity",
+            name="tickets_reserved",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="ticket",
+            name="reserved_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                condition=models.Q(("reserved_until__isnull", False), ("status", "pending")),
+                fields=["reserved_until"],
+                name="ticket_active_hold_idx",
+            ),
+        ),
+    ]
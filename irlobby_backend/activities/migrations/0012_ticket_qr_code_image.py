@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activities", "0011_stripewebhookevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="qr_code_image",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activities", "0012_ticket_qr_code_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TicketRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("sold", "Sold"),
+                            ("redeemed", "Redeemed"),
+                            ("failed", "Failed scan"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("reason", models.CharField(blank=True, default="", max_length=32)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "activity",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ticket_rollups",
+                        to="activities.activity",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("activity", "kind", "bucket", "reason"),
+                        name="ticket_rollup_bucket_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
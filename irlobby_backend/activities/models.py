@@ -2,12 +2,12 @@ import uuid
 
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
-from django.core import signing
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.utils import timezone
 
 from users.models import User
 
+from .ticket_tokens import make_ticket_token, parse_ticket_token
+
 
 class Activity(models.Model):
     host = models.ForeignKey(User, on_delete=models.CASCADE, related_name="hosted_activities")
@@ -18,6 +18,7 @@ class Activity(models.Model):
     location = models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # spatial_index defaults to True, so PostGIS keeps a GiST index on this column.
     location_point = models.PointField(geography=True, srid=4326, null=True, blank=True)
     time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
@@ -39,6 +40,8 @@ class Activity(models.Model):
     ticket_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     max_tickets = models.PositiveIntegerField(default=0)
     tickets_sold = models.PositiveIntegerField(default=0)
+    # Unexpired checkout holds; see activities.reservations.
+    tickets_reserved = models.PositiveIntegerField(default=0)
     platform_fee_percent = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -47,6 +50,20 @@ class Activity(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created_at"],
+                name="activity_approved_created_idx",
+                condition=models.Q(is_approved=True),
+            ),
+            models.Index(
+                fields=["time"],
+                name="activity_approved_time_idx",
+                condition=models.Q(is_approved=True),
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.latitude is not None and self.longitude is not None:
             self.location_point = Point(self.longitude, self.latitude)
@@ -56,7 +73,7 @@ class Activity(models.Model):
     def tickets_available(self):
         if not self.is_ticketed:
             return 0
-        return max(self.max_tickets - self.tickets_sold, 0)
+        return max(self.max_tickets - self.tickets_sold - self.tickets_reserved, 0)
 
     @property
     def is_sold_out(self):
@@ -102,8 +119,12 @@ class Ticket(models.Model):
     stripe_payment_intent_id = models.CharField(
         max_length=255, blank=True, null=True, db_index=True
     )
+    # Legacy inline image; emptied by the backfill_ticket_qr_images command.
     qr_code_data_url = models.TextField(blank=True, default="")
+    # Name in the content-addressed "ticket_qr" storage (see activities.qr).
+    qr_code_image = models.CharField(max_length=255, blank=True, default="")
     purchased_at = models.DateTimeField(null=True, blank=True)
+    reserved_until = models.DateTimeField(null=True, blank=True)
     redeemed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -113,6 +134,11 @@ class Ticket(models.Model):
             models.Index(fields=["buyer"]),
             models.Index(fields=["activity", "status"]),
             models.Index(fields=["stripe_payment_intent_id"]),
+            models.Index(
+                fields=["reserved_until"],
+                name="ticket_active_hold_idx",
+                condition=models.Q(status="pending", reserved_until__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -123,17 +149,11 @@ class Ticket(models.Model):
         return self.status == "paid"
 
     def get_qr_token(self):
-        payload = {
-            "ticket_id": str(self.ticket_id),
-            "activity_id": self.activity_id,
-            "issued_at": timezone.now().isoformat(),
-        }
-        return signing.dumps(payload, salt="activity-ticket")
+        return make_ticket_token(self.ticket_id, self.activity_id)
 
     @staticmethod
     def parse_qr_token(token):
-        payload = signing.loads(token, salt="activity-ticket")
-        return uuid.UUID(payload["ticket_id"]), int(payload["activity_id"])
+        return parse_ticket_token(token)
 
 
 class TicketRedemptionLog(models.Model):
@@ -158,3 +178,93 @@ class TicketRedemptionLog(models.Model):
 
     def __str__(self):
         return f"Redemption {self.ticket.ticket_id} by {self.host} at {self.scanned_at}"
+
+
+class TicketRollup(models.Model):
+    """Per-activity ticket counter for one time bucket.
+
+    Incremented by ``activities.analytics`` as tickets are sold and scanned, so
+    host reporting never groups raw ``Ticket`` or ``TicketRedemptionLog`` rows.
+    """
+
+    KIND_CHOICES = [
+        ("sold", "Sold"),
+        ("redeemed", "Redeemed"),
+        ("failed", "Failed scan"),
+    ]
+
+    activity = models.ForeignKey(
+        Activity, on_delete=models.CASCADE, related_name="ticket_rollups", db_index=False
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    bucket = models.DateTimeField()
+    reason = models.CharField(max_length=32, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["activity", "kind", "bucket", "reason"], name="ticket_rollup_bucket_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.count} at {self.bucket} for activity {self.activity_id}"
+
+
+class UpcomingActivitySlot(models.Model):
+    """Materialized row for an approved activity starting within the upcoming horizon.
+
+    Maintained by ``activities.tasks.refresh_upcoming_activity_slots`` and keyed by
+    geohash cell and start hour so "happening soon" reads are index-only lookups.
+    """
+
+    activity = models.OneToOneField(
+        Activity, on_delete=models.CASCADE, primary_key=True, related_name="upcoming_slot"
+    )
+    host = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", db_index=False)
+    geohash = models.CharField(max_length=12)
+    hour_bucket = models.DateTimeField()
+    time = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["geohash", "hour_bucket"],
+                include=["time", "latitude", "longitude", "host", "activity"],
+                name="upcoming_slot_cell_hour_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_id} @ {self.geohash}/{self.hour_bucket:%Y-%m-%dT%H}"
+
+
+class StripeWebhookEvent(models.Model):
+    """Inbox row for a verified Stripe webhook delivery.
+
+    The unique ``event_id`` makes redeliveries a no-op insert; rows are applied
+    in batches by ``activities.tasks.process_stripe_webhook_events``.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=64)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["received_at"],
+                name="stripe_event_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
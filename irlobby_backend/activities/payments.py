@@ -0,0 +1,89 @@
+"""Process-wide Stripe client.
+
+One ``StripeClient`` per process replaces setting the global ``stripe.api_key``
+on every request. It sends requests through a shared ``requests.Session`` whose
+connection pool keeps TLS connections to Stripe warm. Timeouts are bounded so a
+slow Stripe call cannot tie up a worker for the library's 80 second default.
+``STRIPE_API_BASE`` points the client at a local stub (see
+``activities.stripe_stub``) for tests and benchmarks.
+"""
+
+from functools import lru_cache
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+
+def _build_http_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=getattr(settings, "STRIPE_HTTP_POOL_SIZE", 10),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=1)
+def get_stripe_client():
+    api_base = getattr(settings, "STRIPE_API_BASE", "")
+    http_client = stripe.RequestsClient(
+        timeout=(
+            getattr(settings, "STRIPE_CONNECT_TIMEOUT_SECONDS", 3.05),
+            getattr(settings, "STRIPE_READ_TIMEOUT_SECONDS", 15),
+        ),
+        session=_build_http_session(),
+    )
+    return stripe.StripeClient(
+        settings.STRIPE_API_KEY,
+        base_addresses={"api": api_base} if api_base else {},
+        max_network_retries=getattr(settings, "STRIPE_MAX_NETWORK_RETRIES", 1),
+        http_client=http_client,
+    )
+
+
+@receiver(setting_changed)
+def reset_stripe_client(setting, **kwargs):
+    if setting.startswith("STRIPE_"):
+        get_stripe_client.cache_clear()
+
+
+def create_checkout_session(activity, ticket, success_url, cancel_url):
+    """Create the Stripe checkout session for a held ticket.
+
+    The ticket id doubles as the idempotency key, so client retries after a
+    timeout cannot open a second session for the same hold.
+    """
+
+    return get_stripe_client().v1.checkout.sessions.create(
+        params={
+            "payment_method_types": ["card"],
+            "mode": "payment",
+            "line_items": [
+                {
+                    "price_data": {
+                        "currency": activity.currency.lower(),
+                        "product_data": {
+                            "name": f"Ticket for {activity.title}",
+                            "description": activity.description[:200],
+                        },
+                        "unit_amount": int(activity.ticket_price * 100),
+                    },
+                    "quantity": 1,
+                }
+            ],
+            "metadata": {
+                "ticket_id": str(ticket.ticket_id),
+                "activity_id": str(activity.id),
+            },
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "expires_at": int(ticket.reserved_until.timestamp()),
+        },
+        options={"idempotency_key": f"checkout-{ticket.ticket_id}"},
+    )
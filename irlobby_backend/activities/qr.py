@@ -0,0 +1,63 @@
+"""Ticket QR rendering and content-addressed storage.
+
+Images are stored under the SHA-256 of their bytes in the ``ticket_qr`` storage
+(see ``STORAGES``), so a stored file never changes and its URL can be cached
+forever by the browser. The local filesystem backend is served by
+``TicketQRImageView``; object storage backends return their own URLs.
+"""
+
+import hashlib
+import io
+import re
+
+import qrcode
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from qrcode.image.svg import SvgPathImage
+
+QR_CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+QR_NAME_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{64}\.(png|svg)$")
+# The image encodes the ticket's redemption token, so shared caches must not keep it.
+QR_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def ticket_qr_storage():
+    return storages["ticket_qr"]
+
+
+def render_qr_png(payload):
+    buffer = io.BytesIO()
+    qrcode.make(payload).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_qr_svg(payload):
+    buffer = io.BytesIO()
+    qrcode.make(payload, image_factory=SvgPathImage).save(buffer)
+    return buffer.getvalue()
+
+
+def render_qr(payload):
+    """Return ``(image_bytes, extension)`` for a QR code encoding ``payload``."""
+    try:
+        return render_qr_png(payload), "png"
+    except Exception:
+        # Fallback to SVG path output if Pillow is unavailable.
+        return render_qr_svg(payload), "svg"
+
+
+def qr_storage_name(content, extension):
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{digest[:2]}/{digest}.{extension}"
+
+
+def store_qr_image(content, extension):
+    """Write image bytes to the content-addressed store and return the storage name."""
+    storage = ticket_qr_storage()
+    name = qr_storage_name(content, extension)
+    if not storage.exists(name):
+        saved_name = storage.save(name, ContentFile(content))
+        if saved_name != name:
+            # Lost a race with an identical write; keep the canonical name.
+            storage.delete(saved_name)
+    return name
@@ -0,0 +1,188 @@
+"""Offline ticket checking for hosts.
+
+``build_ticket_manifest`` gives a host device every redeemable ticket UUID of an
+activity as one sorted, base64-encoded run of 16-byte UUIDs. The device can
+binary-search it to check scans without a network round trip. The manifest is
+signed with Ed25519 over ``"{activityId}:{issuedAt}:{tickets}"`` and carries the
+public key, so the device can check stored copies offline once it has pinned
+that key.
+``sync_ticket_redemptions`` applies a batch of offline scans with one locked
+read, one ``bulk_update`` and one ``bulk_create`` of redemption logs.
+
+Each process also remembers which tickets it has seen redeemed, per activity,
+so a repeated scan at the door is rejected before any query. Redemption is
+terminal, so entries never go stale; the database remains the source of truth
+for tickets this process has not seen.
+"""
+
+import base64
+import threading
+import uuid
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .analytics import (
+    FAILURE_ALREADY_USED,
+    FAILURE_NOT_REDEEMABLE,
+    record_ticket_events,
+    scan_event,
+)
+from .models import Ticket, TicketRedemptionLog
+
+TICKET_MANIFEST_SALT = "activity-ticket-manifest"
+TICKET_MANIFEST_ENCODING = "uuid16-sorted-base64"
+TICKET_MANIFEST_SIGNATURE_ALGORITHM = "Ed25519"
+MAX_SYNCED_SCANS = 500
+USED_TICKET_CACHE_ACTIVITIES = 256
+
+# activity id -> (host id, redeemed ticket UUIDs), least recently scanned first.
+_used_tickets: OrderedDict[int, tuple[int, set[uuid.UUID]]] = OrderedDict()
+_used_tickets_lock = threading.Lock()
+
+
+def remember_used_tickets(activity_id, host_id, ticket_ids):
+    """Record redeemed tickets; the least recently scanned activity is evicted first."""
+    with _used_tickets_lock:
+        entry = _used_tickets.pop(activity_id, None)
+        if entry is None or entry[0] != host_id:
+            entry = (host_id, set())
+        entry[1].update(ticket_ids)
+        _used_tickets[activity_id] = entry
+        while len(_used_tickets) > USED_TICKET_CACHE_ACTIVITIES:
+            _used_tickets.popitem(last=False)
+
+
+def is_known_used_ticket(activity_id, host_id, ticket_id):
+    """True when this process has seen ``ticket_id`` redeemed at ``host_id``'s activity."""
+    entry = _used_tickets.get(activity_id)
+    return entry is not None and entry[0] == host_id and ticket_id in entry[1]
+
+
+def clear_used_ticket_cache():
+    with _used_tickets_lock:
+        _used_tickets.clear()
+
+
+def _manifest_signing_key():
+    # Derived from SECRET_KEY, so every process signs with the same key pair.
+    seed = salted_hmac(TICKET_MANIFEST_SALT, "ed25519-seed", algorithm="sha256").digest()
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def _manifest_message(activity_id, issued_at, tickets):
+    return f"{activity_id}:{issued_at}:{tickets}".encode()
+
+
+def ticket_manifest_public_key():
+    raw = _manifest_signing_key().public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return base64.b64encode(raw).decode()
+
+
+def build_ticket_manifest(activity):
+    ticket_ids = sorted(
+        Ticket.objects.filter(activity=activity, status="paid").values_list("ticket_id", flat=True),
+        key=lambda ticket_id: ticket_id.bytes,
+    )
+    tickets = base64.b64encode(b"".join(ticket_id.bytes for ticket_id in ticket_ids)).decode()
+    issued_at = timezone.now().isoformat()
+    signing_key = _manifest_signing_key()
+    signature = signing_key.sign(_manifest_message(activity.id, issued_at, tickets))
+    return {
+        "activityId": activity.id,
+        "issuedAt": issued_at,
+        "encoding": TICKET_MANIFEST_ENCODING,
+        "count": len(ticket_ids),
+        "tickets": tickets,
+        "signatureAlgorithm": TICKET_MANIFEST_SIGNATURE_ALGORITHM,
+        "signature": base64.b64encode(signature).decode(),
+        "publicKey": ticket_manifest_public_key(),
+    }
+
+
+def verify_ticket_manifest(manifest):
+    """Check a manifest against this server's key, as a device with the pinned key does."""
+    try:
+        _manifest_signing_key().public_key().verify(
+            base64.b64decode(manifest.get("signature", "")),
+            _manifest_message(
+                manifest.get("activityId"), manifest.get("issuedAt"), manifest.get("tickets")
+            ),
+        )
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+def sync_ticket_redemptions(activity, host, scans):
+    """Apply offline scans in scan order and return one result per scan.
+
+    ``scans`` is a list of ``{"ticketId": UUID, "scannedAt": datetime}``. The
+    first scan of a paid ticket redeems it at its scan time (clamped to now);
+    later scans of the same ticket, in this batch or already synced, are
+    logged as duplicates. Unknown tickets are reported but not logged.
+    """
+
+    now = timezone.now()
+    results = []
+    redeemed = []
+    logs = []
+    events = []
+    with transaction.atomic():
+        tickets = {
+            ticket.ticket_id: ticket
+            for ticket in Ticket.objects.select_for_update()
+            .filter(activity=activity, ticket_id__in={scan["ticketId"] for scan in scans})
+            .only("id", "ticket_id", "activity_id", "status", "redeemed_at")
+        }
+
+        for scan in sorted(scans, key=lambda scan: scan["scannedAt"]):
+            ticket = tickets.get(scan["ticketId"])
+            result = {"ticketId": str(scan["ticketId"])}
+            if ticket is None:
+                results.append({**result, "successful": False, "status": "unknown"})
+                continue
+
+            failure = ""
+            if ticket.status == "paid":
+                ticket.status = "used"
+                ticket.redeemed_at = min(scan["scannedAt"], now)
+                redeemed.append(ticket)
+                successful, message = True, "Validated successfully."
+            elif ticket.status == "used":
+                successful, message = False, "Ticket already used."
+                failure = FAILURE_ALREADY_USED
+            else:
+                successful, message = False, "Ticket is not in a valid state for redemption."
+                failure = FAILURE_NOT_REDEEMABLE
+            events.append(scan_event(activity.id, min(scan["scannedAt"], now), failure))
+
+            logs.append(
+                TicketRedemptionLog(
+                    ticket=ticket,
+                    activity=activity,
+                    host=host,
+                    successful=successful,
+                    status=ticket.status,
+                    message=message,
+                )
+            )
+            results.append({**result, "successful": successful, "status": ticket.status})
+
+        if redeemed:
+            Ticket.objects.bulk_update(redeemed, ["status", "redeemed_at"])
+        if logs:
+            TicketRedemptionLog.objects.bulk_create(logs)
+        record_ticket_events(events)
+
+    remember_used_tickets(
+        activity.id,
+        host.id,
+        [ticket.ticket_id for ticket in tickets.values() if ticket.status == "used"],
+    )
+    return results
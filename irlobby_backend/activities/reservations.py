@@ -0,0 +1,121 @@
+"""Atomic ticket inventory holds.
+
+A checkout takes a hold by bumping ``Activity.tickets_reserved`` with a single
+conditional UPDATE, so concurrent buyers can never push
+``tickets_reserved + tickets_sold`` past ``max_tickets``. Holds are converted to
+sales by the Stripe webhook, released when checkout fails or the session
+expires, and swept by ``activities.tasks.expire_ticket_holds`` once
+``reserved_until`` passes.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .analytics import record_ticket_events, sold_event
+from .models import Activity, Ticket
+
+# Stripe checkout sessions must live at least 30 minutes; the extra minute covers
+# the gap between taking the hold and creating the session.
+MIN_TICKET_HOLD_SECONDS = 31 * 60
+
+
+def ticket_hold_duration():
+    seconds = getattr(settings, "TICKET_HOLD_SECONDS", MIN_TICKET_HOLD_SECONDS)
+    return timedelta(seconds=max(seconds, MIN_TICKET_HOLD_SECONDS))
+
+
+def reserve_ticket_inventory(activity_id):
+    """Take one unit of inventory; return False when the activity is sold out."""
+    return bool(
+        Activity.objects.filter(
+            pk=activity_id,
+            is_ticketed=True,
+            max_tickets__gt=F("tickets_reserved") + F("tickets_sold"),
+        ).update(tickets_reserved=F("tickets_reserved") + 1)
+    )
+
+
+def create_ticket_hold(activity, buyer):
+    """Reserve inventory and create a pending ticket holding it, or return None."""
+    with transaction.atomic():
+        if not reserve_ticket_inventory(activity.pk):
+            return None
+        return Ticket.objects.create(
+            buyer=buyer,
+            activity=activity,
+            status="pending",
+            reserved_until=timezone.now() + ticket_hold_duration(),
+        )
+
+
+def release_ticket_hold(ticket, status="cancelled"):
+    """Move a held ticket to ``status`` and return its inventory. Idempotent."""
+    with transaction.atomic():
+        released = Ticket.objects.filter(
+            pk=ticket.pk, status="pending", reserved_until__isnull=False
+        ).update(status=status, reserved_until=None)
+        if released:
+            Activity.objects.filter(pk=ticket.activity_id, tickets_reserved__gt=0).update(
+                tickets_reserved=F("tickets_reserved") - 1
+            )
+    return bool(released)
+
+
+def confirm_ticket_purchase(ticket, payment_intent_id=None):
+    """Mark a ticket paid, converting its hold (if any) into a sale.
+
+    Returns False when the ticket was already paid. Payments that complete after
+    their hold was swept are still honoured and counted as sold.
+    """
+
+    with transaction.atomic():
+        ticket = Ticket.objects.select_for_update().get(pk=ticket.pk)
+        if ticket.status == "paid":
+            return False
+
+        held = ticket.status == "pending" and ticket.reserved_until is not None
+        ticket.status = "paid"
+        ticket.purchased_at = timezone.now()
+        ticket.stripe_payment_intent_id = payment_intent_id
+        ticket.reserved_until = None
+        ticket.save(
+            update_fields=["status", "purchased_at", "stripe_payment_intent_id", "reserved_until"]
+        )
+
+        counters = {"tickets_sold": F("tickets_sold") + 1}
+        if held:
+            counters["tickets_reserved"] = F("tickets_reserved") - 1
+        Activity.objects.filter(pk=ticket.activity_id).update(**counters)
+        record_ticket_events([sold_event(ticket.activity_id, ticket.purchased_at)])
+    return True
+
+
+def expire_ticket_holds(now=None):
+    """Cancel pending tickets whose hold has lapsed and return their inventory.
+
+    Rows locked by an in-flight webhook are skipped and picked up next run.
+    """
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            Ticket.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", reserved_until__lt=now)
+            .values_list("id", "activity_id")
+        )
+        if not expired:
+            return 0
+
+        Ticket.objects.filter(id__in=[ticket_id for ticket_id, _ in expired]).update(
+            status="cancelled", reserved_until=None
+        )
+        for activity_id, count in Counter(activity_id for _, activity_id in expired).items():
+            Activity.objects.filter(pk=activity_id, tickets_reserved__gte=count).update(
+                tickets_reserved=F("tickets_reserved") - count
+            )
+    return len(expired)
@@ -1,11 +1,15 @@
+from django.utils import timezone
 from rest_framework import serializers
 
 from utils.sanitize import strip_html
+from utils.serializers import SparseFieldsetMixin
 
 from .models import Activity, ActivityParticipant, Ticket
+from .qr import ticket_qr_storage
+from .redemption import MAX_SYNCED_SCANS
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     host = serializers.StringRelatedField(read_only=True)
     participant_count = serializers.SerializerMethodField()
     dateTime = serializers.DateTimeField(source="time", read_only=True)
@@ -147,12 +151,77 @@ class ActivitySerializer(serializers.ModelSerializer):
         return obj.is_sold_out
 
     def get_participant_count(self, obj):
-        return obj.participants.filter(status="confirmed").count()
+        return confirmed_participant_count(obj)
 
     def validate_description(self, value):
         return strip_html(value)
 
 
+def confirmed_participant_count(activity):
+    count = getattr(activity, "confirmed_participant_count", None)
+    if count is not None:
+        return count
+    return activity.participants.filter(status="confirmed").count()
+
+
+class ActivityCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Read-only feed card: camelCase keys only, no description or image list."""
+
+    host = serializers.StringRelatedField(read_only=True)
+    dateTime = serializers.DateTimeField(source="time", read_only=True)
+    endDateTime = serializers.DateTimeField(source="end_time", read_only=True)
+    maxParticipants = serializers.IntegerField(source="capacity", read_only=True)
+    participantCount = serializers.SerializerMethodField()
+    isApproved = serializers.BooleanField(source="is_approved", read_only=True)
+    isPrivate = serializers.BooleanField(source="is_private", read_only=True)
+    requiresApproval = serializers.BooleanField(source="requires_approval", read_only=True)
+    skillLevel = serializers.CharField(source="skill_level", read_only=True)
+    isTicketed = serializers.BooleanField(source="is_ticketed", read_only=True)
+    ticketPrice = serializers.DecimalField(
+        source="ticket_price", max_digits=10, decimal_places=2, read_only=True
+    )
+    ticketsAvailable = serializers.IntegerField(source="tickets_available", read_only=True)
+    isSoldOut = serializers.BooleanField(source="is_sold_out", read_only=True)
+    coverImage = serializers.SerializerMethodField()
+    createdAt = serializers.DateTimeField(source="created_at", read_only=True)
+
+    class Meta:
+        model = Activity
+        fields = (
+            "id",
+            "host",
+            "title",
+            "category",
+            "location",
+            "latitude",
+            "longitude",
+            "dateTime",
+            "endDateTime",
+            "maxParticipants",
+            "participantCount",
+            "isApproved",
+            "isPrivate",
+            "requiresApproval",
+            "skillLevel",
+            "price",
+            "currency",
+            "isTicketed",
+            "ticketPrice",
+            "ticketsAvailable",
+            "isSoldOut",
+            "tags",
+            "coverImage",
+            "createdAt",
+        )
+        read_only_fields = fields
+
+    def get_participantCount(self, obj):
+        return confirmed_participant_count(obj)
+
+    def get_coverImage(self, obj):
+        return obj.images[0] if obj.images else None
+
+
 class ActivityParticipantSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     activity = serializers.StringRelatedField(read_only=True)
@@ -170,7 +239,7 @@ class TicketSerializer(serializers.ModelSerializer):
     ticketId = serializers.UUIDField(source="ticket_id", read_only=True)
     purchasedAt = serializers.DateTimeField(source="purchased_at", read_only=True)
     redeemedAt = serializers.DateTimeField(source="redeemed_at", read_only=True)
-    qrCodeDataUrl = serializers.CharField(source="qr_code_data_url", read_only=True)
+    qrCodeUrl = serializers.SerializerMethodField()
 
     class Meta:
         model = Ticket
@@ -183,7 +252,7 @@ class TicketSerializer(serializers.ModelSerializer):
             "status",
             "purchasedAt",
             "redeemedAt",
-            "qrCodeDataUrl",
+            "qrCodeUrl",
             "created_at",
         )
         read_only_fields = (
@@ -194,10 +263,17 @@ class TicketSerializer(serializers.ModelSerializer):
             "buyer",
             "purchasedAt",
             "redeemedAt",
-            "qrCodeDataUrl",
+            "qrCodeUrl",
             "created_at",
         )
 
+    def get_qrCodeUrl(self, obj):
+        if not obj.qr_code_image:
+            return None
+        url = ticket_qr_storage().url(obj.qr_code_image)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
 
 class TicketPurchaseSerializer(serializers.Serializer):
     successUrl = serializers.URLField(required=False)
@@ -206,3 +282,16 @@ class TicketPurchaseSerializer(serializers.Serializer):
 
 class TicketValidationSerializer(serializers.Serializer):
     ticketToken = serializers.CharField()
+
+
+class TicketScanSerializer(serializers.Serializer):
+    ticketId = serializers.UUIDField()
+    scannedAt = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("scannedAt", timezone.now())
+        return attrs
+
+
+class TicketRedemptionSyncSerializer(serializers.Serializer):
+    scans = TicketScanSerializer(many=True, allow_empty=False, max_length=MAX_SYNCED_SCANS)
@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .feed_cache import bump_feed_tile_versions
+from .models import Activity
+
+# Sent by bulk moderation paths that bypass Activity.save(), with the
+# ``(latitude, longitude)`` ``points`` of the changed activities. Capture them
+# before the update: a queryset filtered on ``is_approved`` is empty after it.
+activities_approval_changed = Signal()
+
+# Columns that decide whether and how an approved activity appears in a feed tile.
+FEED_TILE_FIELDS = (
+    "is_approved",
+    "host_id",
+    "latitude",
+    "longitude",
+    "time",
+    "category",
+    "location",
+    "skill_level",
+    "age_restriction",
+    "visibility",
+    "price",
+    "tags",
+)
+
+
+def _feed_tile_state(activity):
+    return {field: getattr(activity, field) for field in FEED_TILE_FIELDS}
+
+
+@receiver(pre_save, sender=Activity)
+def remember_feed_tile_state(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(FEED_TILE_FIELDS):
+        instance._feed_tile_previous = _feed_tile_state(instance)
+    elif instance.pk is None:
+        instance._feed_tile_previous = None
+    else:
+        instance._feed_tile_previous = (
+            sender.objects.filter(pk=instance.pk).values(*FEED_TILE_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Activity)
+def invalidate_feed_tiles_on_activity_save(sender, instance, **kwargs):
+    previous = getattr(instance, "_feed_tile_previous", None)
+    current = _feed_tile_state(instance)
+    if previous == current or not (instance.is_approved or (previous and previous["is_approved"])):
+        return
+    points = {(instance.latitude, instance.longitude)}
+    if previous:
+        points.add((previous["latitude"], previous["longitude"]))
+    bump_feed_tile_versions(points)
+
+
+@receiver(post_delete, sender=Activity)
+def invalidate_feed_tiles_on_activity_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        bump_feed_tile_versions([(instance.latitude, instance.longitude)])
+
+
+@receiver(activities_approval_changed)
+def invalidate_feed_tiles_on_approval_change(sender, points, **kwargs):
+    bump_feed_tile_versions(points)
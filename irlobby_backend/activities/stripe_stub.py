@@ -0,0 +1,99 @@
+"""Minimal local stand-in for the Stripe checkout API.
+
+Serves ``POST /v1/checkout/sessions`` over keep-alive HTTP/1.1 with an optional
+artificial latency, and records each request's form fields and client port so
+tests and benchmarks can check payloads and connection reuse without network
+access.
+"""
+
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle/delayed-ACK stalls.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = dict(parse_qsl(self.rfile.read(length).decode()))
+        stub = self.server.stub
+        stub.record(self.path, form, self.client_address[1])
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if self.path == "/v1/checkout/sessions":
+            status, body = 200, stub.checkout_session(form)
+        else:
+            status, body = 404, {"error": {"type": "invalid_request_error", "message": "Not found"}}
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StripeStubServer:
+    """Run the stub on a background thread; usable as a context manager."""
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connection_count(self):
+        return len({client_port for _, _, client_port in self.requests})
+
+    def record(self, path, form, client_port):
+        with self._lock:
+            self.requests.append((path, form, client_port))
+
+    def checkout_session(self, form):
+        with self._lock:
+            session_id = f"cs_stub_{next(self._ids)}"
+        return {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"{self.url}/pay/{session_id}",
+            "expires_at": int(form.get("expires_at", 0)),
+            "metadata": {
+                key[len("metadata[") : -1]: value
+                for key, value in form.items()
+                if key.startswith("metadata[")
+            },
+        }
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,17 +1,19 @@
-import base64
-import io
 import logging
 from datetime import timedelta
 
-import qrcode
 from celery import shared_task
 from django.utils import timezone
-from qrcode.image.svg import SvgPathImage
 
 from .models import Activity, ActivityParticipant, Ticket
+from .qr import render_qr, store_qr_image
+from .reservations import expire_ticket_holds as expire_lapsed_ticket_holds
+from .upcoming import refresh_upcoming_slots
+from .webhooks import process_pending_stripe_events, prune_processed_stripe_events
 
 logger = logging.getLogger(__name__)
 
+QR_UPDATE_BATCH_SIZE = 500
+
 
 @shared_task
 def notify_upcoming_activities():
@@ -35,33 +37,73 @@ def notify_upcoming_activities():
     }
 
 
+@shared_task
+def refresh_upcoming_activity_slots():
+    result = refresh_upcoming_slots()
+    logger.info(
+        "Refreshed upcoming activity slots created=%s updated=%s deleted=%s",
+        result["created"],
+        result["updated"],
+        result["deleted"],
+    )
+    return result
+
+
+@shared_task
+def expire_ticket_holds():
+    expired = expire_lapsed_ticket_holds()
+    if expired:
+        logger.info("Expired %s abandoned ticket holds", expired)
+    return expired
+
+
+@shared_task
+def process_stripe_webhook_events():
+    paid_ticket_ids = process_pending_stripe_events()
+    if paid_ticket_ids:
+        generate_ticket_qr_codes.delay(paid_ticket_ids)
+    return len(paid_ticket_ids)
+
+
+@shared_task
+def prune_stripe_webhook_events():
+    return prune_processed_stripe_events()
+
+
+def _store_ticket_qr_codes(tickets):
+    for ticket in tickets:
+        content, extension = render_qr(ticket.get_qr_token())
+        ticket.qr_code_image = store_qr_image(content, extension)
+        ticket.qr_code_data_url = ""
+
+
 @shared_task
 def generate_ticket_qr_code(ticket_id):
     try:
-        ticket = Ticket.objects.select_related("activity").get(id=ticket_id)
+        ticket = Ticket.objects.only("id", "ticket_id", "activity_id").get(id=ticket_id)
     except Ticket.DoesNotExist:
         logger.warning("Ticket %s not found for QR generation", ticket_id)
         return None
 
-    payload = ticket.get_qr_token()
-    buffer = io.BytesIO()
+    _store_ticket_qr_codes([ticket])
+    ticket.save(update_fields=["qr_code_image", "qr_code_data_url"])
+    return ticket.qr_code_image
 
-    try:
-        image = qrcode.make(payload)
-        image.save(buffer, format="PNG")
-        mime_type = "image/png"
-    except Exception:
-        # Fallback to SVG path output if Pillow is unavailable.
-        buffer = io.BytesIO()
-        qr = qrcode.QRCode(box_size=10, border=4)
-        qr.add_data(payload)
-        qr.make(fit=True)
-        image = qr.make_image(image_factory=SvgPathImage)
-        image.save(buffer)
-        mime_type = "image/svg+xml"
-
-    buffer.seek(0)
-    data_url = f"data:{mime_type};base64,{base64.b64encode(buffer.read()).decode('ascii')}"
-    ticket.qr_code_data_url = data_url
-    ticket.save(update_fields=["qr_code_data_url"])
-    return ticket.qr_code_data_url
+
+@shared_task
+def generate_ticket_qr_codes(ticket_ids):
+    """Render and store QR codes for many tickets with a single UPDATE per batch."""
+    tickets = list(
+        Ticket.objects.filter(id__in=ticket_ids)
+        .only("id", "ticket_id", "activity_id")
+        .order_by("id")
+    )
+    missing = len(set(ticket_ids)) - len(tickets)
+    if missing:
+        logger.warning("%s tickets not found for QR generation", missing)
+
+    _store_ticket_qr_codes(tickets)
+    Ticket.objects.bulk_update(
+        tickets, ["qr_code_image", "qr_code_data_url"], batch_size=QR_UPDATE_BATCH_SIZE
+    )
+    return len(tickets)
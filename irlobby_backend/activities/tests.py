@@ -1,12 +1,61 @@
+import base64
+import io
+import json
+import threading
 from datetime import timedelta
 from unittest.mock import patch
 
+import stripe
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from django.contrib import admin
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signing import BadSignature
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 
-from activities.models import Activity, ActivityParticipant, Ticket
+from activities.admin import ActivityAdmin
+from activities.analytics import rebuild_ticket_rollups
+from activities.feed_cache import encode_geohash
+from activities.models import (
+    Activity,
+    ActivityParticipant,
+    StripeWebhookEvent,
+    Ticket,
+    TicketRedemptionLog,
+    TicketRollup,
+    UpcomingActivitySlot,
+)
+from activities.qr import (
+    QR_CACHE_CONTROL,
+    qr_storage_name,
+    store_qr_image,
+    ticket_qr_storage,
+)
+from activities.redemption import clear_used_ticket_cache, verify_ticket_manifest
+from activities.reservations import (
+    confirm_ticket_purchase,
+    create_ticket_hold,
+    expire_ticket_holds,
+)
+from activities.signals import activities_approval_changed
+from activities.stripe_stub import StripeStubServer
+from activities.tasks import (
+    generate_ticket_qr_code,
+    generate_ticket_qr_codes,
+    refresh_upcoming_activity_slots,
+)
+from activities.upcoming import covering_geohashes
+from activities.views import ActivityListCreateView
+from activities.webhooks import process_pending_stripe_events, record_stripe_event
+from moderation.models import BlockedUser
 from users.models import User
 
 
@@ -175,6 +224,7 @@ class ActivityApprovalWorkflowTests(APITestCase):
 
 class TicketingTests(APITestCase):
     def setUp(self):
+        clear_used_ticket_cache()
         self.host = User.objects.create_user(
             username="ticket-host",
             email="ticket-host@example.com",
@@ -202,7 +252,7 @@ class TicketingTests(APITestCase):
             max_tickets=3,
         )
 
-    @patch("activities.views.stripe.checkout.Session.create")
+    @patch("activities.views.create_checkout_session")
     def test_create_ticket_checkout_session(self, mock_session_create):
         mock_session_create.return_value = {"id": "cs_test_123"}
 
@@ -237,6 +287,7 @@ class TicketingTests(APITestCase):
         )
 
         mock_construct_event.return_value = {
+            "id": "evt_test_paid",
             "type": "checkout.session.completed",
             "data": {"object": {"id": "cs_test_123"}},
         }
@@ -263,6 +314,7 @@ class TicketingTests(APITestCase):
         )
 
         mock_construct_event.return_value = {
+            "id": "evt_test_metadata",
             "type": "checkout.session.completed",
             "data": {
                 "object": {
@@ -366,3 +418,1120 @@ class TicketingTests(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_compact_token_round_trips_and_rejects_tampering(self):
+        ticket = Ticket.objects.create(buyer=self.buyer, activity=self.activity, status="paid")
+        token = ticket.get_qr_token()
+
+        self.assertNotIn(":", token)
+        self.assertEqual(Ticket.parse_qr_token(token), (ticket.ticket_id, self.activity.id))
+        tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+        with self.assertRaises(BadSignature):
+            Ticket.parse_qr_token(tampered)
+        with self.assertRaises(BadSignature):
+            Ticket.parse_qr_token("not-a-token")
+
+    def test_legacy_signed_token_is_still_accepted(self):
+        ticket = Ticket.objects.create(buyer=self.buyer, activity=self.activity, status="paid")
+        token = signing.dumps(
+            {
+                "ticket_id": str(ticket.ticket_id),
+                "activity_id": self.activity.id,
+                "issued_at": timezone.now().isoformat(),
+            },
+            salt="activity-ticket",
+        )
+
+        self.client.force_authenticate(self.host)
+        response = self.client.post(
+            reverse("ticket-validate", args=[ticket.ticket_id]),
+            data={"ticketToken": token},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_repeat_scan_is_rejected_without_ticket_queries(self):
+        ticket = Ticket.objects.create(buyer=self.buyer, activity=self.activity, status="paid")
+        url = reverse("ticket-validate", args=[ticket.ticket_id])
+        data = {"ticketToken": ticket.get_qr_token()}
+        self.client.force_authenticate(self.host)
+        self.assertEqual(self.client.post(url, data, format="json").status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get("message"), "Ticket has already been used.")
+        self.assertFalse([query for query in queries if "activities_ticket" in query["sql"]])
+
+        # The fast path only answers for the activity's host.
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ActivityFeedQueryPlanTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="plan-user",
+            email="plan-user@example.com",
+            password="password123",
+        )
+        for index in range(3):
+            Activity.objects.create(
+                host=self.user,
+                is_approved=True,
+                title=f"Plan Event {index}",
+                description="Query plan fixture.",
+                location="Park",
+                latitude=40.0 + index / 100,
+                longitude=-74.0,
+                time=timezone.now() + timedelta(days=index + 1),
+                capacity=5,
+                tags=[],
+                images=[],
+            )
+
+    def _feed_queryset(self, params=None):
+        request = Request(APIRequestFactory().get(reverse("activity-list"), params or {}))
+        request.user = self.user
+        view = ActivityListCreateView()
+        view.request = request
+        view.kwargs = {}
+        return view.get_queryset()
+
+    def test_feed_query_has_no_distinct(self):
+        queryset = self._feed_queryset()
+
+        self.assertFalse(queryset.query.distinct)
+        plan = queryset.explain()
+        self.assertNotIn("Unique", plan)
+        self.assertNotIn("HashAggregate", plan)
+
+    def test_geo_feed_query_uses_location_point_index(self):
+        queryset = self._feed_queryset({"latitude": 40.0, "longitude": -74.0, "radius": 5})
+
+        with connection.cursor() as cursor:
+            # The fixture table is tiny; force the planner to reveal index usage.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+
+        self.assertTrue(
+            any("Index Cond" in line and "location_point" in line for line in plan.splitlines()),
+            plan,
+        )
+        self.assertNotIn("Unique", plan)
+        self.assertEqual(len(queryset), 3)
+
+
+class ActivityFeedTileCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="tile-user",
+            email="tile-user@example.com",
+            password="password123",
+        )
+        self.host = User.objects.create_user(
+            username="tile-host",
+            email="tile-host@example.com",
+            password="password123",
+        )
+        self.blocked_host = User.objects.create_user(
+            username="tile-blocked",
+            email="tile-blocked@example.com",
+            password="password123",
+        )
+        self.near = self._create_activity(self.host, "Near", 40.001, is_approved=True)
+        self.nearer = self._create_activity(self.host, "Nearer", 40.0001, is_approved=True)
+        self.far = self._create_activity(self.host, "Far", 40.5, is_approved=True)
+        self._create_activity(self.blocked_host, "Blocked", 40.0002, is_approved=True)
+        self._create_activity(self.host, "Pending", 40.0003, is_approved=False)
+        self.own_draft = self._create_activity(self.user, "Own Draft", 40.002, is_approved=False)
+        BlockedUser.objects.create(blocker=self.user, blocked=self.blocked_host)
+        self.client.force_authenticate(self.user)
+
+    def _create_activity(self, host, title, latitude, is_approved):
+        return Activity.objects.create(
+            host=host,
+            is_approved=is_approved,
+            title=title,
+            description="Tile fixture.",
+            location="Park",
+            latitude=latitude,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=5,
+            tags=[],
+            images=[],
+        )
+
+    def _feed_ids(self):
+        response = self.client.get(
+            reverse("activity-list"), {"latitude": 40.0, "longitude": -74.0, "radius": 5}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, precision=11), "u4pruydqqvj")
+
+    def test_tile_feed_orders_by_distance_with_per_user_filters(self):
+        self.assertEqual(self._feed_ids(), [self.nearer.id, self.near.id, self.own_draft.id])
+
+    def test_tile_feed_matches_uncached_feed(self):
+        tiled_ids = self._feed_ids()
+
+        with self.settings(ACTIVITY_FEED_TILE_CACHE_ENABLED=False):
+            self.assertEqual(self._feed_ids(), tiled_ids)
+
+    def test_invalid_coordinates_fall_back_to_the_unfiltered_feed(self):
+        for params in (
+            {"latitude": "nan", "longitude": -74.0},
+            {"latitude": "inf", "longitude": -74.0},
+            {"latitude": 91, "longitude": -74.0},
+            {"latitude": 40.0, "longitude": -181},
+            {"latitude": 40.0, "longitude": -74.0, "radius": "nan"},
+            {"latitude": 40.0, "longitude": -74.0, "radius": -5},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(reverse("activity-list"), params)
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                ids = [item["id"] for item in response.data["results"]]
+                self.assertIn(self.far.id, ids)
+
+        with self.assertRaises(ValueError):
+            covering_geohashes(float("nan"), -74.0, 5)
+
+    def test_tile_is_reused_until_approval_signal(self):
+        pending = Activity.objects.get(title="Pending")
+        self._feed_ids()
+
+        # Bulk updates bypass post_save, so the cached tile is still served.
+        Activity.objects.filter(pk=pending.pk).update(is_approved=True)
+        self.assertNotIn(pending.id, self._feed_ids())
+
+        activities_approval_changed.send(
+            sender=Activity, points=[(pending.latitude, pending.longitude)]
+        )
+        self.assertIn(pending.id, self._feed_ids())
+
+    def test_admin_approval_of_a_filtered_changelist_invalidates_tile(self):
+        pending = Activity.objects.get(title="Pending")
+        self._feed_ids()
+
+        # The changelist filtered on is_approved=False no longer matches after update().
+        ActivityAdmin(Activity, admin.site).approve_activities(
+            None, Activity.objects.filter(pk=pending.pk, is_approved=False)
+        )
+
+        self.assertIn(pending.id, self._feed_ids())
+
+    def test_activity_save_invalidates_tile(self):
+        self._feed_ids()
+
+        fresh = self._create_activity(self.host, "Fresh", 40.0004, is_approved=True)
+
+        self.assertIn(fresh.id, self._feed_ids())
+
+    def test_unrelated_edits_keep_tile(self):
+        pending = Activity.objects.get(title="Pending")
+        self._feed_ids()
+        Activity.objects.filter(pk=pending.pk).update(is_approved=True)
+
+        # Drafts, approved activities in other regions and non-feed fields do not invalidate.
+        self.own_draft.title = "Renamed Draft"
+        self.own_draft.save()
+        self._create_activity(self.host, "Elsewhere", 10.0, is_approved=True)
+        self.near.description = "Edited."
+        self.near.save()
+        self.assertNotIn(pending.id, self._feed_ids())
+
+        self.near.latitude = 40.0005
+        self.near.save()
+        self.assertIn(pending.id, self._feed_ids())
+
+
+class ActivityPayloadShapeTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="payload-host",
+            email="payload-host@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Payload Event",
+            description="A long description that compact cards leave out.",
+            location="Hall",
+            latitude=10.0,
+            longitude=20.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=5,
+            tags=["games"],
+            images=["https://example.com/cover.jpg", "https://example.com/other.jpg"],
+        )
+        participant = User.objects.create_user(
+            username="payload-guest",
+            email="payload-guest@example.com",
+            password="password123",
+        )
+        ActivityParticipant.objects.create(
+            activity=self.activity, user=participant, status="confirmed"
+        )
+        self.client.force_authenticate(self.host)
+
+    def test_fields_param_limits_keys(self):
+        response = self.client.get(reverse("activity-list"), {"fields": "title,participant_count"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data["results"][0]
+        self.assertEqual(set(item), {"id", "title", "participant_count"})
+        self.assertEqual(item["participant_count"], 1)
+
+    def test_compact_payload_uses_card_serializer(self):
+        response = self.client.get(reverse("hosted-activities"), {"payload": "compact"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data["results"][0]
+        self.assertNotIn("description", item)
+        self.assertNotIn("images", item)
+        self.assertNotIn("time", item)
+        self.assertEqual(item["coverImage"], "https://example.com/cover.jpg")
+        self.assertEqual(item["participantCount"], 1)
+        self.assertEqual(item["maxParticipants"], 5)
+
+    def test_compact_payload_honours_fields_param(self):
+        response = self.client.get(
+            reverse("activity-list"), {"payload": "compact", "fields": "title,dateTime"}
+        )
+
+        item = response.data["results"][0]
+        self.assertEqual(set(item), {"id", "title", "dateTime"})
+
+
+class HappeningSoonTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="soon-user",
+            email="soon-user@example.com",
+            password="password123",
+        )
+        self.host = User.objects.create_user(
+            username="soon-host",
+            email="soon-host@example.com",
+            password="password123",
+        )
+        self.later = self._create_activity("Later Today", 40.01, hours=2)
+        self.sooner = self._create_activity("Sooner", 40.02, hours=1)
+        self.tomorrow = self._create_activity("Tomorrow", 40.0, hours=20)
+        self.far = self._create_activity("Far Away", 41.0, hours=1)
+        self.pending = self._create_activity("Pending", 40.0, hours=1, is_approved=False)
+        self.client.force_authenticate(self.user)
+
+    def _create_activity(self, title, latitude, hours, is_approved=True):
+        return Activity.objects.create(
+            host=self.host,
+            is_approved=is_approved,
+            title=title,
+            description="Happening soon fixture.",
+            location="Pier",
+            latitude=latitude,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(hours=hours),
+            capacity=5,
+            tags=[],
+            images=[],
+        )
+
+    def _soon_ids(self, **params):
+        response = self.client.get(
+            reverse("activity-happening-soon"),
+            {"latitude": 40.0, "longitude": -74.0, **params},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_covering_geohashes_include_neighbouring_cells(self):
+        cells = covering_geohashes(40.0, -74.0, 5)
+
+        self.assertIn(encode_geohash(40.0, -74.0), cells)
+        self.assertIn(encode_geohash(40.04, -74.05), cells)
+
+    def test_refresh_materializes_approved_activities_in_horizon(self):
+        result = refresh_upcoming_activity_slots()
+
+        self.assertEqual(result, {"created": 4, "updated": 0, "deleted": 0})
+        self.assertEqual(
+            set(UpcomingActivitySlot.objects.values_list("activity_id", flat=True)),
+            {self.later.id, self.sooner.id, self.tomorrow.id, self.far.id},
+        )
+
+    def test_refresh_only_writes_changes(self):
+        refresh_upcoming_activity_slots()
+
+        Activity.objects.filter(pk=self.later.pk).update(is_approved=False)
+        Activity.objects.filter(pk=self.sooner.pk).update(time=timezone.now() + timedelta(hours=4))
+        Activity.objects.filter(pk=self.pending.pk).update(is_approved=True)
+
+        result = refresh_upcoming_activity_slots()
+        self.assertEqual(result, {"created": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(
+            refresh_upcoming_activity_slots(), {"created": 0, "updated": 0, "deleted": 0}
+        )
+
+    def test_endpoint_returns_nearby_activities_soonest_first(self):
+        refresh_upcoming_activity_slots()
+
+        self.assertEqual(self._soon_ids(), [self.sooner.id, self.later.id])
+        self.assertEqual(
+            self._soon_ids(hours=24), [self.sooner.id, self.later.id, self.tomorrow.id]
+        )
+
+    def test_endpoint_excludes_blocked_hosts(self):
+        refresh_upcoming_activity_slots()
+        BlockedUser.objects.create(blocker=self.user, blocked=self.host)
+
+        self.assertEqual(self._soon_ids(), [])
+
+    def test_endpoint_requires_coordinates(self):
+        response = self.client.get(reverse("activity-happening-soon"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_rejects_invalid_parameters(self):
+        for params in (
+            {"latitude": "nan"},
+            {"latitude": "inf"},
+            {"latitude": 91},
+            {"longitude": 181},
+            {"radius": "nan"},
+            {"radius": 0},
+            {"radius": "inf"},
+            {"hours": "nan"},
+            {"hours": -1},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    reverse("activity-happening-soon"),
+                    {"latitude": 40.0, "longitude": -74.0, **params},
+                )
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HostedActivitiesStreamTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="stream-host",
+            email="stream-host@example.com",
+            password="password123",
+        )
+        for index in range(3):
+            Activity.objects.create(
+                host=self.host,
+                is_approved=True,
+                title=f"Stream Event {index}",
+                description="Streamed to the dashboard.",
+                location="Hall",
+                latitude=10.0,
+                longitude=20.0,
+                time=timezone.now() - timedelta(days=index),
+                capacity=5,
+                tags=[],
+                images=[],
+            )
+        self.client.force_authenticate(self.host)
+
+    def _stream_rows(self, **params):
+        response = self.client.get(reverse("hosted-activities"), {"stream": "ndjson", **params})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        with CaptureQueriesContext(connection) as queries:
+            body = b"".join(response.streaming_content).decode()
+        self.assertFalse(any("COUNT(*)" in query["sql"] for query in queries.captured_queries))
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_stream_matches_paginated_payload(self):
+        paginated = self.client.get(reverse("hosted-activities")).json()["results"]
+
+        self.assertEqual(self._stream_rows(), paginated)
+
+    def test_stream_honours_compact_payload(self):
+        rows = self._stream_rows(payload="compact")
+
+        self.assertEqual(len(rows), 3)
+        self.assertNotIn("description", rows[0])
+        self.assertIn("coverImage", rows[0])
+
+
+class TicketReservationTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="hold-host",
+            email="hold-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="hold-buyer",
+            email="hold-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Launch Night",
+            description="Limited tickets.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=3),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=15.00,
+            max_tickets=2,
+        )
+        self.client.force_authenticate(self.buyer)
+        self.url = reverse("activity-ticket-buy", args=[self.activity.id])
+
+    def _send_webhook(self, event_type, session_id):
+        with patch("activities.views.stripe.Webhook.construct_event") as mock_construct_event:
+            mock_construct_event.return_value = {
+                "id": f"evt_{event_type}_{session_id}",
+                "type": event_type,
+                "data": {"object": {"id": session_id, "payment_intent": "pi_hold"}},
+            }
+            return self.client.post(
+                reverse("stripe-webhook"), data={}, format="json", HTTP_STRIPE_SIGNATURE="sig"
+            )
+
+    def test_purchase_holds_inventory_until_session_expiry(self):
+        with StripeStubServer() as stub, self.settings(STRIPE_API_BASE=stub.url):
+            response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ticket = Ticket.objects.get(stripe_session_id=response.data["session_id"])
+        self.assertIsNotNone(ticket.reserved_until)
+        _, form, _ = stub.requests[0]
+        self.assertEqual(int(form["expires_at"]), int(ticket.reserved_until.timestamp()))
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 1)
+        self.assertEqual(self.activity.tickets_available, 1)
+
+    @patch("activities.views.create_checkout_session")
+    def test_holds_exhaust_inventory(self, mock_session_create):
+        mock_session_create.side_effect = [{"id": "cs_hold_1"}, {"id": "cs_hold_2"}]
+
+        for _ in range(2):
+            self.assertEqual(
+                self.client.post(self.url, {}, format="json").status_code,
+                status.HTTP_201_CREATED,
+            )
+        response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data.get("message"), "Tickets are sold out.")
+        self.assertEqual(Ticket.objects.filter(activity=self.activity).count(), 2)
+
+    @patch("activities.views.create_checkout_session")
+    def test_stripe_failure_releases_hold(self, mock_session_create):
+        mock_session_create.side_effect = stripe.error.StripeError("card network down")
+
+        response = self.client.post(self.url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(Ticket.objects.get(activity=self.activity).status, "cancelled")
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 0)
+
+    @patch("activities.views.create_checkout_session")
+    def test_completed_checkout_converts_hold_to_sale(self, mock_session_create):
+        mock_session_create.return_value = {"id": "cs_hold_1"}
+        self.client.post(self.url, {}, format="json")
+
+        self._send_webhook("checkout.session.completed", "cs_hold_1")
+        self._send_webhook("checkout.session.completed", "cs_hold_1")
+
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 0)
+        self.assertEqual(self.activity.tickets_sold, 1)
+        ticket = Ticket.objects.get(stripe_session_id="cs_hold_1")
+        self.assertEqual(ticket.status, "paid")
+        self.assertIsNone(ticket.reserved_until)
+
+    @patch("activities.views.create_checkout_session")
+    def test_expired_checkout_releases_hold(self, mock_session_create):
+        mock_session_create.return_value = {"id": "cs_hold_1"}
+        self.client.post(self.url, {}, format="json")
+
+        self._send_webhook("checkout.session.expired", "cs_hold_1")
+
+        self.assertEqual(Ticket.objects.get(stripe_session_id="cs_hold_1").status, "cancelled")
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 0)
+
+    def test_sweeper_expires_lapsed_holds(self):
+        ticket = create_ticket_hold(self.activity, self.buyer)
+
+        self.assertEqual(expire_ticket_holds(), 0)
+        self.assertEqual(expire_ticket_holds(now=ticket.reserved_until + timedelta(seconds=1)), 1)
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.status, "cancelled")
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 0)
+
+    def test_payment_after_sweep_is_still_counted_as_sold(self):
+        ticket = create_ticket_hold(self.activity, self.buyer)
+        ticket.stripe_session_id = "cs_late"
+        ticket.save(update_fields=["stripe_session_id"])
+        expire_ticket_holds(now=ticket.reserved_until + timedelta(seconds=1))
+
+        self._send_webhook("checkout.session.completed", "cs_late")
+
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_reserved, 0)
+        self.assertEqual(self.activity.tickets_sold, 1)
+
+
+class TicketReservationConcurrencyTests(TransactionTestCase):
+    def test_concurrent_buyers_never_oversell(self):
+        host = User.objects.create_user(
+            username="rush-host", email="rush-host@example.com", password="password123"
+        )
+        buyer = User.objects.create_user(
+            username="rush-buyer", email="rush-buyer@example.com", password="password123"
+        )
+        activity = Activity.objects.create(
+            host=host,
+            is_approved=True,
+            title="Launch Rush",
+            description="Everyone wants in.",
+            location="Arena",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=10.00,
+            max_tickets=3,
+        )
+        buyers = 12
+        barrier = threading.Barrier(buyers)
+        results = []
+
+        def buy():
+            try:
+                barrier.wait()
+                results.append(create_ticket_hold(activity, buyer) is not None)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 3)
+        activity.refresh_from_db()
+        self.assertEqual(activity.tickets_reserved, 3)
+        self.assertEqual(Ticket.objects.filter(activity=activity).count(), 3)
+
+
+class StripeCheckoutClientTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="stub-host",
+            email="stub-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="stub-buyer",
+            email="stub-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Stubbed Checkout",
+            description="Goes through the local Stripe stub.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=3),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=19.99,
+            max_tickets=5,
+        )
+        self.client.force_authenticate(self.buyer)
+        self.url = reverse("activity-ticket-buy", args=[self.activity.id])
+
+    def test_purchases_reuse_one_connection_without_global_api_key(self):
+        stripe.api_key = None
+        with (
+            StripeStubServer() as stub,
+            self.settings(STRIPE_API_BASE=stub.url, STRIPE_API_KEY="sk_test_stub"),
+        ):
+            responses = [self.client.post(self.url, {}, format="json") for _ in range(3)]
+
+        self.assertEqual([r.status_code for r in responses], [status.HTTP_201_CREATED] * 3)
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(stub.connection_count, 1)
+        self.assertIsNone(stripe.api_key)
+
+        path, form, _ = stub.requests[0]
+        self.assertEqual(path, "/v1/checkout/sessions")
+        self.assertEqual(form["line_items[0][price_data][unit_amount]"], "1999")
+        ticket = Ticket.objects.get(stripe_session_id=responses[0].data["session_id"])
+        self.assertEqual(form["metadata[ticket_id]"], str(ticket.ticket_id))
+
+
+class StripeWebhookInboxTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="inbox-host",
+            email="inbox-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="inbox-buyer",
+            email="inbox-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Inbox Event",
+            description="Webhook inbox.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=3),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=20.00,
+            max_tickets=5,
+        )
+
+    def _ticket(self, session_id):
+        return Ticket.objects.create(
+            buyer=self.buyer,
+            activity=self.activity,
+            status="pending",
+            stripe_session_id=session_id,
+        )
+
+    def _event(self, event_id, session_id, event_type="checkout.session.completed"):
+        return {"id": event_id, "type": event_type, "data": {"object": {"id": session_id}}}
+
+    def _post(self, event):
+        with patch("activities.views.stripe.Webhook.construct_event", return_value=event):
+            return self.client.post(
+                reverse("stripe-webhook"), data={}, format="json", HTTP_STRIPE_SIGNATURE="sig"
+            )
+
+    @patch("activities.tasks.process_stripe_webhook_events.delay")
+    def test_delivery_is_acknowledged_with_a_single_insert(self, mock_delay):
+        self._ticket("cs_inbox_1")
+        event = self._event("evt_inbox_1", "cs_inbox_1")
+
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                response = self._post(event)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(StripeWebhookEvent.objects.filter(event_id="evt_inbox_1").count(), 1)
+        # The duplicate delivery does not wake the worker again.
+        self.assertEqual(mock_delay.call_count, 1)
+
+    def test_event_without_id_is_rejected(self):
+        response = self._post({"type": "checkout.session.completed", "data": {"object": {}}})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeWebhookEvent.objects.exists())
+
+    def test_unhandled_event_types_are_not_stored(self):
+        response = self._post(self._event("evt_other", "cs_other", "customer.created"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(StripeWebhookEvent.objects.exists())
+
+    def test_batch_applies_events_once(self):
+        first = self._ticket("cs_batch_1")
+        second = self._ticket("cs_batch_2")
+        record_stripe_event(self._event("evt_batch_1", "cs_batch_1"))
+        record_stripe_event(self._event("evt_batch_2", "cs_batch_2"))
+        record_stripe_event(self._event("evt_batch_unknown", "cs_unknown"))
+
+        paid_ticket_ids = process_pending_stripe_events()
+
+        self.assertCountEqual(paid_ticket_ids, [first.id, second.id])
+        self.assertFalse(StripeWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(process_pending_stripe_events(), [])
+        self.activity.refresh_from_db()
+        self.assertEqual(self.activity.tickets_sold, 2)
+
+    def test_failed_event_is_retried_on_next_batch(self):
+        ticket = self._ticket("cs_retry")
+        record_stripe_event(self._event("evt_retry", "cs_retry"))
+
+        with patch(
+            "activities.webhooks.confirm_ticket_purchase", side_effect=RuntimeError("db blip")
+        ):
+            self.assertEqual(process_pending_stripe_events(), [])
+
+        event = StripeWebhookEvent.objects.get(event_id="evt_retry")
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("db blip", event.last_error)
+
+        self.assertEqual(process_pending_stripe_events(), [ticket.id])
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(event.attempts, 2)
+
+
+class TicketQRStorageTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="qr-host",
+            email="qr-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="qr-buyer",
+            email="qr-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="QR Event",
+            description="QR storage.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=3),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=15.00,
+            max_tickets=5,
+        )
+
+    def _ticket(self, **kwargs):
+        return Ticket.objects.create(
+            buyer=self.buyer,
+            activity=self.activity,
+            status="paid",
+            purchased_at=timezone.now(),
+            **kwargs,
+        )
+
+    def test_generated_qr_is_stored_and_listed_by_url(self):
+        ticket = self._ticket()
+
+        name = generate_ticket_qr_code(ticket.id)
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.qr_code_image, name)
+        self.assertEqual(ticket.qr_code_data_url, "")
+        self.assertTrue(ticket_qr_storage().exists(name))
+
+        self.client.force_authenticate(self.buyer)
+        response = self.client.get(reverse("ticket-list"))
+        results = response.data.get("results", response.data)
+        self.assertNotIn("qrCodeDataUrl", results[0])
+        self.assertTrue(results[0]["qrCodeUrl"].endswith(f"/api/activities/tickets/qr/{name}"))
+
+    def test_batch_generation_updates_all_tickets_in_one_statement(self):
+        tickets = [self._ticket() for _ in range(3)]
+        ticket_ids = [ticket.id for ticket in tickets] + [999999]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(generate_ticket_qr_codes(ticket_ids), 3)
+
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        for ticket in tickets:
+            ticket.refresh_from_db()
+            self.assertTrue(ticket_qr_storage().exists(ticket.qr_code_image))
+
+    def test_identical_images_share_one_stored_file(self):
+        content = b"same-qr-bytes"
+
+        first = store_qr_image(content, "png")
+        second = store_qr_image(content, "png")
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, qr_storage_name(content, "png"))
+
+    def test_qr_image_is_served_with_immutable_cache_headers(self):
+        name = store_qr_image(b"served-qr-bytes", "png")
+
+        response = self.client.get(reverse("ticket-qr-image", args=[name]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["Cache-Control"], QR_CACHE_CONTROL)
+        self.assertIn(name.split("/")[1].split(".")[0], response["ETag"])
+        self.assertEqual(b"".join(response.streaming_content), b"served-qr-bytes")
+
+    def test_unknown_or_malformed_qr_names_are_not_found(self):
+        missing = qr_storage_name(b"never-stored", "png")
+
+        for name in [missing, "../settings.py", "ab/not-a-digest.png"]:
+            response = self.client.get(reverse("ticket-qr-image", args=[name]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_backfill_moves_inline_data_urls_into_storage(self):
+        content = b"legacy-qr-bytes"
+        legacy = self._ticket(
+            qr_code_data_url="data:image/png;base64," + base64.b64encode(content).decode()
+        )
+        broken = self._ticket(qr_code_data_url="data:text/plain;base64,AAAA")
+
+        call_command(
+            "backfill_ticket_qr_images", batch_size=1, stdout=io.StringIO(), stderr=io.StringIO()
+        )
+
+        legacy.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual(legacy.qr_code_image, qr_storage_name(content, "png"))
+        self.assertEqual(legacy.qr_code_data_url, "")
+        with ticket_qr_storage().open(legacy.qr_code_image, "rb") as image:
+            self.assertEqual(image.read(), content)
+        self.assertEqual(broken.qr_code_image, "")
+
+
+class TicketOfflineRedemptionTests(APITestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="door-host",
+            email="door-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="door-buyer",
+            email="door-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Door Event",
+            description="Offline scanning.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=10.00,
+            max_tickets=10,
+        )
+        self.paid = [
+            Ticket.objects.create(buyer=self.buyer, activity=self.activity, status="paid")
+            for _ in range(3)
+        ]
+        self.pending = Ticket.objects.create(
+            buyer=self.buyer, activity=self.activity, status="pending"
+        )
+
+    def test_manifest_lists_paid_tickets_sorted_and_signed(self):
+        self.client.force_authenticate(self.host)
+        response = self.client.get(reverse("activity-ticket-manifest", args=[self.activity.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        manifest = response.data
+        raw = base64.b64decode(manifest["tickets"])
+        chunks = [raw[offset : offset + 16] for offset in range(0, len(raw), 16)]
+        self.assertEqual(manifest["count"], 3)
+        self.assertEqual(chunks, sorted(ticket.ticket_id.bytes for ticket in self.paid))
+        self.assertTrue(verify_ticket_manifest(manifest))
+        self.assertFalse(verify_ticket_manifest({**manifest, "tickets": manifest["tickets"][4:]}))
+
+        # A device verifies with only the public key from the response.
+        public_key = Ed25519PublicKey.from_public_bytes(base64.b64decode(manifest["publicKey"]))
+        public_key.verify(
+            base64.b64decode(manifest["signature"]),
+            f"{manifest['activityId']}:{manifest['issuedAt']}:{manifest['tickets']}".encode(),
+        )
+
+    def test_manifest_is_host_only(self):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.get(reverse("activity-ticket-manifest", args=[self.activity.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_sync_applies_scans_in_bulk(self):
+        first, second, _ = self.paid
+        scanned_at = timezone.now() - timedelta(minutes=5)
+        scans = [
+            {"ticketId": str(first.ticket_id), "scannedAt": scanned_at.isoformat()},
+            {"ticketId": str(second.ticket_id)},
+            {"ticketId": str(first.ticket_id)},
+            {"ticketId": str(self.pending.ticket_id)},
+            {"ticketId": "00000000-0000-0000-0000-000000000000"},
+        ]
+
+        self.client.force_authenticate(self.host)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("activity-ticket-redemptions", args=[self.activity.id]),
+                {"scans": scans},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["redeemed"], 2)
+        outcomes = [
+            (result["ticketId"], result["successful"]) for result in response.data["results"]
+        ]
+        self.assertEqual(outcomes.count((str(first.ticket_id), True)), 1)
+        self.assertEqual(outcomes.count((str(first.ticket_id), False)), 1)
+        self.assertIn(("00000000-0000-0000-0000-000000000000", False), outcomes)
+
+        writes = [
+            query["sql"].split()[0] for query in queries if query["sql"][:6] in {"UPDATE", "INSERT"}
+        ]
+        self.assertEqual(writes, ["UPDATE", "INSERT"])
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, "used")
+        self.assertEqual(first.redeemed_at, scanned_at)
+        self.assertEqual(TicketRedemptionLog.objects.filter(activity=self.activity).count(), 4)
+        self.assertEqual(
+            TicketRedemptionLog.objects.filter(activity=self.activity, successful=True).count(), 2
+        )
+
+    def test_sync_reports_previously_redeemed_tickets(self):
+        ticket = self.paid[0]
+        ticket.status = "used"
+        ticket.save(update_fields=["status"])
+
+        self.client.force_authenticate(self.host)
+        response = self.client.post(
+            reverse("activity-ticket-redemptions", args=[self.activity.id]),
+            {"scans": [{"ticketId": str(ticket.ticket_id)}]},
+            format="json",
+        )
+
+        self.assertEqual(response.data["redeemed"], 0)
+        self.assertEqual(response.data["results"][0]["status"], "used")
+
+
+class TicketAnalyticsTests(APITestCase):
+    def setUp(self):
+        clear_used_ticket_cache()
+        self.host = User.objects.create_user(
+            username="stats-host",
+            email="stats-host@example.com",
+            password="password123",
+        )
+        self.buyer = User.objects.create_user(
+            username="stats-buyer",
+            email="stats-buyer@example.com",
+            password="password123",
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Stats Event",
+            description="Ticket analytics.",
+            location="Venue",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=10,
+            tags=[],
+            images=[],
+            is_ticketed=True,
+            ticket_price=10.00,
+            max_tickets=10,
+        )
+
+    def _sell(self):
+        ticket = Ticket.objects.create(buyer=self.buyer, activity=self.activity, status="pending")
+        confirm_ticket_purchase(ticket)
+        ticket.refresh_from_db()
+        return ticket
+
+    def _validate(self, ticket):
+        return self.client.post(
+            reverse("ticket-validate", args=[ticket.ticket_id]),
+            data={"ticketToken": ticket.get_qr_token()},
+            format="json",
+        )
+
+    def _report(self):
+        return self.client.get(reverse("activity-ticket-analytics", args=[self.activity.id]))
+
+    def test_sales_and_scans_are_rolled_up_incrementally(self):
+        first, second = self._sell(), self._sell()
+        self.client.force_authenticate(self.host)
+        self._validate(first)
+        clear_used_ticket_cache()
+        self._validate(first)
+        self._validate(second)
+
+        report = self._report().data
+
+        self.assertEqual(report["sold"]["total"], 2)
+        self.assertEqual(len(report["sold"]["hourly"]), 1)
+        self.assertEqual(report["redeemed"]["total"], 2)
+        self.assertEqual(report["failures"]["reasons"], {"already_used": 1})
+        self.assertEqual(
+            TicketRollup.objects.filter(activity=self.activity, kind="redeemed").count(), 1
+        )
+
+    def test_report_reads_only_rollups(self):
+        self._sell()
+        self.client.force_authenticate(self.host)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self._report()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tables = " ".join(query["sql"] for query in queries)
+        self.assertIn("activities_ticketrollup", tables)
+        self.assertNotIn('"activities_ticket"', tables)
+        self.assertNotIn("activities_ticketredemptionlog", tables)
+
+    def test_report_is_host_only(self):
+        self.client.force_authenticate(self.buyer)
+
+        self.assertEqual(self._report().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        ticket = self._sell()
+        self.client.force_authenticate(self.host)
+        self._validate(ticket)
+        self.client.post(
+            reverse("activity-ticket-redemptions", args=[self.activity.id]),
+            {"scans": [{"ticketId": str(ticket.ticket_id)}]},
+            format="json",
+        )
+        incremental = self._report().data
+
+        rebuild_ticket_rollups([self.activity.id])
+
+        self.assertEqual(self._report().data, incremental)
@@ -0,0 +1,105 @@
+"""Materialized "happening soon" lookups.
+
+Approved activities starting within ``UPCOMING_HORIZON_HOURS`` are copied into
+``UpcomingActivitySlot`` rows keyed by geohash cell and start hour. A "next N
+hours within R km" read then touches only the covering cells' hour buckets via
+one covering index, and the exact time/distance cut happens in Python on the
+handful of candidate rows.
+"""
+
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from .feed_cache import covering_geohashes, encode_geohash, haversine_km
+from .models import Activity, UpcomingActivitySlot
+
+UPCOMING_GEOHASH_PRECISION = 5
+UPCOMING_HORIZON_HOURS = 24
+HAPPENING_SOON_MAX_RADIUS_KM = 25
+
+_SLOT_FIELDS = ("host_id", "geohash", "hour_bucket", "time", "latitude", "longitude")
+
+
+def hour_bucket(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _build_slot(activity_id, host_id, latitude, longitude, start_time):
+    return UpcomingActivitySlot(
+        activity_id=activity_id,
+        host_id=host_id,
+        geohash=encode_geohash(latitude, longitude, UPCOMING_GEOHASH_PRECISION),
+        hour_bucket=hour_bucket(start_time),
+        time=start_time,
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+def refresh_upcoming_slots(now=None):
+    """Bring the materialized slots in line with the current horizon.
+
+    Desired rows are read from the ``is_approved``/``time`` partial index and
+    diffed against the existing slots; only new, changed and stale rows are
+    written.
+    """
+
+    now = now or timezone.now()
+    desired = {
+        activity_id: _build_slot(activity_id, host_id, latitude, longitude, start_time)
+        for activity_id, host_id, latitude, longitude, start_time in Activity.objects.filter(
+            is_approved=True,
+            time__gte=now,
+            time__lt=now + timedelta(hours=UPCOMING_HORIZON_HOURS),
+        ).values_list("id", "host_id", "latitude", "longitude", "time")
+    }
+    existing = {
+        row[0]: row[1:]
+        for row in UpcomingActivitySlot.objects.values_list("activity_id", *_SLOT_FIELDS)
+    }
+
+    stale_ids = existing.keys() - desired.keys()
+    created = [slot for activity_id, slot in desired.items() if activity_id not in existing]
+    updated = [
+        slot
+        for activity_id, slot in desired.items()
+        if activity_id in existing
+        and existing[activity_id] != tuple(getattr(slot, field) for field in _SLOT_FIELDS)
+    ]
+
+    with transaction.atomic():
+        if stale_ids:
+            UpcomingActivitySlot.objects.filter(activity_id__in=stale_ids).delete()
+        UpcomingActivitySlot.objects.bulk_create(created)
+        UpcomingActivitySlot.objects.bulk_update(
+            updated, [field.removesuffix("_id") for field in _SLOT_FIELDS]
+        )
+
+    return {"created": len(created), "updated": len(updated), "deleted": len(stale_ids)}
+
+
+def happening_soon_activity_ids(
+    latitude, longitude, radius_km, hours, exclude_host_ids=(), now=None
+):
+    """Return ids of activities starting within ``hours`` and ``radius_km``, soonest first."""
+
+    now = now or timezone.now()
+    window_end = now + timedelta(hours=hours)
+    rows = UpcomingActivitySlot.objects.filter(
+        geohash__in=covering_geohashes(latitude, longitude, radius_km, UPCOMING_GEOHASH_PRECISION),
+        hour_bucket__gte=hour_bucket(now),
+        hour_bucket__lte=hour_bucket(window_end),
+    ).values_list("activity_id", "host_id", "time", "latitude", "longitude")
+
+    ranked = []
+    for activity_id, host_id, start_time, row_latitude, row_longitude in rows:
+        if host_id in exclude_host_ids or not now <= start_time <= window_end:
+            continue
+        distance_km = haversine_km(latitude, longitude, row_latitude, row_longitude)
+        if distance_km <= radius_km:
+            ranked.append((start_time, distance_km, activity_id))
+    ranked.sort()
+    return [activity_id for _, _, activity_id in ranked]
@@ -6,6 +6,11 @@ urlpatterns = [
     path("", views.ActivityListCreateView.as_view(), name="activity-list"),
     path("<int:pk>/", views.ActivityDetailView.as_view(), name="activity-detail"),
     path("hosted/", views.HostedActivitiesView.as_view(), name="hosted-activities"),
+    path(
+        "happening-soon/",
+        views.HappeningSoonView.as_view(),
+        name="activity-happening-soon",
+    ),
     path("<int:pk>/join/", views.join_activity, name="join-activity"),
     path("<int:pk>/leave/", views.leave_activity, name="leave-activity"),
     path("<int:pk>/chat/", views.activity_chat, name="activity-chat"),
@@ -14,7 +19,27 @@ urlpatterns = [
         views.ActivityTicketPurchaseView.as_view(),
         name="activity-ticket-buy",
     ),
+    path(
+        "<int:pk>/tickets/manifest/",
+        views.TicketManifestView.as_view(),
+        name="activity-ticket-manifest",
+    ),
+    path(
+        "<int:pk>/tickets/analytics/",
+        views.TicketAnalyticsView.as_view(),
+        name="activity-ticket-analytics",
+    ),
+    path(
+        "<int:pk>/tickets/redemptions/",
+        views.TicketRedemptionSyncView.as_view(),
+        name="activity-ticket-redemptions",
+    ),
     path("tickets/my/", views.UserTicketListView.as_view(), name="ticket-list"),
+    path(
+        "tickets/qr/<path:name>",
+        views.TicketQRImageView.as_view(),
+        name="ticket-qr-image",
+    ),
     path(
         "tickets/<uuid:ticket_id>/validate/",
         views.ValidateTicketView.as_view(),
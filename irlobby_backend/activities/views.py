@@ -1,14 +1,19 @@
+import math
+
 import stripe
 from django.conf import settings
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
 from django.core.signing import BadSignature
-from django.db.models import F, Q
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from rest_framework import generics, status
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
@@ -17,67 +22,156 @@ from rest_framework.views import APIView
 from waffle import flag_is_active
 
 from matches.models import Match
-from moderation.models import BlockedUser
-
+from moderation.utils import get_blocked_user_ids
+from utils.fast_serializers import FastReadListMixin
+from utils.streaming import ndjson_response
+
+from .analytics import (
+    FAILURE_ALREADY_USED,
+    FAILURE_NOT_REDEEMABLE,
+    record_ticket_events,
+    scan_event,
+    ticket_analytics,
+)
+from .feed_cache import (
+    candidate_rows,
+    feed_tile_cache_enabled,
+    get_feed_tile,
+    rank_feed_rows,
+)
 from .models import Activity, ActivityParticipant, Ticket, TicketRedemptionLog
+from .payments import create_checkout_session
 from .permissions import IsHostOrReadOnly
+from .qr import QR_CACHE_CONTROL, QR_CONTENT_TYPES, QR_NAME_PATTERN, ticket_qr_storage
+from .redemption import (
+    build_ticket_manifest,
+    is_known_used_ticket,
+    remember_used_tickets,
+    sync_ticket_redemptions,
+)
+from .reservations import create_ticket_hold, release_ticket_hold
 from .serializers import (
+    ActivityCardSerializer,
     ActivitySerializer,
     TicketPurchaseSerializer,
+    TicketRedemptionSyncSerializer,
     TicketSerializer,
     TicketValidationSerializer,
 )
+from .upcoming import (
+    HAPPENING_SOON_MAX_RADIUS_KM,
+    UPCOMING_HORIZON_HOURS,
+    happening_soon_activity_ids,
+)
+from .webhooks import HANDLED_STRIPE_EVENT_TYPES, record_stripe_event
 
 
 def ticketing_enabled(request):
     return flag_is_active(request, "ticketed_events_enabled") or settings.ENABLE_TICKETING
 
 
-class ActivityListCreateView(generics.ListCreateAPIView):
+def parse_coordinates(latitude, longitude):
+    """Parse a latitude/longitude pair, raising ``ValueError`` unless it is on the globe."""
+
+    latitude, longitude = float(latitude), float(longitude)
+    # NaN fails every comparison, so the range checks also reject it.
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError("Coordinates are out of range.")
+    return latitude, longitude
+
+
+def with_confirmed_participant_count(queryset):
+    """Annotate ``confirmed_participant_count`` with a correlated COUNT subquery."""
+    confirmed = ActivityParticipant.objects.filter(
+        activity=OuterRef("pk"), status="confirmed"
+    ).order_by()
+    count = confirmed.annotate(total=Func(F("id"), function="COUNT")).values("total")
+    return queryset.annotate(
+        confirmed_participant_count=Coalesce(Subquery(count, output_field=IntegerField()), 0)
+    )
+
+
+def paginated_activity_response(view, queryset, activity_ids):
+    """Paginate an ordered id list and serialize the page's activities in that order."""
+    page = view.paginate_queryset(activity_ids)
+    page_ids = activity_ids if page is None else page
+    activities_by_id = with_confirmed_participant_count(queryset).in_bulk(page_ids)
+    activities = [
+        activities_by_id[activity_id] for activity_id in page_ids if activity_id in activities_by_id
+    ]
+    data = view.get_fast_read_serializer().serialize_many(activities)
+    if page is None:
+        return Response(data)
+    return view.get_paginated_response(data)
+
+
+class CompactPayloadMixin:
+    """Serve ``ActivityCardSerializer`` rows for ``?payload=compact`` reads."""
+
+    def get_serializer_class(self):
+        if self.request.method == "GET" and self.request.query_params.get("payload") == "compact":
+            return ActivityCardSerializer
+        return super().get_serializer_class()
+
+
+class ActivityListCreateView(FastReadListMixin, CompactPayloadMixin, generics.ListCreateAPIView):
     serializer_class = ActivitySerializer
     permission_classes = [IsAuthenticated]
 
+    filter_params = (
+        "category",
+        "location",
+        "skill_level",
+        "age_restriction",
+        "visibility",
+        "price_min",
+        "price_max",
+        "date_from",
+        "date_to",
+        "tags",
+    )
+
     def get_queryset(self):
-        blocked_ids = BlockedUser.objects.filter(blocker=self.request.user).values_list(
-            "blocked_id", flat=True
-        )
-        blocked_by_ids = BlockedUser.objects.filter(blocked=self.request.user).values_list(
-            "blocker_id", flat=True
-        )
-        exclude_ids = set(blocked_ids) | set(blocked_by_ids)
+        exclude_ids = get_blocked_user_ids(self.request.user)
 
-        queryset = (
-            Activity.objects.filter(Q(is_approved=True) | Q(host=self.request.user))
-            .exclude(host_id__in=exclude_ids)
-            .distinct()
-        )
+        queryset = Activity.objects.filter(Q(is_approved=True) | Q(host=self.request.user))
+        queryset = queryset.exclude(host_id__in=exclude_ids)
 
         if self.request.user.is_staff:
             queryset = Activity.objects.all()
 
         # Filter by location if provided
+        geo_filter = self.get_geo_filter()
+        if geo_filter is not None:
+            point, radius_km = geo_filter
+            # dwithin compiles to ST_DWithin, which can use the GiST index on
+            # location_point; distance_lte would compute ST_Distance per row.
+            queryset = queryset.filter(location_point__dwithin=(point, D(km=radius_km)))
+            queryset = queryset.annotate(distance=Distance("location_point", point))
+            queryset = self.apply_filters(queryset).order_by("distance", "-created_at")
+        else:
+            queryset = self.apply_filters(queryset).order_by("-created_at")
+
+        return with_confirmed_participant_count(queryset)
+
+    def get_geo_filter(self):
         latitude = self.request.query_params.get("latitude")
         longitude = self.request.query_params.get("longitude")
         radius = self.request.query_params.get("radius", 10)  # Default 10km radius
 
-        ordered_by_distance = False
-
-        if latitude and longitude:
-            try:
-                radius_km = float(radius)
-                point = Point(float(longitude), float(latitude), srid=4326)
-            except (TypeError, ValueError):
-                radius_km = None
-                point = None
-
-            if point and radius_km is not None:
-                queryset = queryset.filter(location_point__isnull=False)
-                queryset = queryset.annotate(distance=Distance("location_point", point))
-                queryset = queryset.filter(
-                    location_point__distance_lte=(point, D(km=radius_km))
-                ).order_by("distance", "-created_at")
-                ordered_by_distance = True
+        if not (latitude and longitude):
+            return None
 
+        try:
+            latitude, longitude = parse_coordinates(latitude, longitude)
+            radius_km = float(radius)
+        except (TypeError, ValueError):
+            return None
+        if not (math.isfinite(radius_km) and radius_km >= 0):
+            return None
+        return Point(longitude, latitude, srid=4326), radius_km
+
+    def apply_filters(self, queryset):
         category = self.request.query_params.get("category")
         if category:
             queryset = queryset.filter(category__icontains=category)
@@ -130,10 +224,44 @@ class ActivityListCreateView(generics.ListCreateAPIView):
             for tag in normalized_tags:
                 queryset = queryset.filter(tags__icontains=tag)
 
-        if ordered_by_distance:
-            return queryset
+        return queryset
 
-        return queryset.order_by("-created_at")
+    def list(self, request, *args, **kwargs):
+        geo_filter = self.get_geo_filter()
+        if geo_filter is None or request.user.is_staff or not feed_tile_cache_enabled():
+            return super().list(request, *args, **kwargs)
+
+        point, radius_km = geo_filter
+        filter_params = {
+            name: request.query_params[name]
+            for name in self.filter_params
+            if name in request.query_params
+        }
+
+        rows = list(
+            get_feed_tile(
+                point.y,
+                point.x,
+                radius_km,
+                filter_params,
+                self.apply_filters(Activity.objects.filter(is_approved=True)),
+            )
+        )
+        # The tile only holds approved activities; hosts also see their own drafts.
+        own_unapproved = self.apply_filters(
+            Activity.objects.filter(host=request.user, is_approved=False)
+        ).filter(location_point__dwithin=(point, D(km=radius_km)))
+        rows.extend(candidate_rows(own_unapproved))
+
+        activity_ids = rank_feed_rows(
+            rows,
+            point.y,
+            point.x,
+            radius_km,
+            exclude_host_ids=get_blocked_user_ids(request.user),
+        )
+
+        return paginated_activity_response(self, Activity.objects.all(), activity_ids)
 
     def perform_create(self, serializer):
         serializer.save(host=self.request.user)
@@ -144,9 +272,7 @@ class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsHostOrReadOnly]
 
     def get_queryset(self):
-        queryset = Activity.objects.filter(
-            Q(is_approved=True) | Q(host=self.request.user)
-        ).distinct()
+        queryset = Activity.objects.filter(Q(is_approved=True) | Q(host=self.request.user))
 
         if self.request.user.is_staff:
             return Activity.objects.all()
@@ -154,12 +280,58 @@ class ActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
         return queryset
 
 
-class HostedActivitiesView(generics.ListAPIView):
+class HostedActivitiesView(FastReadListMixin, CompactPayloadMixin, generics.ListAPIView):
+    serializer_class = ActivitySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Activity.objects.filter(host=self.request.user).order_by("-created_at")
+        return with_confirmed_participant_count(queryset)
+
+    def list(self, request, *args, **kwargs):
+        # Opt-in export for large dashboards: no COUNT query, rows streamed in chunks.
+        if request.query_params.get("stream") == "ndjson":
+            return ndjson_response(
+                self.get_fast_read_serializer(), self.filter_queryset(self.get_queryset())
+            )
+        return super().list(request, *args, **kwargs)
+
+
+class HappeningSoonView(FastReadListMixin, CompactPayloadMixin, generics.ListAPIView):
+    """Approved activities starting in the next ``hours`` within ``radius`` km."""
+
     serializer_class = ActivitySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Activity.objects.filter(host=self.request.user)
+        return Activity.objects.filter(is_approved=True)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            latitude, longitude = parse_coordinates(
+                request.query_params["latitude"], request.query_params["longitude"]
+            )
+            radius_km = float(request.query_params.get("radius", 5))
+            hours = float(request.query_params.get("hours", 3))
+            if not all(math.isfinite(value) and value > 0 for value in (radius_km, hours)):
+                raise ValueError("radius and hours must be positive.")
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {
+                    "message": "Valid latitude and longitude are required; "
+                    "radius and hours must be positive."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        activity_ids = happening_soon_activity_ids(
+            latitude,
+            longitude,
+            min(radius_km, HAPPENING_SOON_MAX_RADIUS_KM),
+            min(hours, UPCOMING_HORIZON_HOURS),
+            exclude_host_ids=get_blocked_user_ids(request.user),
+        )
+        return paginated_activity_response(self, self.get_queryset(), activity_ids)
 
 
 class TicketThrottle(UserRateThrottle):
@@ -187,56 +359,27 @@ class ActivityTicketPurchaseView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if activity.is_sold_out:
-            return Response(
-                {"message": "Tickets are sold out."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         serializer = TicketPurchaseSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         success_url = serializer.validated_data.get("successUrl") or settings.STRIPE_SUCCESS_URL
         cancel_url = serializer.validated_data.get("cancelUrl") or settings.STRIPE_CANCEL_URL
 
-        stripe.api_key = settings.STRIPE_API_KEY
-        try:
-            ticket = Ticket.objects.create(
-                buyer=request.user,
-                activity=activity,
-                status="pending",
+        ticket = create_ticket_hold(activity, request.user)
+        if ticket is None:
+            return Response(
+                {"message": "Tickets are sold out."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-            session = stripe.checkout.Session.create(
-                payment_method_types=["card"],
-                mode="payment",
-                line_items=[
-                    {
-                        "price_data": {
-                            "currency": activity.currency.lower(),
-                            "product_data": {
-                                "name": f"Ticket for {activity.title}",
-                                "description": activity.description[:200],
-                            },
-                            "unit_amount": int(activity.ticket_price * 100),
-                        },
-                        "quantity": 1,
-                    }
-                ],
-                metadata={
-                    "ticket_id": str(ticket.ticket_id),
-                    "activity_id": str(activity.id),
-                },
-                success_url=success_url,
-                cancel_url=cancel_url,
-            )
+        try:
+            session = create_checkout_session(activity, ticket, success_url, cancel_url)
             ticket.stripe_session_id = session["id"]
             ticket.save(update_fields=["stripe_session_id"])
 
             return Response({"session_id": session["id"]}, status=status.HTTP_201_CREATED)
         except stripe.error.StripeError as exc:
-            ticket.status = "cancelled"
-            ticket.save(update_fields=["status"])  # Keep the pending record for audit.
+            release_ticket_hold(ticket)  # Keep the cancelled record for audit.
             return Response({"message": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
 
 
@@ -246,7 +389,6 @@ class StripeWebhookView(APIView):
     def post(self, request):
         payload = request.body
         signature = request.headers.get("Stripe-Signature", "")
-        stripe.api_key = settings.STRIPE_API_KEY
 
         try:
             event = stripe.Webhook.construct_event(
@@ -257,37 +399,58 @@ class StripeWebhookView(APIView):
                 {"message": "Invalid webhook payload."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        if event["type"] == "checkout.session.completed":
-            session_data = event["data"]["object"]
-            stripe_session_id = session_data.get("id")
-            ticket = Ticket.objects.filter(stripe_session_id=stripe_session_id).first()
-            if not ticket:
-                metadata = session_data.get("metadata", {}) or {}
-                ticket_id = metadata.get("ticket_id")
-                if ticket_id:
-                    ticket = Ticket.objects.filter(ticket_id=ticket_id).first()
-
-            if ticket and ticket.status != "paid":
-                ticket.status = "paid"
-                ticket.purchased_at = timezone.now()
-                ticket.stripe_payment_intent_id = session_data.get("payment_intent")
-                ticket.save(update_fields=["status", "purchased_at", "stripe_payment_intent_id"])
-                Activity.objects.filter(pk=ticket.activity_id).update(
-                    tickets_sold=F("tickets_sold") + 1
-                )
-                from .tasks import generate_ticket_qr_code
-
-                generate_ticket_qr_code.delay(ticket.id)
+        if not event.get("id"):
+            return Response(
+                {"message": "Invalid webhook payload."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Acknowledge right away; a worker applies inbox rows in batches.
+        if event["type"] in HANDLED_STRIPE_EVENT_TYPES and record_stripe_event(event):
+            from .tasks import process_stripe_webhook_events
+
+            process_stripe_webhook_events.delay()
 
         return Response({"success": True})
 
 
-class UserTicketListView(generics.ListAPIView):
+class UserTicketListView(FastReadListMixin, generics.ListAPIView):
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Ticket.objects.filter(buyer=self.request.user).order_by("-created_at")
+        return (
+            Ticket.objects.filter(buyer=self.request.user)
+            .select_related("activity", "buyer")
+            .defer("qr_code_data_url")
+            .order_by("-created_at")
+        )
+
+
+class TicketQRImageView(APIView):
+    """Serve content-addressed QR images from the local ``ticket_qr`` storage.
+
+    Names are SHA-256 digests of the image bytes, so responses never change and
+    are marked immutable. They stay ``private``: the image is a bearer
+    credential for the ticket and must not sit in shared caches.
+    """
+
+    authentication_classes: list[type[BaseAuthentication]] = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, name):
+        match = QR_NAME_PATTERN.match(name)
+        if match is None:
+            raise Http404
+        storage = ticket_qr_storage()
+        try:
+            image = storage.open(name, "rb")
+        except FileNotFoundError:
+            raise Http404
+
+        response = FileResponse(image, content_type=QR_CONTENT_TYPES[match.group(1)])
+        response["Cache-Control"] = QR_CACHE_CONTROL
+        response["ETag"] = f'"{name.rsplit("/", 1)[1].split(".", 1)[0]}"'
+        return response
 
 
 class ValidateTicketView(APIView):
@@ -316,7 +479,17 @@ class ValidateTicketView(APIView):
                 {"message": "Ticket identifier mismatch."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        ticket = get_object_or_404(Ticket, ticket_id=ticket_uuid, activity_id=activity_id)
+        if is_known_used_ticket(activity_id, request.user.id, ticket_uuid):
+            return Response(
+                {"message": "Ticket has already been used."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ticket = get_object_or_404(
+            Ticket.objects.select_related("activity", "buyer"),
+            ticket_id=ticket_uuid,
+            activity_id=activity_id,
+        )
 
         if ticket.activity.host_id != request.user.id:
             return Response(
@@ -325,6 +498,7 @@ class ValidateTicketView(APIView):
             )
 
         if ticket.status == "used":
+            remember_used_tickets(activity_id, request.user.id, [ticket_uuid])
             TicketRedemptionLog.objects.create(
                 ticket=ticket,
                 activity=ticket.activity,
@@ -333,6 +507,7 @@ class ValidateTicketView(APIView):
                 status=ticket.status,
                 message="Ticket already used.",
             )
+            record_ticket_events([scan_event(activity_id, timezone.now(), FAILURE_ALREADY_USED)])
             return Response(
                 {"message": "Ticket has already been used."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -347,6 +522,7 @@ class ValidateTicketView(APIView):
                 status=ticket.status,
                 message="Ticket is not in a valid state for redemption.",
             )
+            record_ticket_events([scan_event(activity_id, timezone.now(), FAILURE_NOT_REDEEMABLE)])
             return Response(
                 {"message": "Ticket is not valid for redemption."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -355,6 +531,7 @@ class ValidateTicketView(APIView):
         ticket.status = "used"
         ticket.redeemed_at = timezone.now()
         ticket.save(update_fields=["status", "redeemed_at"])
+        remember_used_tickets(activity_id, request.user.id, [ticket_uuid])
 
         TicketRedemptionLog.objects.create(
             ticket=ticket,
@@ -364,6 +541,7 @@ class ValidateTicketView(APIView):
             status=ticket.status,
             message="Validated successfully.",
         )
+        record_ticket_events([scan_event(activity_id, ticket.redeemed_at)])
 
         return Response(
             {
@@ -376,6 +554,74 @@ class ValidateTicketView(APIView):
         )
 
 
+class HostTicketActivityMixin:
+    """Resolve the ticketed activity in the URL for its host, or return an error response."""
+
+    def get_host_activity(self, request, pk):
+        if not ticketing_enabled(request):
+            return None, Response(
+                {"detail": "Ticketing is not enabled."}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        activity = get_object_or_404(Activity.objects.only("id", "host_id"), pk=pk)
+        if activity.host_id != request.user.id:
+            return None, Response(
+                {"message": "Only the host can manage tickets for this activity."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        return activity, None
+
+
+class TicketManifestView(HostTicketActivityMixin, APIView):
+    """Ed25519-signed list of redeemable ticket UUIDs so hosts can check scans offline."""
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TicketThrottle]
+
+    def get(self, request, pk):
+        activity, error = self.get_host_activity(request, pk)
+        if error:
+            return error
+        response = Response(build_ticket_manifest(activity))
+        response["Cache-Control"] = "private, no-store"
+        return response
+
+
+class TicketAnalyticsView(HostTicketActivityMixin, APIView):
+    """Sales and check-in curves for the host, read from ``TicketRollup``."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        activity, error = self.get_host_activity(request, pk)
+        if error:
+            return error
+        return Response(ticket_analytics(activity))
+
+
+class TicketRedemptionSyncView(HostTicketActivityMixin, APIView):
+    """Apply a batch of offline scans in a single transaction."""
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [TicketThrottle]
+
+    def post(self, request, pk):
+        activity, error = self.get_host_activity(request, pk)
+        if error:
+            return error
+        serializer = TicketRedemptionSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = sync_ticket_redemptions(
+            activity, request.user, serializer.validated_data["scans"]
+        )
+        return Response(
+            {
+                "redeemed": sum(result["successful"] for result in results),
+                "results": results,
+            }
+        )
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def join_activity(request, pk):
@@ -475,12 +721,13 @@ def activity_chat(request, pk):
             )
 
             from chat.models import Conversation, Message
+            from chat.write_behind import new_message_id
 
             conversation, created = Conversation.objects.get_or_create(match=match)
 
             # Create the message
             message = Message.objects.create(
-                conversation=conversation, sender=user, text=message_text
+                id=new_message_id(), conversation=conversation, sender=user, text=message_text
             )
 
             from chat.serializers import MessageSerializer
@@ -0,0 +1,129 @@
+"""Stripe webhook inbox.
+
+The webhook view only verifies the signature and records the event with one
+``INSERT ... ON CONFLICT DO NOTHING`` on ``event_id``, so retries and duplicate
+deliveries cost a single insert. Only a new row wakes the processing task.
+``process_pending_stripe_events`` applies pending events in batches, with the
+ticket lookups for a batch resolved in two queries.
+"""
+
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import StripeWebhookEvent, Ticket
+from .reservations import confirm_ticket_purchase, release_ticket_hold
+
+logger = logging.getLogger(__name__)
+
+HANDLED_STRIPE_EVENT_TYPES = ("checkout.session.completed", "checkout.session.expired")
+STRIPE_EVENT_BATCH_SIZE = 100
+STRIPE_EVENT_MAX_ATTEMPTS = 5
+# Stripe retries deliveries for up to three days; keep processed ids past that.
+STRIPE_EVENT_RETENTION = timedelta(days=30)
+
+
+def record_stripe_event(event):
+    """Store a verified event in the inbox; returns ``False`` for a duplicate delivery."""
+    # bulk_create(ignore_conflicts=True) cannot report whether the row was new.
+    table = connection.ops.quote_name(StripeWebhookEvent._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} "
+            "(event_id, event_type, payload, received_at, attempts, last_error) "
+            "VALUES (%s, %s, %s, %s, 0, '') ON CONFLICT (event_id) DO NOTHING",
+            [
+                event["id"],
+                event["type"],
+                json.dumps(event["data"]["object"]),
+                timezone.now(),
+            ],
+        )
+        return cursor.rowcount == 1
+
+
+def _metadata_ticket_id(session):
+    try:
+        return str(uuid.UUID(str((session.get("metadata") or {}).get("ticket_id"))))
+    except ValueError:
+        return None
+
+
+def _tickets_for_sessions(sessions):
+    session_ids = {session.get("id") for session in sessions} - {None}
+    by_session = {
+        ticket.stripe_session_id: ticket
+        for ticket in Ticket.objects.filter(stripe_session_id__in=session_ids)
+    }
+    fallback_ids = {
+        _metadata_ticket_id(session) for session in sessions if session.get("id") not in by_session
+    } - {None}
+    by_ticket_id = {
+        str(ticket_id): ticket
+        for ticket_id, ticket in Ticket.objects.in_bulk(
+            fallback_ids, field_name="ticket_id"
+        ).items()
+    }
+    return by_session, by_ticket_id
+
+
+def _apply_event(event, by_session, by_ticket_id):
+    session = event.payload
+    ticket = by_session.get(session.get("id")) or by_ticket_id.get(_metadata_ticket_id(session))
+    if ticket is None:
+        return None
+    if event.event_type == "checkout.session.expired":
+        release_ticket_hold(ticket)
+        return None
+    if confirm_ticket_purchase(ticket, session.get("payment_intent")):
+        return ticket.id
+    return None
+
+
+def process_pending_stripe_events(batch_size=STRIPE_EVENT_BATCH_SIZE):
+    """Apply one batch of pending inbox events.
+
+    Returns ids of tickets that became paid. Each event runs in its own
+    savepoint; failures are recorded on the row and retried on later batches up
+    to ``STRIPE_EVENT_MAX_ATTEMPTS``. Rows locked by a concurrent worker are
+    skipped.
+    """
+
+    paid_ticket_ids = []
+    with transaction.atomic():
+        events = list(
+            StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True, attempts__lt=STRIPE_EVENT_MAX_ATTEMPTS)
+            .order_by("received_at")[:batch_size]
+        )
+        if not events:
+            return paid_ticket_ids
+
+        by_session, by_ticket_id = _tickets_for_sessions([event.payload for event in events])
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    ticket_id = _apply_event(event, by_session, by_ticket_id)
+            except Exception as exc:
+                logger.exception("Failed to process Stripe event %s", event.event_id)
+                event.last_error = repr(exc)
+                continue
+            event.processed_at = now
+            event.last_error = ""
+            if ticket_id is not None:
+                paid_ticket_ids.append(ticket_id)
+
+        StripeWebhookEvent.objects.bulk_update(events, ["processed_at", "attempts", "last_error"])
+    return paid_ticket_ids
+
+
+def prune_processed_stripe_events(now=None):
+    cutoff = (now or timezone.now()) - STRIPE_EVENT_RETENTION
+    deleted, _ = StripeWebhookEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
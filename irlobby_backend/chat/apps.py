@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ChatConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chat"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .write_behind import get_snowflake_worker_id
+
+        if settings.CHAT_WRITE_BEHIND_ENABLED:
+            # Fail at startup rather than on the first message.
+            get_snowflake_worker_id()
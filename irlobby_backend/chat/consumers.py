@@ -2,40 +2,64 @@ import json
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from redis.asyncio import Redis
 
-from activities.models import Activity, ActivityParticipant
+from activities.models import ActivityParticipant
 from matches.models import Match
+from utils.redis_pool import get_async_redis
 
+from .membership import is_conversation_member
 from .models import Conversation, Message
+from .presence import clear_user_online, set_user_online
+from .read_state import MAX_MESSAGE_ID, queue_read_pointer
+from .typing import (
+    TypingDebouncer,
+    activity_typing_room,
+    chat_typing_room,
+    get_typing_coalescer,
+)
+from .write_behind import flush_chat_messages, may_be_unwritten, persist_chat_message
 
-PRESENCE_TTL_SECONDS = 120
-TYPING_TTL_SECONDS = 10
 READ_RECEIPT_TTL_SECONDS = 60 * 60 * 24 * 7
 
-_redis_client = None
 
+def serialized_event(handler, frame):
+    """A group event carrying ``frame`` JSON-encoded once, for receivers to forward as-is."""
+    return {"type": handler, "text": json.dumps(frame)}
 
-async def get_redis_client():
-    global _redis_client
-    if _redis_client is None:
-        _redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    return _redis_client
 
+class PresenceMixin:
+    async def mark_online(self, user_id):
+        await set_user_online(user_id)
+        self.online_user_id = user_id
+
+    async def mark_offline(self):
+        """Release this socket's presence; True when it was the user's last socket."""
+        user_id = getattr(self, "online_user_id", None)
+        if user_id is None:
+            return False
+        self.online_user_id = None
+        return await clear_user_online(user_id)
 
-async def set_user_online(user_id):
-    redis = await get_redis_client()
-    await redis.setex(f"user_online:{user_id}", PRESENCE_TTL_SECONDS, "1")
 
+class TypingMixin:
+    def update_typing(self, room, user_id, is_typing):
+        if self.typing.should_send(room, is_typing):
+            get_typing_coalescer().update(room, user_id, is_typing)
 
-async def clear_user_online(user_id):
-    redis = await get_redis_client()
-    await redis.delete(f"user_online:{user_id}")
+    def stop_typing(self, user_id):
+        typing = getattr(self, "typing", None)
+        if typing is not None:
+            for room in typing.typing_rooms():
+                self.update_typing(room, user_id, False)
 
+    async def typing_indicator(self, event):
+        # Per-user events from not yet upgraded processes are superseded by the next frame.
+        if "text" in event:
+            await self.send(text_data=event["text"])
 
-class ActivityChatConsumer(AsyncWebsocketConsumer):
+
+class ActivityChatConsumer(PresenceMixin, TypingMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # Check if user is authenticated
         user = self.scope.get("user", AnonymousUser())
@@ -46,24 +70,31 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
         await self.accept()
         self.user = user
         self.activity_rooms = set()  # Track which activity rooms this user is in
-        await set_user_online(self.user.id)
+        # activity_id -> conversation id (None until two participants are confirmed),
+        # trusted only for joined rooms; dropped on leave and participant changes.
+        self.activity_chats = {}
+        self.typing = TypingDebouncer()
+        await self.mark_online(self.user.id)
 
     async def disconnect(self, close_code):
-        # Leave all activity rooms
-        for room in self.activity_rooms:
+        if hasattr(self, "user") and self.user and not self.user.is_anonymous:
+            self.stop_typing(self.user.id)
+        went_offline = await self.mark_offline()
+        # Leave all activity rooms; the user stays online while another socket is open.
+        for room in getattr(self, "activity_rooms", ()):
             await self.channel_layer.group_discard(room, self.channel_name)
-            await self.channel_layer.group_send(
-                room,
-                {
-                    "type": "presence_update",
-                    "payload": {
-                        "userId": self.user.id,
-                        "isOnline": False,
+            if went_offline:
+                await self.channel_layer.group_send(
+                    room,
+                    {
+                        "type": "presence_update",
+                        "payload": {
+                            "userId": self.user.id,
+                            "isOnline": False,
+                        },
                     },
-                },
-            )
-        if hasattr(self, "user") and self.user and not self.user.is_anonymous:
-            await clear_user_online(self.user.id)
+                )
+        await flush_chat_messages()
 
     async def receive(self, text_data):
         try:
@@ -85,9 +116,6 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({"error": "Invalid JSON format"}))
         except Exception as e:
             await self.send(text_data=json.dumps({"error": str(e)}))
-        else:
-            if hasattr(self, "user") and self.user and not self.user.is_anonymous:
-                await set_user_online(self.user.id)
 
     async def join_activity(self, data):
         activity_id = data.get("activityId")
@@ -96,7 +124,7 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
             return
 
         # Check if user is authorized to join this activity chat
-        is_authorized = await self.check_activity_access(self.user, activity_id)
+        is_authorized = await self.load_activity_chat(activity_id)
         if not is_authorized:
             await self.send(
                 text_data=json.dumps({"error": "Not authorized to join this activity chat"})
@@ -139,6 +167,7 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
         if room_group_name in self.activity_rooms:
             self.activity_rooms.remove(room_group_name)
             await self.channel_layer.group_discard(room_group_name, self.channel_name)
+        self.activity_chats.pop(int(activity_id), None)
 
     async def send_activity_message(self, data):
         activity_id = data.get("activityId")
@@ -148,40 +177,47 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({"error": "activityId and message are required"}))
             return
 
-        # Check authorization
-        is_authorized = await self.check_activity_access(self.user, activity_id)
+        # Check authorization (cached while this socket is in the activity room)
+        is_authorized = await self.load_activity_chat(activity_id)
         if not is_authorized:
             await self.send(text_data=json.dumps({"error": "Not authorized to send messages"}))
             return
 
         # Save message to database
-        saved_message = await self.save_activity_message(self.user, activity_id, message_text)
+        conversation_id = self.activity_chats[int(activity_id)]
+        saved_message = None
+        if conversation_id is not None:
+            saved_message = await persist_chat_message(conversation_id, self.user, message_text)
 
         if saved_message:
             # Send message to activity room
             room_group_name = f"activity_chat_{activity_id}"
             await self.channel_layer.group_send(
                 room_group_name,
-                {
-                    "type": "chat_message",
-                    "data": {
-                        "id": saved_message.id,
-                        "message": saved_message.text,
-                        "userId": saved_message.sender.id,
-                        "user": {
-                            "id": saved_message.sender.id,
-                            "firstName": saved_message.sender.first_name,
-                            "email": saved_message.sender.email,
+                serialized_event(
+                    "chat_message",
+                    {
+                        "type": "chat_message",
+                        "data": {
+                            "id": saved_message.id,
+                            "message": saved_message.text,
+                            "userId": saved_message.sender.id,
+                            "user": {
+                                "id": saved_message.sender.id,
+                                "firstName": saved_message.sender.first_name,
+                                "email": saved_message.sender.email,
+                            },
+                            "createdAt": saved_message.created_at.isoformat(),
                         },
-                        "createdAt": saved_message.created_at.isoformat(),
+                        "activityId": activity_id,
                     },
-                    "activityId": activity_id,
-                },
+                ),
             )
 
     async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps(event))
+        # Forward the frame the sender encoded; older senders put the event itself.
+        text = event.get("text")
+        await self.send(text_data=json.dumps(event) if text is None else text)
 
     async def handle_typing(self, data):
         activity_id = data.get("activityId")
@@ -189,25 +225,7 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
             return
 
         is_typing = bool(data.get("isTyping", True))
-        redis = await get_redis_client()
-        key = f"typing:activity:{activity_id}:{self.user.id}"
-        if is_typing:
-            await redis.setex(key, TYPING_TTL_SECONDS, "1")
-        else:
-            await redis.delete(key)
-
-        room_group_name = f"activity_chat_{activity_id}"
-        await self.channel_layer.group_send(
-            room_group_name,
-            {
-                "type": "typing_indicator",
-                "payload": {
-                    "activityId": int(activity_id),
-                    "userId": self.user.id,
-                    "isTyping": is_typing,
-                },
-            },
-        )
+        self.update_typing(activity_typing_room(activity_id), self.user.id, is_typing)
 
     async def handle_read_receipt(self, data):
         activity_id = data.get("activityId")
@@ -215,7 +233,7 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
         if not activity_id or not message_id:
             return
 
-        redis = await get_redis_client()
+        redis = get_async_redis()
         key = f"read:activity:{activity_id}:{self.user.id}"
         await redis.setex(key, READ_RECEIPT_TTL_SECONDS, str(message_id))
 
@@ -232,58 +250,57 @@ class ActivityChatConsumer(AsyncWebsocketConsumer):
             },
         )
 
-    async def typing_indicator(self, event):
-        await self.send(text_data=json.dumps(event))
-
     async def read_receipt(self, event):
         await self.send(text_data=json.dumps(event))
 
     async def presence_update(self, event):
         await self.send(text_data=json.dumps(event))
 
-    @database_sync_to_async
-    def check_activity_access(self, user, activity_id):
-        try:
-            activity = Activity.objects.get(id=activity_id)
-            return ActivityParticipant.objects.filter(
-                activity=activity, user=user, status="confirmed"
-            ).exists()
-        except Activity.DoesNotExist:
+    async def activity_participants_changed(self, event):
+        self.activity_chats.pop(event["activityId"], None)
+
+    async def load_activity_chat(self, activity_id):
+        """Resolve authorization and the conversation for ``activity_id``.
+
+        The result is reused only while this socket is in the activity room, the
+        only place ``activity_participants_changed`` reaches; other sends re-check.
+        """
+        activity_id = int(activity_id)
+        if (
+            activity_id in self.activity_chats
+            and f"activity_chat_{activity_id}" in self.activity_rooms
+        ):
+            return True
+        is_authorized, conversation_id = await self.resolve_activity_chat(self.user, activity_id)
+        if not is_authorized:
+            self.activity_chats.pop(activity_id, None)
             return False
+        self.activity_chats[activity_id] = conversation_id
+        return True
 
     @database_sync_to_async
-    def save_activity_message(self, user, activity_id, message_text):
-        try:
-            activity = Activity.objects.get(id=activity_id)
-            participants = (
-                ActivityParticipant.objects.filter(activity=activity, status="confirmed")
-                .select_related("user")
-                .order_by("joined_at", "id")
-            )
-
-            if participants.count() >= 2:
-                # Create or get match for this activity with deterministic ordering
-                user_a = participants.first().user
-                user_b = participants.last().user
-
-                match, created = Match.get_or_create_normalized(
-                    activity=activity, user_one=user_a, user_two=user_b
-                )
-
-                # Create or get conversation
-                conversation, created = Conversation.objects.get_or_create(match=match)
-
-                # Save message
-                message = Message.objects.create(
-                    conversation=conversation, sender=user, text=message_text
-                )
-                return message
-        except Exception as e:
-            print(f"Error saving message: {e}")
-            return None
+    def resolve_activity_chat(self, user, activity_id):
+        participants = list(
+            ActivityParticipant.objects.filter(activity_id=activity_id, status="confirmed")
+            .select_related("user", "activity")
+            .order_by("joined_at", "id")
+        )
+        if user.id not in {participant.user_id for participant in participants}:
+            return False, None
+        if len(participants) < 2:
+            return True, None
+
+        # Create or get match for this activity with deterministic ordering
+        match, created = Match.get_or_create_normalized(
+            activity=participants[0].activity,
+            user_one=participants[0].user,
+            user_two=participants[-1].user,
+        )
+        conversation, created = Conversation.objects.get_or_create(match=match)
+        return True, conversation.id
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(PresenceMixin, TypingMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
         self.room_group_name = f"chat_{self.conversation_id}"
@@ -304,7 +321,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
         await self.accept()
-        await set_user_online(user.id)
+        self.typing = TypingDebouncer()
+        await self.mark_online(user.id)
         await self.channel_layer.group_send(
             self.room_group_name,
             {
@@ -322,18 +340,20 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
         user = self.scope.get("user", AnonymousUser())
         if user and not user.is_anonymous:
-            await clear_user_online(user.id)
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "presence_update",
-                    "payload": {
-                        "conversationId": int(self.conversation_id),
-                        "userId": user.id,
-                        "isOnline": False,
+            self.stop_typing(user.id)
+            if await self.mark_offline():
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {
+                        "type": "presence_update",
+                        "payload": {
+                            "conversationId": int(self.conversation_id),
+                            "userId": user.id,
+                            "isOnline": False,
+                        },
                     },
-                },
-            )
+                )
+        await flush_chat_messages()
 
     async def receive(self, text_data):
         try:
@@ -347,11 +367,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message_type = text_data_json.get("type")
         if message_type == "typing":
             await self.handle_typing(text_data_json)
-            await set_user_online(self.scope["user"].id)
             return
         if message_type == "read_message":
             await self.handle_read_receipt(text_data_json)
-            await set_user_online(self.scope["user"].id)
             return
 
         message = str(text_data_json.get("message", "")).strip()
@@ -363,15 +381,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         user = self.scope["user"]
 
-        # Save message to database
-        saved_message = await self.save_message(user, self.conversation_id, message)
+        # Save message to database (or queue it in write-behind mode)
+        saved_message = await persist_chat_message(self.conversation_id, user, message)
 
-        # Send message to room group
+        # Send message to room group, encoded once for every member
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "chat_message",
-                "payload": {
+            serialized_event(
+                "chat_message",
+                {
                     "type": "chat.message",
                     "conversationId": int(self.conversation_id),
                     "id": saved_message.id,
@@ -384,45 +402,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     },
                     "createdAt": saved_message.created_at.isoformat(),
                 },
-            },
+            ),
         )
-        await set_user_online(user.id)
 
     async def chat_message(self, event):
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps(event["payload"]))
+        # Forward the frame the sender encoded; older senders put a payload dict.
+        text = event.get("text")
+        await self.send(text_data=json.dumps(event["payload"]) if text is None else text)
 
     async def handle_typing(self, data):
         is_typing = bool(data.get("isTyping", True))
-        user = self.scope["user"]
-        redis = await get_redis_client()
-        key = f"typing:chat:{self.conversation_id}:{user.id}"
-        if is_typing:
-            await redis.setex(key, TYPING_TTL_SECONDS, "1")
-        else:
-            await redis.delete(key)
-
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "typing_indicator",
-                "payload": {
-                    "conversationId": int(self.conversation_id),
-                    "userId": user.id,
-                    "isTyping": is_typing,
-                },
-            },
-        )
+        self.update_typing(chat_typing_room(self.conversation_id), self.scope["user"].id, is_typing)
 
     async def handle_read_receipt(self, data):
-        message_id = data.get("messageId")
-        if not message_id:
+        try:
+            message_id = int(data.get("messageId"))
+        except (TypeError, ValueError):
+            return
+        if not 0 < message_id <= MAX_MESSAGE_ID:
+            return
+        if not (
+            may_be_unwritten(int(self.conversation_id), message_id)
+            or await self.is_conversation_message(message_id)
+        ):
             return
 
         user = self.scope["user"]
-        redis = await get_redis_client()
-        key = f"read:chat:{self.conversation_id}:{user.id}"
-        await redis.setex(key, READ_RECEIPT_TTL_SECONDS, str(message_id))
+        # Persisted to the user's read pointer by the next flush_read_pointers run.
+        await queue_read_pointer(self.conversation_id, user.id, message_id)
 
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -431,14 +438,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 "payload": {
                     "conversationId": int(self.conversation_id),
                     "userId": user.id,
-                    "messageId": int(message_id),
+                    "messageId": message_id,
                 },
             },
         )
 
-    async def typing_indicator(self, event):
-        await self.send(text_data=json.dumps(event["payload"]))
-
     async def read_receipt(self, event):
         await self.send(text_data=json.dumps(event["payload"]))
 
@@ -447,14 +451,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def check_conversation_access(self, user, conversation_id):
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            return user in [conversation.match.user_a, conversation.match.user_b]
-        except Conversation.DoesNotExist:
-            return False
+        return is_conversation_member(int(conversation_id), user)
 
     @database_sync_to_async
-    def save_message(self, user, conversation_id, message_text):
-        conversation = Conversation.objects.get(id=conversation_id)
-        message = Message.objects.create(conversation=conversation, sender=user, text=message_text)
-        return message
+    def is_conversation_message(self, message_id):
+        return Message.objects.filter(id=message_id, conversation_id=self.conversation_id).exists()
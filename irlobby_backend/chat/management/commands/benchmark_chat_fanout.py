@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.consumers import serialized_event
+
+
+def chat_frame(n):
+    return {
+        "type": "chat.message",
+        "conversationId": 1,
+        "id": n,
+        "message": f"Fanout benchmark message {n} " + "x" * 80,
+        "userId": 1,
+        "user": {"id": 1, "firstName": "Bench", "email": "bench@example.com"},
+        "createdAt": timezone.now().isoformat(),
+    }
+
+
+def per_member_event(n):
+    return {"type": "chat_message", "payload": chat_frame(n)}
+
+
+def encode_per_member(event):
+    return json.dumps(event["payload"])
+
+
+def pre_serialized_event(n):
+    return serialized_event("chat_message", chat_frame(n))
+
+
+def forward_pre_serialized(event):
+    return event["text"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure chat broadcast cost per message when every room member encodes the event "
+        "versus forwarding JSON the sender encoded once"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200)
+        parser.add_argument("--room-sizes", default="2,10,100")
+        parser.add_argument(
+            "--configured-layer",
+            action="store_true",
+            help="Use CHANNEL_LAYERS (e.g. Redis) instead of an in-memory layer.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["room_sizes"].split(",")]
+        for size in sizes:
+            layer = get_channel_layer() if options["configured_layer"] else InMemoryChannelLayer()
+            per_member, pre_serialized = asyncio.run(self.fanout(layer, size, options["messages"]))
+            self.stdout.write(
+                f"room={size:<4} per-member={per_member * 1000:.3f}ms/msg "
+                f"pre-serialized={pre_serialized * 1000:.3f}ms/msg "
+                f"speedup={per_member / pre_serialized:.2f}x"
+            )
+
+    async def fanout(self, layer, size, total):
+        group = f"fanout_bench_{size}_{time.time_ns()}"
+        channels = [await layer.new_channel() for _ in range(size)]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        async def deliver(event, encode):
+            await layer.group_send(group, event)
+            for channel in channels:
+                encode(await layer.receive(channel))
+
+        try:
+            timings = []
+            for build, encode in [
+                (per_member_event, encode_per_member),
+                (pre_serialized_event, forward_pre_serialized),
+            ]:
+                started = time.perf_counter()
+                for n in range(total):
+                    await deliver(build(n), encode)
+                timings.append((time.perf_counter() - started) / total)
+            return timings
+        finally:
+            for channel in channels:
+                await layer.group_discard(group, channel)
@@ -0,0 +1,77 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from chat.models import Conversation, Message
+from chat.write_behind import flush_chat_messages, persist_chat_message
+from matches.models import Match
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a burst of chat messages through the websocket persistence path against the "
+        "configured database, once per message and once with write-behind batching"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--senders", type=int, default=20)
+        parser.add_argument("--flush-ms", type=int, default=50)
+        parser.add_argument("--max-batch", type=int, default=200)
+
+    def handle(self, *args, **options):
+        total = options["messages"]
+        stamp = int(time.time() * 1000)
+        users = [
+            User.objects.create_user(
+                username=f"chatbench-{side}-{stamp}", email=f"chatbench-{side}-{stamp}@example.com"
+            )
+            for side in ("a", "b")
+        ]
+        conversation = Conversation.objects.create(
+            match=Match.objects.create(user_a=users[0], user_b=users[1])
+        )
+
+        try:
+            for label, enabled in [("per-message", False), ("write-behind", True)]:
+                with override_settings(
+                    CHAT_WRITE_BEHIND_ENABLED=enabled,
+                    CHAT_WRITE_BEHIND_FLUSH_MS=options["flush_ms"],
+                    CHAT_WRITE_BEHIND_MAX_BATCH=options["max_batch"],
+                ):
+                    acks, accepted, durable = asyncio.run(
+                        self.burst(conversation.id, users, total, options["senders"])
+                    )
+                stored = Message.objects.filter(conversation=conversation).count()
+                acks.sort()
+                self.stdout.write(
+                    f"{label:<12} accepted={total / accepted:,.0f}/s "
+                    f"durable={total / durable:,.0f}/s "
+                    f"ack_median_ms={statistics.median(acks):.3f} "
+                    f"ack_p95_ms={acks[int(len(acks) * 0.95) - 1]:.3f} stored={stored}"
+                )
+                if stored != total:
+                    raise CommandError(f"{label}: expected {total} stored messages, got {stored}")
+                Message.objects.filter(conversation=conversation).delete()
+        finally:
+            for user in users:
+                user.delete()
+
+    async def burst(self, conversation_id, users, total, senders):
+        acks = []
+
+        async def sender(index):
+            for n in range(index, total, senders):
+                started = time.perf_counter()
+                await persist_chat_message(conversation_id, users[n % 2], f"burst {n}")
+                acks.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender(index) for index in range(senders)))
+        accepted = time.perf_counter() - started
+        await flush_chat_messages()
+        return acks, accepted, time.perf_counter() - started
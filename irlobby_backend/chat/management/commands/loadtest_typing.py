@@ -0,0 +1,90 @@
+import asyncio
+import random
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.typing import TypingCoalescer, TypingDebouncer, chat_typing_room
+from utils.redis_pool import get_async_redis
+
+
+class CountingChannelLayer(InMemoryChannelLayer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.group_sends = 0
+
+    async def group_send(self, group, message):
+        self.group_sends += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate busy rooms of typists sending a typing frame per keystroke and compare "
+        "channel-layer traffic with one group_send per frame against debounced, coalesced "
+        "indicators (requires REDIS_URL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=20)
+        parser.add_argument("--members", type=int, default=10)
+        parser.add_argument("--typists", type=int, default=4, help="Typists per room.")
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--keystroke-ms", type=int, default=150)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        keystrokes, group_sends = asyncio.run(self.simulate(options))
+        members = options["members"]
+        self.stdout.write(
+            f"rooms={options['rooms']} members={members} typists={options['typists']} "
+            f"seconds={options['seconds']:.0f} typing_frames={keystrokes}"
+        )
+        self.stdout.write(f"per-frame  group_sends={keystrokes} deliveries={keystrokes * members}")
+        self.stdout.write(
+            f"coalesced  group_sends={group_sends} deliveries={group_sends * members} "
+            f"reduction={keystrokes / max(group_sends, 1):.1f}x"
+        )
+
+    async def simulate(self, options):
+        client = get_async_redis()
+        try:
+            await client.ping()
+        except Exception as exc:
+            raise CommandError(f"Redis is required for the typing load test: {exc}")
+
+        layer = CountingChannelLayer()
+        coalescer = TypingCoalescer(layer)
+        deadline = time.monotonic() + options["seconds"]
+        keystroke = options["keystroke_ms"] / 1000
+        frames = 0
+
+        async def typist(room, user_id):
+            nonlocal frames
+            debouncer = TypingDebouncer()
+            await asyncio.sleep(random.uniform(0, 1))
+            while time.monotonic() < deadline:
+                burst_ends = time.monotonic() + random.uniform(2, 6)
+                while time.monotonic() < min(burst_ends, deadline):
+                    frames += 1
+                    if debouncer.should_send(room, True):
+                        coalescer.update(room, user_id, True)
+                    await asyncio.sleep(keystroke * random.uniform(0.5, 1.5))
+                frames += 1
+                if debouncer.should_send(room, False):
+                    coalescer.update(room, user_id, False)
+                await asyncio.sleep(random.uniform(1, 3))
+
+        stamp = int(time.time())
+        rooms = [chat_typing_room(stamp * 1000 + index) for index in range(options["rooms"])]
+        await asyncio.gather(
+            *(
+                typist(room, user_id)
+                for room in rooms
+                for user_id in range(1, options["typists"] + 1)
+            )
+        )
+        await coalescer.flush()
+        await client.delete(*(room.key for room in rooms))
+        return frames, layer.group_sends
@@ -0,0 +1,55 @@
+"""Cached conversation membership for authorization checks.
+
+A conversation's two participants are fixed by its match, so the pair of user
+ids is cached per conversation and checks compare ids without loading
+``Conversation``, ``Match`` or ``User`` rows. A miss costs one ``values_list``
+query; entries are dropped when the conversation is deleted.
+"""
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from matches.models import Match
+
+from .models import Conversation
+
+CONVERSATION_MEMBERS_CACHE_TTL_SECONDS = 60 * 60 * 24
+
+
+def _conversation_members_cache_key(conversation_id):
+    return f"chat:conversation_members:{conversation_id}"
+
+
+def get_conversation_member_ids(conversation_id):
+    """Return ``(user_a_id, user_b_id)`` for a conversation, or ``None`` if it does not exist."""
+    cache_key = _conversation_members_cache_key(conversation_id)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    members = (
+        Conversation.objects.filter(id=conversation_id)
+        .values_list("match__user_a_id", "match__user_b_id")
+        .first()
+    )
+    if members is not None:
+        cache.set(cache_key, list(members), CONVERSATION_MEMBERS_CACHE_TTL_SECONDS)
+    return members
+
+
+def is_conversation_member(conversation_id, user):
+    members = get_conversation_member_ids(conversation_id)
+    return members is not None and getattr(user, "pk", user) in members
+
+
+def invalidate_conversation_members(*conversation_ids):
+    cache.delete_many([_conversation_members_cache_key(pk) for pk in conversation_ids])
+
+
+def get_match_partner_ids(user, user_ids):
+    """Return the ids among ``user_ids`` sharing a match, so a conversation, with ``user``."""
+    user_ids = set(user_ids)
+    pairs = Match.objects.filter(
+        Q(user_a=user, user_b_id__in=user_ids) | Q(user_b=user, user_a_id__in=user_ids)
+    ).values_list("user_a_id", "user_b_id")
+    return ({member_id for pair in pairs for member_id in pair} & user_ids) - {user.id}
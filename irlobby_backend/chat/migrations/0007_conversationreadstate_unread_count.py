@@ -0,0 +1,62 @@
+from django.db import migrations, models
+from django.db.models import F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_read_states(apps, schema_editor):
+    Conversation = apps.get_model("chat", "Conversation")
+    ConversationReadState = apps.get_model("chat", "ConversationReadState")
+    Message = apps.get_model("chat", "Message")
+
+    participants = Conversation.objects.values_list("id", "match__user_a_id", "match__user_b_id")
+    states = []
+    for conversation_id, user_a_id, user_b_id in participants.iterator(chunk_size=2000):
+        for user_id in {user_a_id, user_b_id}:
+            states.append(ConversationReadState(conversation_id=conversation_id, user_id=user_id))
+        if len(states) >= 2000:
+            ConversationReadState.objects.bulk_create(states, ignore_conflicts=True)
+            states = []
+    ConversationReadState.objects.bulk_create(states, ignore_conflicts=True)
+
+    # Read history was never recorded, so untouched pointers start at the latest
+    # message instead of badging every conversation's whole history as unread.
+    latest = (
+        Message.objects.filter(conversation_id=OuterRef("conversation_id"))
+        .order_by("-id")
+        .values("id")[:1]
+    )
+    ConversationReadState.objects.filter(last_read_message_id=0).update(
+        last_read_message_id=Coalesce(
+            Subquery(latest), 0, output_field=models.BigIntegerField()
+        )
+    )
+
+    unread = (
+        Message.objects.filter(
+            conversation_id=OuterRef("conversation_id"),
+            id__gt=OuterRef("last_read_message_id"),
+        )
+        .exclude(sender_id=OuterRef("user_id"))
+        .order_by()
+        .annotate(total=Func(F("id"), function="COUNT"))
+        .values("total")
+    )
+    ConversationReadState.objects.update(
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0006_message_created_at_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversationreadstate",
+            name="unread_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_read_states, migrations.RunPython.noop),
+    ]
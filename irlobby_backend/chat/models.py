@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from matches.models import Match
 from users.models import User
@@ -18,7 +19,40 @@ class Message(models.Model):
     )
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by the caller rather than auto_now_add so write-behind batches keep the
+    # time a message was accepted (chat.write_behind).
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a conversation's history (chat.pagination).
+            models.Index(
+                fields=["conversation", "created_at", "id"], name="message_conv_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender} in {self.conversation}"
+
+
+class ConversationReadState(models.Model):
+    """The newest message a participant has read in a conversation."""
+
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name="read_states", db_index=False
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    last_read_message_id = models.BigIntegerField(default=0)
+    # Other participants' messages past the pointer; kept up to date by chat.read_state.
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["conversation", "user"], name="conversation_read_state_uniq"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.last_read_message_id} in {self.conversation_id}"
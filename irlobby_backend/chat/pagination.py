@@ -0,0 +1,118 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_message_cursor(message):
+    created_us = (message.created_at - _EPOCH) // timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f"{created_us}.{message.id}".encode()).decode().rstrip("=")
+
+
+def decode_message_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_us, message_id = (int(part) for part in raw.split("."))
+        created_at = _EPOCH + timedelta(microseconds=created_us)
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        raise NotFound("Invalid cursor.")
+    return created_at, message_id
+
+
+class MessageCursorPagination(BasePagination):
+    """Keyset pagination over ``(created_at, id)`` for a conversation's history.
+
+    Without a cursor the newest page is returned; ``before`` walks back through
+    older messages and ``after`` catches up on newer ones. Each page is one
+    index range scan on ``(conversation, created_at, id)`` with no COUNT, so
+    opening a chat costs the same however long its history is. Results are
+    always oldest first.
+    """
+
+    page_size = 50
+    max_page_size = 100
+    page_size_query_param = "limit"
+    before_query_param = "before"
+    after_query_param = "after"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        before = request.query_params.get(self.before_query_param)
+        after = request.query_params.get(self.after_query_param)
+
+        if after:
+            created_at, message_id = decode_message_cursor(after)
+            rows = list(
+                queryset.filter(
+                    Q(created_at__gte=created_at),
+                    Q(created_at__gt=created_at) | Q(id__gt=message_id),
+                ).order_by("created_at", "id")[: page_size + 1]
+            )
+            self.has_older = True
+            self.has_newer = len(rows) > page_size
+            self.page = rows[:page_size]
+            return self.page
+
+        if before:
+            created_at, message_id = decode_message_cursor(before)
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(id__lt=message_id),
+            )
+        rows = list(queryset.order_by("-created_at", "-id")[: page_size + 1])
+        self.has_older = len(rows) > page_size
+        self.has_newer = bool(before)
+        self.page = rows[:page_size][::-1]
+        return self.page
+
+    def _link(self, param, message):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, param, encode_message_cursor(message))
+
+    def get_next_link(self):
+        if not self.page or not self.has_newer:
+            return None
+        return self._link(self.after_query_param, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.page or not self.has_older:
+            return None
+        return self._link(self.before_query_param, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
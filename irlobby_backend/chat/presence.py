@@ -0,0 +1,134 @@
+"""User presence kept in Redis as ``user_online:<id>`` keys with a TTL.
+
+``user_sockets:<id>`` counts a user's open sockets across processes: connecting
+increments it and sets the presence key, disconnecting decrements it and only
+the last socket deletes the presence key. While sockets are open the server
+refreshes both keys itself: each event loop's :class:`PresenceHeartbeat` writes
+every connected user with one pipelined round trip per
+``PRESENCE_REFRESH_SECONDS`` (a third of the TTL), so an idle but open
+connection stays online whether or not it sends frames. A crashed process
+leaves its counts behind; without its heartbeat they expire with the TTL.
+``get_online_user_ids`` answers a whole friends list with a single ``MGET``.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+
+from utils.redis_pool import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL_SECONDS = 120
+PRESENCE_REFRESH_SECONDS = PRESENCE_TTL_SECONDS / 3
+MAX_PRESENCE_QUERY_USERS = 200
+
+# Decrement the socket count KEYS[1]; the last socket also deletes the presence
+# key KEYS[2]. Returns 1 when the user went offline.
+_DISCONNECT_SCRIPT = """
+local sockets = redis.call('DECR', KEYS[1])
+if sockets > 0 then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+return 1
+"""
+
+
+def presence_key(user_id):
+    return f"user_online:{user_id}"
+
+
+def presence_sockets_key(user_id):
+    return f"user_sockets:{user_id}"
+
+
+async def set_users_online(user_ids):
+    """Refresh the presence keys and socket counts of ``user_ids`` in one round trip."""
+    client = get_async_redis()
+    async with client.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.setex(presence_key(user_id), PRESENCE_TTL_SECONDS, "1")
+            pipe.expire(presence_sockets_key(user_id), PRESENCE_TTL_SECONDS)
+        await pipe.execute()
+
+
+async def set_user_online(user_id):
+    """Count a new socket for ``user_id`` and keep it online until it disconnects."""
+    client = get_async_redis()
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.incr(presence_sockets_key(user_id))
+        pipe.expire(presence_sockets_key(user_id), PRESENCE_TTL_SECONDS)
+        pipe.setex(presence_key(user_id), PRESENCE_TTL_SECONDS, "1")
+        await pipe.execute()
+    get_presence_heartbeat().add(user_id)
+
+
+async def clear_user_online(user_id):
+    """Drop one socket of ``user_id``; True when it was the user's last one."""
+    get_presence_heartbeat().discard(user_id)
+    script = get_async_redis().register_script(_DISCONNECT_SCRIPT)
+    return bool(await script(keys=[presence_sockets_key(user_id), presence_key(user_id)]))
+
+
+def get_online_user_ids(user_ids):
+    """Return the subset of ``user_ids`` with a live presence key, in one ``MGET``."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+    values = get_redis().mget([presence_key(user_id) for user_id in user_ids])
+    return {user_id for user_id, value in zip(user_ids, values) if value is not None}
+
+
+class PresenceHeartbeat:
+    """Per event loop set of connected users, refreshed together every window."""
+
+    def __init__(self):
+        self.sockets = Counter()
+        self._timer = None
+        self._tasks = set()
+
+    def add(self, user_id):
+        self.sockets[user_id] += 1
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                PRESENCE_REFRESH_SECONDS, self._start_refresh
+            )
+
+    def discard(self, user_id):
+        self.sockets[user_id] -= 1
+        if self.sockets[user_id] <= 0:
+            del self.sockets[user_id]
+        if not self.sockets and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _start_refresh(self):
+        self._timer = None
+        if not self.sockets:
+            return
+        task = asyncio.ensure_future(self.refresh(list(self.sockets)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._timer = asyncio.get_running_loop().call_later(
+            PRESENCE_REFRESH_SECONDS, self._start_refresh
+        )
+
+    async def refresh(self, user_ids):
+        try:
+            await set_users_online(user_ids)
+        except Exception:
+            logger.exception("Refreshing presence for %s users failed", len(user_ids))
+
+
+_heartbeats: dict[asyncio.AbstractEventLoop, PresenceHeartbeat] = {}
+
+
+def get_presence_heartbeat():
+    loop = asyncio.get_running_loop()
+    heartbeat = _heartbeats.get(loop)
+    if heartbeat is None:
+        for old_loop in [old_loop for old_loop in _heartbeats if old_loop.is_closed()]:
+            del _heartbeats[old_loop]
+        heartbeat = _heartbeats[loop] = PresenceHeartbeat()
+    return heartbeat
@@ -0,0 +1,174 @@
+"""Durable per-participant read pointers and unread counts.
+
+Every participant has a ``ConversationReadState`` row from the moment the
+conversation exists. Its ``unread_count`` is bumped as other participants'
+messages are inserted and recounted when the read pointer advances, so the
+conversation list reads badges instead of counting messages.
+
+Websocket read receipts are frequent, so they only record the newest pointer
+per (conversation, user) in a Redis hash; an older receipt arriving late never
+replaces a newer one. ``flush_read_pointers`` (run by Celery beat) moves the
+hash aside and applies it to Postgres in one transaction, one savepoint per
+pointer: a pointer the database rejects is logged and dropped, while a failed
+flush leaves the moved hash in place and the next run retries it.
+"""
+
+import logging
+from collections import Counter
+
+import redis
+from django.db import DatabaseError, transaction
+from django.db.models import Exists, F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from utils.redis_pool import get_async_redis, get_redis
+
+from .models import ConversationReadState, Message
+
+logger = logging.getLogger(__name__)
+
+READ_POINTERS_KEY = "chat:read_pointers"
+READ_POINTERS_FLUSHING_KEY = "chat:read_pointers:flushing"
+MAX_MESSAGE_ID = 2**63 - 1
+
+# HSET field ARGV[1] to ARGV[2] unless it already holds a larger id. Ids are
+# compared as decimal strings: Lua numbers are doubles, exact only below 2**53.
+_MAX_POINTER_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local new = ARGV[2]
+if current and (#current > #new or (#current == #new and current >= new)) then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], new)
+return 1
+"""
+
+
+def _unread_after(conversation_id, user_id, message_id):
+    unread = (
+        Message.objects.filter(conversation_id=conversation_id, id__gt=message_id)
+        .exclude(sender_id=user_id)
+        .order_by()
+        .annotate(total=Func(F("id"), function="COUNT"))
+        .values("total")
+    )
+    return Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+
+
+def advance_read_pointer(conversation_id, user_id, message_id):
+    """Move an existing read pointer forward to ``message_id`` and recount unread.
+
+    Ids that are not a message of the conversation leave the pointer alone.
+    """
+    return ConversationReadState.objects.filter(
+        Exists(Message.objects.filter(conversation_id=conversation_id, id=message_id)),
+        conversation_id=conversation_id,
+        user_id=user_id,
+        last_read_message_id__lt=message_id,
+    ).update(
+        last_read_message_id=message_id,
+        unread_count=_unread_after(conversation_id, user_id, message_id),
+        updated_at=timezone.now(),
+    )
+
+
+def mark_conversation_read(conversation_id, user_id, message_id):
+    """Advance the user's read pointer to ``message_id``; it never moves backwards."""
+    if not advance_read_pointer(conversation_id, user_id, message_id):
+        # Rows are created with the conversation; this covers ones that predate that.
+        ConversationReadState.objects.bulk_create(
+            [
+                ConversationReadState(
+                    conversation_id=conversation_id,
+                    user_id=user_id,
+                    last_read_message_id=message_id,
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def create_read_states(conversation_id, user_ids):
+    ConversationReadState.objects.bulk_create(
+        [
+            ConversationReadState(conversation_id=conversation_id, user_id=user_id)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def count_new_messages(messages):
+    """Add newly inserted ``messages`` to the other participants' unread counters."""
+    senders = Counter((message.conversation_id, message.sender_id) for message in messages)
+    for (conversation_id, sender_id), total in senders.items():
+        ConversationReadState.objects.filter(conversation_id=conversation_id).exclude(
+            user_id=sender_id
+        ).update(unread_count=F("unread_count") + total)
+
+
+async def queue_read_pointer(conversation_id, user_id, message_id):
+    """Record ``message_id`` as the user's pointer unless a newer one is already queued."""
+    script = get_async_redis().register_script(_MAX_POINTER_SCRIPT)
+    await script(
+        keys=[READ_POINTERS_KEY],
+        args=[f"{int(conversation_id)}:{user_id}", str(int(message_id))],
+    )
+
+
+def flush_read_pointers():
+    """Apply queued websocket read receipts to Postgres; returns the pointers applied."""
+    client = get_redis()
+    if not client.exists(READ_POINTERS_FLUSHING_KEY):
+        if not client.exists(READ_POINTERS_KEY):
+            return 0
+        try:
+            client.rename(READ_POINTERS_KEY, READ_POINTERS_FLUSHING_KEY)
+        except redis.ResponseError:
+            # Another flush took the hash first.
+            return 0
+
+    pointers = {}
+    for field, message_id in client.hgetall(READ_POINTERS_FLUSHING_KEY).items():
+        try:
+            conversation_id, user_id = field.split(":")
+            pointers[(int(conversation_id), int(user_id))] = int(message_id)
+        except ValueError:
+            logger.error("Dropping malformed read pointer %s=%s", field, message_id)
+
+    applied = 0
+    with transaction.atomic():
+        # Pointers of deleted conversations match no row and are dropped.
+        for (conversation_id, user_id), message_id in sorted(pointers.items()):
+            try:
+                with transaction.atomic():
+                    advance_read_pointer(conversation_id, user_id, message_id)
+            except DatabaseError:
+                logger.exception(
+                    "Dropping read pointer %s for user %s in conversation %s",
+                    message_id,
+                    user_id,
+                    conversation_id,
+                )
+            else:
+                applied += 1
+    client.delete(READ_POINTERS_FLUSHING_KEY)
+    return applied
+
+
+def with_unread_count(queryset, user):
+    """Annotate conversations with the user's denormalized ``unread_count``."""
+    unread = ConversationReadState.objects.filter(conversation=OuterRef("pk"), user=user).values(
+        "unread_count"
+    )[:1]
+    return queryset.annotate(unread_count=Coalesce(Subquery(unread), 0))
+
+
+def with_last_message_id(queryset):
+    latest = (
+        Message.objects.filter(conversation=OuterRef("pk"))
+        .order_by("-created_at", "-id")
+        .values("id")[:1]
+    )
+    return queryset.annotate(last_message_id=Subquery(latest))
@@ -20,21 +20,48 @@ class MessageSerializer(serializers.ModelSerializer):
         return strip_html(value)
 
     def get_userId(self, obj):
-        return obj.sender.id
+        return obj.sender_id
 
     def get_user(self, obj):
         return {"id": obj.sender.id, "firstName": obj.sender.first_name, "email": obj.sender.email}
 
 
 class ConversationSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    # Only the latest message, kept as a list for clients that read messages[-1].
+    messages = serializers.SerializerMethodField()
+    lastMessage = serializers.SerializerMethodField()
+    unreadCount = serializers.IntegerField(source="unread_count", read_only=True, default=0)
     match = serializers.StringRelatedField()
-    matchId = serializers.IntegerField(source="match.id", read_only=True)
+    matchId = serializers.IntegerField(source="match_id", read_only=True)
     activityId = serializers.IntegerField(
-        source="match.activity.id", read_only=True, allow_null=True
+        source="match.activity_id", read_only=True, allow_null=True
     )
 
     class Meta:
         model = Conversation
-        fields = ("id", "match", "matchId", "activityId", "messages", "created_at")
+        fields = (
+            "id",
+            "match",
+            "matchId",
+            "activityId",
+            "messages",
+            "lastMessage",
+            "unreadCount",
+            "created_at",
+        )
         read_only_fields = ("id", "created_at")
+
+    def _last_message(self, obj):
+        if not hasattr(obj, "last_message"):
+            obj.last_message = (
+                obj.messages.select_related("sender").order_by("-created_at", "-id").first()
+            )
+        return obj.last_message
+
+    def get_lastMessage(self, obj):
+        message = self._last_message(obj)
+        return MessageSerializer(message, context=self.context).data if message else None
+
+    def get_messages(self, obj):
+        message = self.get_lastMessage(obj)
+        return [message] if message else []
@@ -0,0 +1,53 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from activities.models import ActivityParticipant
+
+from .membership import invalidate_conversation_members
+from .models import Conversation, Message
+from .read_state import count_new_messages, create_read_states
+from .write_behind import advance_message_id_sequence
+
+
+@receiver(post_save, sender=Conversation)
+def create_read_states_for_participants(sender, instance, created, **kwargs):
+    if created:
+        create_read_states(instance.pk, {instance.match.user_a_id, instance.match.user_b_id})
+
+
+@receiver(post_save, sender=Message)
+def count_unread_on_message_insert(sender, instance, created, **kwargs):
+    if created:
+        count_new_messages([instance])
+
+
+@receiver(post_delete, sender=Conversation)
+def invalidate_members_on_conversation_delete(sender, instance, **kwargs):
+    invalidate_conversation_members(instance.pk)
+
+
+def _broadcast_participants_changed(activity_id):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        f"activity_chat_{activity_id}",
+        {"type": "activity_participants_changed", "activityId": activity_id},
+    )
+
+
+@receiver(post_save, sender=ActivityParticipant)
+@receiver(post_delete, sender=ActivityParticipant)
+def invalidate_activity_chats_on_participant_change(sender, instance, **kwargs):
+    """Tell sockets in the activity room to re-resolve their cached conversation."""
+    activity_id = instance.activity_id
+    transaction.on_commit(lambda: _broadcast_participants_changed(activity_id), robust=True)
+
+
+@receiver(post_migrate)
+def advance_message_id_sequence_after_migrate(sender, app_config, using, **kwargs):
+    if app_config.label == "chat":
+        advance_message_id_sequence(using)
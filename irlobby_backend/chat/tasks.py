@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from .read_state import flush_read_pointers as apply_queued_read_pointers
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_read_pointers():
+    applied = apply_queued_read_pointers()
+    if applied:
+        logger.info("Applied %s queued chat read pointers", applied)
+    return applied
@@ -1,23 +1,47 @@
+import asyncio
 from datetime import timedelta
-from unittest.mock import patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
-from django.test import TransactionTestCase
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DataError, connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from activities.models import Activity
+from activities.models import Activity, ActivityParticipant
 from irlobby_backend.asgi import application
 from matches.models import Match
 from moderation.models import BlockedUser
 from users.models import User
 
+from . import read_state
+from .consumers import ActivityChatConsumer, ChatConsumer, serialized_event
+from .membership import get_conversation_member_ids, is_conversation_member
 from .middleware import JwtAuthMiddleware
-from .models import Conversation, Message
+from .models import Conversation, ConversationReadState, Message
+from .presence import PresenceHeartbeat
+from .read_state import READ_POINTERS_FLUSHING_KEY, READ_POINTERS_KEY, flush_read_pointers
+from .typing import (
+    TYPING_MIN_INTERVAL_SECONDS,
+    TYPING_REFRESH_SECONDS,
+    TypingDebouncer,
+    chat_typing_room,
+)
+from .write_behind import (
+    SnowflakeGenerator,
+    advance_message_id_sequence,
+    get_snowflake_worker_id,
+    insert_messages,
+)
 
 
 class ConversationListTests(APITestCase):
@@ -84,6 +108,54 @@ class ConversationListTests(APITestCase):
         )
         self.assertEqual(len(results), 0)
 
+    def _add_conversation(self, index, messages):
+        partner = User.objects.create_user(
+            username=f"chat-partner-{index}",
+            email=f"chat-partner-{index}@example.com",
+            password="password123",
+        )
+        match = Match.objects.create(user_a=self.user, user_b=partner, activity=self.activity)
+        conversation = Conversation.objects.create(match=match)
+        for n in range(messages):
+            Message.objects.create(conversation=conversation, sender=partner, text=f"m{n}")
+        return conversation
+
+    def _list_queries(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("conversation-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.data["results"]
+
+    def test_conversation_list_query_count_is_constant(self):
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="hi")
+        baseline, _ = self._list_queries()
+
+        for index in range(4):
+            self._add_conversation(index, messages=3)
+        queries, results = self._list_queries()
+
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(results), 5)
+
+    def test_conversation_list_returns_last_message_and_unread_count(self):
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="first")
+        Message.objects.create(conversation=self.conversation, sender=self.user, text="mine")
+        last = Message.objects.create(
+            conversation=self.conversation, sender=self.other, text="latest"
+        )
+
+        _, results = self._list_queries()
+
+        self.assertEqual(results[0]["lastMessage"]["id"], last.id)
+        self.assertEqual(results[0]["lastMessage"]["user"]["id"], self.other.id)
+        self.assertEqual([m["id"] for m in results[0]["messages"]], [last.id])
+        self.assertEqual(results[0]["unreadCount"], 2)
+
+        self.client.get(reverse("message-list", args=[self.conversation.id]))
+        _, results = self._list_queries()
+        self.assertEqual(results[0]["unreadCount"], 0)
+
     def test_unauthenticated_cannot_list_conversations(self):
         response = self.client.get(reverse("conversation-list"))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -140,6 +212,53 @@ class MessageListTests(APITestCase):
         )
         self.assertEqual(len(results), 0)
 
+    def test_history_is_cursor_paginated_newest_page_first(self):
+        messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.user, text=str(n))
+            for n in range(5)
+        ]
+        self.client.force_authenticate(self.user)
+        url = reverse("message-list", args=[self.conversation.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+        self.assertEqual([m["id"] for m in response.data["results"]], [m.id for m in messages[3:]])
+        self.assertIsNone(response.data["next"])
+
+        older = self.client.get(response.data["previous"]).data
+        self.assertEqual([m["id"] for m in older["results"]], [m.id for m in messages[1:3]])
+        oldest = self.client.get(older["previous"]).data
+        self.assertEqual([m["id"] for m in oldest["results"]], [messages[0].id])
+        self.assertIsNone(oldest["previous"])
+
+        newer = self.client.get(oldest["next"]).data
+        self.assertEqual([m["id"] for m in newer["results"]], [m.id for m in messages[1:3]])
+        self.assertIsNotNone(newer["next"])
+
+    def test_message_page_loads_senders_in_the_same_query(self):
+        for n in range(3):
+            Message.objects.create(conversation=self.conversation, sender=self.other, text=str(n))
+        self.client.force_authenticate(self.user)
+        url = reverse("message-list", args=[self.conversation.id])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        sender_lookups = [q for q in queries if q["sql"].startswith('SELECT "users_user"')]
+        self.assertEqual(sender_lookups, [])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("message-list", args=[self.conversation.id])
+
+        response = self.client.get(url, {"before": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     @patch("chat.views.send_new_message_notification")
     def test_participant_can_send_message(self, mock_push):
         self.client.force_authenticate(self.user)
@@ -175,6 +294,54 @@ class MessageListTests(APITestCase):
         self.assertIn("Hello", msg.text)
 
 
+class ConversationMembershipCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="member-user", email="member@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="member-other", email="member-other@example.com", password="password123"
+        )
+        self.outsider = User.objects.create_user(
+            username="member-outsider", email="member-outsider@example.com", password="password123"
+        )
+        self.match = Match.objects.create(user_a=self.user, user_b=self.other)
+        self.conversation = Conversation.objects.create(match=self.match)
+
+    def test_membership_is_resolved_once_then_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(is_conversation_member(self.conversation.id, self.user))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_conversation_member(self.conversation.id, self.other.id))
+            self.assertFalse(is_conversation_member(self.conversation.id, self.outsider))
+
+    def test_deleting_a_conversation_drops_cached_membership(self):
+        conversation_id = self.conversation.id
+        self.assertTrue(is_conversation_member(conversation_id, self.user))
+
+        self.conversation.delete()
+
+        self.assertIsNone(get_conversation_member_ids(conversation_id))
+
+    def test_message_list_authorizes_without_loading_conversation_rows(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("message-list", args=[self.conversation.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if '"chat_conversation"' in q["sql"]])
+
+    def test_missing_conversation_is_not_found(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("message-list", args=[self.conversation.id + 1000]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class JwtAuthMiddlewareTests(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -236,3 +403,564 @@ class WebSocketOriginSecurityTests(TransactionTestCase):
         async_to_sync(run_test)()
         self.assertGreaterEqual(mock_set_user_online.await_count, 1)
         self.assertGreaterEqual(mock_clear_user_online.await_count, 1)
+
+
+@patch("chat.consumers.clear_user_online")
+@patch("chat.consumers.set_user_online")
+class ActivityChatConsumerCacheTests(TransactionTestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="room-host", email="room-host@example.com", password="password123"
+        )
+        self.guest = User.objects.create_user(
+            username="room-guest", email="room-guest@example.com", password="password123"
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Room Activity",
+            description="Test",
+            location="Location",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=10,
+            tags=[],
+            images=[],
+        )
+        for user in (self.host, self.guest):
+            ActivityParticipant.objects.create(
+                activity=self.activity, user=user, status="confirmed"
+            )
+
+    def test_conversation_is_resolved_once_per_socket(self, mock_set_online, mock_clear_online):
+        original = ActivityChatConsumer.resolve_activity_chat
+        resolved = []
+
+        async def counting_resolve(consumer, user, activity_id):
+            resolved.append(activity_id)
+            return await original(consumer, user, activity_id)
+
+        token = str(AccessToken.for_user(self.host))
+
+        async def run_test():
+            communicator = WebsocketCommunicator(
+                application,
+                f"/ws/?token={token}",
+                headers=[(b"origin", b"http://localhost:5173")],
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.send_json_to(
+                {"type": "join_activity", "activityId": self.activity.id}
+            )
+            self.assertEqual((await communicator.receive_json_from())["type"], "joined_activity")
+            self.assertEqual((await communicator.receive_json_from())["type"], "presence_update")
+
+            for text in ("one", "two"):
+                await communicator.send_json_to(
+                    {"type": "send_message", "activityId": self.activity.id, "message": text}
+                )
+                event = await communicator.receive_json_from()
+                self.assertEqual(event["data"]["message"], text)
+            await communicator.disconnect()
+
+        with patch.object(ActivityChatConsumer, "resolve_activity_chat", counting_resolve):
+            async_to_sync(run_test)()
+
+        self.assertEqual(resolved, [self.activity.id])
+        self.assertEqual(
+            Message.objects.filter(conversation__match__activity=self.activity).count(), 2
+        )
+
+    def test_sends_outside_a_joined_room_recheck_participation(
+        self, mock_set_online, mock_clear_online
+    ):
+        token = str(AccessToken.for_user(self.guest))
+
+        async def send(communicator, text):
+            await communicator.send_json_to(
+                {"type": "send_message", "activityId": self.activity.id, "message": text}
+            )
+
+        async def run_test():
+            communicator = WebsocketCommunicator(
+                application,
+                f"/ws/?token={token}",
+                headers=[(b"origin", b"http://localhost:5173")],
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.send_json_to(
+                {"type": "join_activity", "activityId": self.activity.id}
+            )
+            self.assertEqual((await communicator.receive_json_from())["type"], "joined_activity")
+            self.assertEqual((await communicator.receive_json_from())["type"], "presence_update")
+            await communicator.send_json_to(
+                {"type": "leave_activity", "activityId": self.activity.id}
+            )
+
+            await database_sync_to_async(
+                ActivityParticipant.objects.filter(user=self.guest).update
+            )(status="pending")
+            await send(communicator, "after removal")
+            self.assertEqual(
+                await communicator.receive_json_from(), {"error": "Not authorized to send messages"}
+            )
+            await communicator.disconnect()
+
+        async_to_sync(run_test)()
+
+        self.assertFalse(Message.objects.filter(text="after removal").exists())
+
+    def test_participant_changes_are_broadcast_to_the_room(
+        self, mock_set_online, mock_clear_online
+    ):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f"activity_chat_{self.activity.id}", channel)
+
+        ActivityParticipant.objects.filter(user=self.guest).get().delete()
+
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual(
+            event, {"type": "activity_participants_changed", "activityId": self.activity.id}
+        )
+
+
+class SnowflakeGeneratorTests(SimpleTestCase):
+    def test_ids_increase_and_carry_the_worker_id(self):
+        generator = SnowflakeGenerator(worker_id=7)
+        ids = [generator.next_id() for _ in range(5000)]
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertTrue(all((value >> 6) & 0x3F == 7 for value in ids))
+        self.assertLess(ids[-1], 2**53)
+
+    @override_settings(CHAT_SNOWFLAKE_WORKER_ID=None)
+    def test_write_behind_requires_a_worker_id(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_snowflake_worker_id()
+        with self.assertRaises(ValueError):
+            SnowflakeGenerator(worker_id=64)
+
+
+@override_settings(
+    CHAT_WRITE_BEHIND_ENABLED=True,
+    CHAT_WRITE_BEHIND_FLUSH_MS=60000,
+    CHAT_WRITE_BEHIND_MAX_BATCH=3,
+    CHAT_SNOWFLAKE_WORKER_ID=1,
+)
+@patch("chat.consumers.clear_user_online")
+@patch("chat.consumers.set_user_online")
+class ChatWriteBehindTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="burst-user", email="burst@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="burst-other", email="burst-other@example.com", password="password123"
+        )
+        self.conversation = Conversation.objects.create(
+            match=Match.objects.create(user_a=self.user, user_b=self.other)
+        )
+
+    def _communicator(self):
+        token = str(AccessToken.for_user(self.user))
+        return WebsocketCommunicator(
+            application,
+            f"/ws/chat/{self.conversation.id}/?token={token}",
+            headers=[(b"origin", b"http://localhost:5173")],
+        )
+
+    def test_messages_are_broadcast_before_insert_and_flushed_on_disconnect(
+        self, mock_set_online, mock_clear_online
+    ):
+        async def run_test():
+            communicator = self._communicator()
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertTrue((await communicator.receive_json_from())["isOnline"])
+
+            events = []
+            for text in ("one", "two"):
+                await communicator.send_json_to({"message": text})
+                events.append(await communicator.receive_json_from())
+            stored = await database_sync_to_async(Message.objects.count)()
+            await communicator.disconnect()
+            return events, stored
+
+        events, stored_before_disconnect = async_to_sync(run_test)()
+
+        self.assertEqual(stored_before_disconnect, 0)
+        messages = list(Message.objects.order_by("created_at", "id"))
+        self.assertEqual([message.text for message in messages], ["one", "two"])
+        self.assertEqual([message.id for message in messages], [event["id"] for event in events])
+        self.assertEqual(messages[0].created_at.isoformat(), events[0]["createdAt"])
+
+    def test_full_batch_is_flushed_without_waiting(self, mock_set_online, mock_clear_online):
+        async def run_test():
+            communicator = self._communicator()
+            await communicator.connect()
+            await communicator.receive_json_from()
+            for text in ("a", "b", "c"):
+                await communicator.send_json_to({"message": text})
+                await communicator.receive_json_from()
+            for _ in range(50):
+                if await database_sync_to_async(Message.objects.count)() == 3:
+                    break
+                await asyncio.sleep(0.01)
+            stored = await database_sync_to_async(Message.objects.count)()
+            await communicator.disconnect()
+            return stored
+
+        self.assertEqual(async_to_sync(run_test)(), 3)
+
+
+class SerializedBroadcastTests(SimpleTestCase):
+    def test_receivers_forward_the_senders_json(self):
+        event = serialized_event("chat_message", {"type": "chat.message", "id": 1})
+        for consumer in (ChatConsumer(), ActivityChatConsumer()):
+            consumer.send = AsyncMock()
+            with patch("chat.consumers.json.dumps") as dumps:
+                async_to_sync(consumer.chat_message)(event)
+            dumps.assert_not_called()
+            consumer.send.assert_awaited_once_with(text_data=event["text"])
+
+    def test_events_from_older_senders_are_still_encoded(self):
+        consumer = ChatConsumer()
+        consumer.send = AsyncMock()
+        async_to_sync(consumer.chat_message)({"type": "chat_message", "payload": {"id": 1}})
+        consumer.send.assert_awaited_once_with(text_data='{"id": 1}')
+
+
+class PresenceHeartbeatTests(SimpleTestCase):
+    @patch("chat.presence.set_users_online", new_callable=AsyncMock)
+    def test_open_sockets_are_refreshed_together_until_the_last_leaves(self, mock_set_users_online):
+        async def run_test():
+            heartbeat = PresenceHeartbeat()
+            for user_id in (1, 2, 2):
+                heartbeat.add(user_id)
+            heartbeat.discard(2)
+
+            heartbeat._start_refresh()
+            await asyncio.gather(*heartbeat._tasks)
+            mock_set_users_online.assert_awaited_once_with([1, 2])
+            self.assertIsNotNone(heartbeat._timer)
+
+            heartbeat.discard(1)
+            heartbeat.discard(2)
+            self.assertIsNone(heartbeat._timer)
+
+        async_to_sync(run_test)()
+
+    @patch("chat.consumers.clear_user_online", new_callable=AsyncMock, return_value=False)
+    @patch("chat.consumers.set_user_online", new_callable=AsyncMock)
+    def test_only_sockets_marked_online_release_presence(self, mock_set_online, mock_clear):
+        rejected, accepted = ChatConsumer(), ChatConsumer()
+
+        self.assertFalse(async_to_sync(rejected.mark_offline)())
+        async_to_sync(accepted.mark_online)(5)
+        self.assertFalse(async_to_sync(accepted.mark_offline)())
+        self.assertFalse(async_to_sync(accepted.mark_offline)())
+
+        mock_set_online.assert_awaited_once_with(5)
+        mock_clear.assert_awaited_once_with(5)
+
+
+class PresenceViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="presence-user", email="presence@example.com", password="password123"
+        )
+        self.friend = User.objects.create_user(
+            username="presence-friend", email="presence-friend@example.com", password="password123"
+        )
+        self.blocked = User.objects.create_user(
+            username="presence-blocked",
+            email="presence-blocked@example.com",
+            password="password123",
+        )
+        self.stranger = User.objects.create_user(
+            username="presence-stranger",
+            email="presence-stranger@example.com",
+            password="password123",
+        )
+        self.offline_friend = User.objects.create_user(
+            username="presence-offline",
+            email="presence-offline@example.com",
+            password="password123",
+        )
+        for other in (self.friend, self.offline_friend, self.blocked):
+            Match.objects.create(user_a=self.user, user_b=other)
+        BlockedUser.objects.create(blocker=self.blocked, blocked=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user-presence")
+
+    @patch("chat.presence.get_redis")
+    def test_only_match_partners_are_reported(self, mock_client):
+        redis_client = Mock()
+        redis_client.mget.return_value = ["1", None]
+        mock_client.return_value = redis_client
+        user_ids = [self.friend.id, self.offline_friend.id, self.blocked.id, self.stranger.id]
+
+        response = self.client.get(self.url, {"userIds": ",".join(map(str, user_ids))})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        redis_client.mget.assert_called_once_with(
+            [f"user_online:{self.friend.id}", f"user_online:{self.offline_friend.id}"]
+        )
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"userId": self.friend.id, "isOnline": True},
+                {"userId": self.offline_friend.id, "isOnline": False},
+                {"userId": self.blocked.id, "isOnline": None},
+                {"userId": self.stranger.id, "isOnline": None},
+            ],
+        )
+
+    def test_invalid_or_oversized_queries_are_rejected(self):
+        self.assertEqual(
+            self.client.get(self.url, {"userIds": "1,abc"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        too_many = ",".join(str(n) for n in range(1, 202))
+        self.assertEqual(
+            self.client.get(self.url, {"userIds": too_many}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class TypingDebouncerTests(SimpleTestCase):
+    def setUp(self):
+        self.room = chat_typing_room(1)
+        self.debouncer = TypingDebouncer()
+
+    def test_keystrokes_only_forward_transitions_and_keep_alives(self):
+        sent = [self.debouncer.should_send(self.room, True, now=n * 0.1) for n in range(60)]
+
+        self.assertEqual(sent.count(True), 2)
+        self.assertTrue(sent[0])
+        self.assertTrue(sent[int(TYPING_REFRESH_SECONDS * 10)])
+        self.assertTrue(self.debouncer.should_send(self.room, False, now=6.0))
+        self.assertFalse(self.debouncer.should_send(self.room, False, now=6.1))
+
+    def test_restarts_are_rate_limited_per_room(self):
+        self.assertTrue(self.debouncer.should_send(self.room, True, now=0))
+        self.assertTrue(self.debouncer.should_send(self.room, False, now=0.1))
+        self.assertFalse(self.debouncer.should_send(self.room, True, now=0.2))
+        self.assertTrue(self.debouncer.should_send(chat_typing_room(2), True, now=0.2))
+        self.assertTrue(
+            self.debouncer.should_send(self.room, True, now=0.1 + TYPING_MIN_INTERVAL_SECONDS)
+        )
+        self.assertEqual(self.debouncer.typing_rooms(), [self.room, chat_typing_room(2)])
+
+    def test_stop_without_start_is_dropped(self):
+        self.assertFalse(self.debouncer.should_send(self.room, False, now=0))
+
+    @patch("chat.consumers.get_typing_coalescer")
+    def test_consumer_queues_debounced_updates_and_stops_on_disconnect(self, mock_coalescer):
+        consumer = ChatConsumer()
+        consumer.conversation_id = "1"
+        consumer.scope = {"user": Mock(id=5)}
+        consumer.typing = TypingDebouncer()
+
+        for _ in range(10):
+            async_to_sync(consumer.handle_typing)({"isTyping": True})
+        consumer.stop_typing(5)
+
+        update = mock_coalescer.return_value.update
+        self.assertEqual(
+            [call.args for call in update.call_args_list],
+            [(self.room, 5, True), (self.room, 5, False)],
+        )
+
+
+class ReadStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="reader", email="reader@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="writer", email="writer@example.com", password="password123"
+        )
+        self.conversation = Conversation.objects.create(
+            match=Match.objects.create(user_a=self.user, user_b=self.other)
+        )
+
+    def _unread(self, user):
+        return ConversationReadState.objects.get(
+            conversation=self.conversation, user=user
+        ).unread_count
+
+    def test_participants_get_read_states_and_inserts_bump_the_recipient(self):
+        self.assertEqual(
+            set(
+                ConversationReadState.objects.filter(conversation=self.conversation).values_list(
+                    "user_id", flat=True
+                )
+            ),
+            {self.user.id, self.other.id},
+        )
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="one")
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="two")
+        Message.objects.create(conversation=self.conversation, sender=self.user, text="reply")
+
+        self.assertEqual(self._unread(self.user), 2)
+        self.assertEqual(self._unread(self.other), 1)
+
+    def test_conversation_list_reads_the_counter_without_counting_messages(self):
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="hi")
+        ConversationReadState.objects.filter(user=self.user).update(unread_count=7)
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(reverse("conversation-list"))
+
+        self.assertEqual(response.data["results"][0]["unreadCount"], 7)
+
+    def test_write_behind_batches_bump_the_counter(self):
+        generator = SnowflakeGenerator(worker_id=1)
+        insert_messages(
+            [
+                Message(
+                    id=generator.next_id(),
+                    conversation=self.conversation,
+                    sender=self.other,
+                    text=str(n),
+                    created_at=timezone.now(),
+                )
+                for n in range(3)
+            ]
+        )
+
+        self.assertEqual(self._unread(self.user), 3)
+
+    def test_sequence_is_advanced_past_write_behind_ids(self):
+        snowflake_id = SnowflakeGenerator(worker_id=1).next_id()
+        Message.objects.create(
+            id=snowflake_id, conversation=self.conversation, sender=self.other, text="buffered"
+        )
+
+        self.assertTrue(advance_message_id_sequence())
+        self.assertFalse(advance_message_id_sequence())
+        message = Message.objects.create(
+            conversation=self.conversation, sender=self.other, text="sequence"
+        )
+        self.assertGreater(message.id, snowflake_id)
+
+    @patch("chat.read_state.get_redis")
+    def test_queued_read_pointers_are_flushed_and_recount_unread(self, mock_client):
+        first = Message.objects.create(conversation=self.conversation, sender=self.other, text="1")
+        Message.objects.create(conversation=self.conversation, sender=self.other, text="2")
+        redis_client = Mock()
+        redis_client.exists.side_effect = lambda key: key == READ_POINTERS_KEY
+        redis_client.hgetall.return_value = {
+            f"{self.conversation.id}:{self.user.id}": str(first.id),
+            f"{self.conversation.id + 1000}:{self.user.id}": "5",
+        }
+        mock_client.return_value = redis_client
+
+        self.assertEqual(flush_read_pointers(), 2)
+
+        redis_client.rename.assert_called_once_with(READ_POINTERS_KEY, READ_POINTERS_FLUSHING_KEY)
+        redis_client.delete.assert_called_once_with(READ_POINTERS_FLUSHING_KEY)
+        state = ConversationReadState.objects.get(conversation=self.conversation, user=self.user)
+        self.assertEqual((state.last_read_message_id, state.unread_count), (first.id, 1))
+
+    @patch("chat.read_state.get_redis")
+    def test_a_rejected_pointer_does_not_block_the_batch(self, mock_client):
+        message = Message.objects.create(
+            conversation=self.conversation, sender=self.other, text="1"
+        )
+        bad_conversation_id = self.conversation.id + 1000
+        redis_client = Mock()
+        redis_client.exists.side_effect = lambda key: key == READ_POINTERS_FLUSHING_KEY
+        redis_client.hgetall.return_value = {
+            f"{bad_conversation_id}:{self.user.id}": "99999999999999999999",
+            f"{self.conversation.id}:{self.user.id}": str(message.id),
+            "garbage": "1",
+        }
+        mock_client.return_value = redis_client
+        original = read_state.advance_read_pointer
+
+        def advance(conversation_id, user_id, message_id):
+            if conversation_id == bad_conversation_id:
+                raise DataError("bigint out of range")
+            return original(conversation_id, user_id, message_id)
+
+        with patch("chat.read_state.advance_read_pointer", side_effect=advance):
+            self.assertEqual(flush_read_pointers(), 1)
+
+        redis_client.delete.assert_called_once_with(READ_POINTERS_FLUSHING_KEY)
+        state = ConversationReadState.objects.get(conversation=self.conversation, user=self.user)
+        self.assertEqual((state.last_read_message_id, state.unread_count), (message.id, 0))
+
+    def test_pointer_only_moves_to_messages_of_the_conversation(self):
+        elsewhere = Conversation.objects.create(
+            match=Match.objects.create(user_a=self.other, user_b=self.user, activity=None)
+        )
+        foreign = Message.objects.create(conversation=elsewhere, sender=self.other, text="x")
+
+        self.assertEqual(
+            read_state.advance_read_pointer(self.conversation.id, self.user.id, foreign.id), 0
+        )
+
+
+@patch("chat.consumers.clear_user_online")
+@patch("chat.consumers.set_user_online")
+class ChatReadReceiptTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="receipt-user", email="receipt@example.com", password="password123"
+        )
+        self.other = User.objects.create_user(
+            username="receipt-other", email="receipt-other@example.com", password="password123"
+        )
+        self.conversation = Conversation.objects.create(
+            match=Match.objects.create(user_a=self.user, user_b=self.other)
+        )
+        self.message = Message.objects.create(
+            conversation=self.conversation, sender=self.other, text="hi"
+        )
+        third = User.objects.create_user(
+            username="receipt-third", email="receipt-third@example.com", password="password123"
+        )
+        self.foreign = Message.objects.create(
+            conversation=Conversation.objects.create(
+                match=Match.objects.create(user_a=self.other, user_b=third)
+            ),
+            sender=self.other,
+            text="elsewhere",
+        )
+
+    @patch("chat.consumers.queue_read_pointer", new_callable=AsyncMock)
+    def test_receipts_outside_the_conversation_or_bigint_range_are_ignored(
+        self, mock_queue, mock_set_online, mock_clear_online
+    ):
+        token = str(AccessToken.for_user(self.user))
+
+        async def run_test():
+            communicator = WebsocketCommunicator(
+                application,
+                f"/ws/chat/{self.conversation.id}/?token={token}",
+                headers=[(b"origin", b"http://localhost:5173")],
+            )
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertTrue((await communicator.receive_json_from())["isOnline"])
+            for message_id in ("99999999999999999999", -1, "abc", self.foreign.id, self.message.id):
+                await communicator.send_json_to({"type": "read_message", "messageId": message_id})
+            receipt = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return receipt
+
+        receipt = async_to_sync(run_test)()
+
+        self.assertEqual(receipt["messageId"], self.message.id)
+        mock_queue.assert_awaited_once()
+        self.assertEqual(mock_queue.await_args.args[1:], (self.user.id, self.message.id))
@@ -0,0 +1,166 @@
+"""Debounced, coalesced typing indicators.
+
+Clients may send a ``typing`` frame per keystroke. Each socket keeps a
+:class:`TypingDebouncer` that passes on only state changes, a keep-alive before
+the indicator expires, and at most one start per ``TYPING_MIN_INTERVAL_SECONDS``
+per room; stops always pass. Surviving updates are collected per room on each
+event loop and, every ``TYPING_FRAME_INTERVAL_SECONDS``, written to the room's
+Redis sorted set (member user id, score expiry time) in one pipeline that also
+reads back who is still typing. That list goes to the room as a single
+``typing_indicator`` frame::
+
+    {"conversationId": 1, "userIds": [3, 7], "expiresIn": 10}
+
+(``activityId`` for activity rooms, wrapped in the event envelope those
+sockets use). Clients replace their indicator state with each frame and drop it
+after ``expiresIn`` seconds without a new one.
+"""
+
+import asyncio
+import logging
+import time
+from typing import NamedTuple
+
+from channels.layers import get_channel_layer
+
+from utils.redis_pool import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+TYPING_TTL_SECONDS = 10
+TYPING_REFRESH_SECONDS = TYPING_TTL_SECONDS / 2
+TYPING_MIN_INTERVAL_SECONDS = 1.0
+TYPING_FRAME_INTERVAL_SECONDS = 0.5
+
+
+class TypingRoom(NamedTuple):
+    group: str
+    key: str
+    id_field: str
+    object_id: int
+    envelope: bool
+
+    def frame(self, user_ids):
+        payload = {
+            self.id_field: self.object_id,
+            "userIds": user_ids,
+            "expiresIn": TYPING_TTL_SECONDS,
+        }
+        return {"type": "typing_indicator", "payload": payload} if self.envelope else payload
+
+
+def chat_typing_room(conversation_id):
+    conversation_id = int(conversation_id)
+    return TypingRoom(
+        f"chat_{conversation_id}",
+        f"typing:chat:{conversation_id}",
+        "conversationId",
+        conversation_id,
+        False,
+    )
+
+
+def activity_typing_room(activity_id):
+    activity_id = int(activity_id)
+    return TypingRoom(
+        f"activity_chat_{activity_id}",
+        f"typing:activity:{activity_id}",
+        "activityId",
+        activity_id,
+        True,
+    )
+
+
+class TypingDebouncer:
+    """One socket's last forwarded typing state per room."""
+
+    def __init__(self):
+        self.rooms = {}
+
+    def should_send(self, room, is_typing, now=None):
+        now = time.monotonic() if now is None else now
+        state = self.rooms.get(room)
+        if state is not None:
+            was_typing, sent_at = state
+            if not is_typing and not was_typing:
+                return False
+            if is_typing and now - sent_at < (
+                TYPING_REFRESH_SECONDS if was_typing else TYPING_MIN_INTERVAL_SECONDS
+            ):
+                return False
+        elif not is_typing:
+            return False
+        self.rooms[room] = (is_typing, now)
+        return True
+
+    def typing_rooms(self):
+        return [room for room, (is_typing, _) in self.rooms.items() if is_typing]
+
+
+class TypingCoalescer:
+    """Per event loop buffer of typing changes, flushed as one frame per room."""
+
+    def __init__(self, channel_layer):
+        self.channel_layer = channel_layer
+        self.pending = {}
+        self._timer = None
+        self._tasks = set()
+
+    def update(self, room, user_id, is_typing):
+        self.pending.setdefault(room, {})[user_id] = is_typing
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                TYPING_FRAME_INTERVAL_SECONDS, self._start_flush
+            )
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        from .consumers import serialized_event
+
+        now = time.time()
+        member_results = {}
+        try:
+            client = get_async_redis()
+            async with client.pipeline(transaction=False) as pipe:
+                for room, changes in pending.items():
+                    started = [user_id for user_id, typing in changes.items() if typing]
+                    stopped = [user_id for user_id, typing in changes.items() if not typing]
+                    if started:
+                        pipe.zadd(room.key, dict.fromkeys(started, now + TYPING_TTL_SECONDS))
+                    if stopped:
+                        pipe.zrem(room.key, *stopped)
+                    pipe.zremrangebyscore(room.key, "-inf", now)
+                    member_results[room] = len(pipe.command_stack)
+                    pipe.zrange(room.key, 0, -1)
+                    pipe.expire(room.key, TYPING_TTL_SECONDS)
+                results = await pipe.execute()
+        except Exception:
+            logger.exception("Typing state update for %s rooms failed", len(pending))
+            return
+
+        for room, index in member_results.items():
+            user_ids = sorted(int(member) for member in results[index])
+            await self.channel_layer.group_send(
+                room.group, serialized_event("typing_indicator", room.frame(user_ids))
+            )
+
+
+_coalescers: dict[asyncio.AbstractEventLoop, TypingCoalescer] = {}
+
+
+def get_typing_coalescer():
+    loop = asyncio.get_running_loop()
+    coalescer = _coalescers.get(loop)
+    if coalescer is None:
+        for old_loop in [old_loop for old_loop in _coalescers if old_loop.is_closed()]:
+            del _coalescers[old_loop]
+        coalescer = _coalescers[loop] = TypingCoalescer(get_channel_layer())
+    return coalescer
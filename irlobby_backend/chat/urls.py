@@ -9,4 +9,5 @@ urlpatterns = [
         views.MessageListView.as_view(),
         name="message-list",
     ),
+    path("presence/", views.PresenceView.as_view(), name="user-presence"),
 ]
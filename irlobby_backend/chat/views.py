@@ -1,13 +1,48 @@
+import logging
+
+import redis
 from django.db.models import Q
-from django.shortcuts import get_object_or_404
-from rest_framework import generics, serializers
+from django.http import Http404
+from rest_framework import generics, serializers, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from moderation.models import BlockedUser
+from moderation.utils import get_blocked_user_ids
 from users.push_notifications import send_new_message_notification
+from utils.fast_serializers import FastReadListMixin
 
+from .membership import get_conversation_member_ids, get_match_partner_ids
 from .models import Conversation, Message
+from .pagination import MessageCursorPagination
+from .presence import MAX_PRESENCE_QUERY_USERS, get_online_user_ids
+from .read_state import mark_conversation_read, with_last_message_id, with_unread_count
 from .serializers import ConversationSerializer, MessageSerializer
+from .write_behind import new_message_id
+
+logger = logging.getLogger(__name__)
+
+
+def attach_last_messages(conversations):
+    """Load the annotated last messages of ``conversations`` (and senders) in one query."""
+    messages = Message.objects.select_related("sender").in_bulk(
+        [
+            conversation.last_message_id
+            for conversation in conversations
+            if conversation.last_message_id is not None
+        ]
+    )
+    for conversation in conversations:
+        conversation.last_message = messages.get(conversation.last_message_id)
+    return conversations
+
+
+def check_conversation_member(conversation_id, user):
+    """Return whether ``user`` is a participant; 404 when the conversation does not exist."""
+    members = get_conversation_member_ids(conversation_id)
+    if members is None:
+        raise Http404
+    return user.id in members
 
 
 class ConversationListView(generics.ListAPIView):
@@ -16,42 +51,112 @@ class ConversationListView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        blocked_ids = BlockedUser.objects.filter(blocker=user).values_list("blocked_id", flat=True)
-        blocked_by_ids = BlockedUser.objects.filter(blocked=user).values_list(
-            "blocker_id", flat=True
-        )
-        exclude_ids = set(blocked_ids) | set(blocked_by_ids)
+        exclude_ids = get_blocked_user_ids(user)
 
-        return (
+        conversations = (
             Conversation.objects.filter(Q(match__user_a=user) | Q(match__user_b=user))
             .exclude(match__user_a_id__in=exclude_ids)
             .exclude(match__user_b_id__in=exclude_ids)
+            .select_related("match__user_a", "match__user_b")
+            .order_by("-id")
         )
+        return with_unread_count(with_last_message_id(conversations), user)
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        conversations = attach_last_messages(list(queryset) if page is None else page)
+        serializer = self.get_serializer(conversations, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
 
-class MessageListView(generics.ListCreateAPIView):
+
+class MessageListView(FastReadListMixin, generics.ListCreateAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageCursorPagination
 
     def get_queryset(self):
         conversation_id = self.kwargs["conversation_id"]
-        conversation = get_object_or_404(Conversation, id=conversation_id)
-
-        # Check if user is part of this conversation
-        if self.request.user not in [conversation.match.user_a, conversation.match.user_b]:
+        if not check_conversation_member(conversation_id, self.request.user):
             return Message.objects.none()
 
-        return Message.objects.filter(conversation=conversation).order_by("created_at")
+        self.is_member = True
+        return Message.objects.filter(conversation_id=conversation_id).select_related("sender")
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        page = getattr(self.paginator, "page", None)
+        opened_latest = not (
+            request.query_params.get("before") or request.query_params.get("after")
+        )
+        if page and opened_latest and getattr(self, "is_member", False):
+            mark_conversation_read(self.kwargs["conversation_id"], request.user.id, page[-1].id)
+        return response
 
     def perform_create(self, serializer):
         conversation_id = self.kwargs["conversation_id"]
-        conversation = get_object_or_404(Conversation, id=conversation_id)
-
-        # Check if user is part of this conversation
-        if self.request.user not in [conversation.match.user_a, conversation.match.user_b]:
+        if not check_conversation_member(conversation_id, self.request.user):
             raise serializers.ValidationError(
                 "Not authorized to send messages in this conversation"
             )
 
-        message = serializer.save(conversation=conversation, sender=self.request.user)
+        message = serializer.save(
+            id=new_message_id(), conversation_id=conversation_id, sender=self.request.user
+        )
         send_new_message_notification(message)
+
+
+class PresenceView(APIView):
+    """Online state of up to ``MAX_PRESENCE_QUERY_USERS`` of the caller's match partners.
+
+    Other ids, and users in a block with the caller, come back with ``isOnline: null``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            user_ids = list(
+                dict.fromkeys(
+                    int(user_id)
+                    for user_id in request.query_params.get("userIds", "").split(",")
+                    if user_id.strip()
+                )
+            )
+        except ValueError:
+            return Response(
+                {"error": "userIds must be a comma-separated list of ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(user_ids) > MAX_PRESENCE_QUERY_USERS:
+            return Response(
+                {"error": f"At most {MAX_PRESENCE_QUERY_USERS} userIds per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        visible_ids = get_match_partner_ids(request.user, user_ids) - get_blocked_user_ids(
+            request.user
+        )
+        try:
+            online_ids = get_online_user_ids(
+                user_id for user_id in user_ids if user_id in visible_ids
+            )
+        except redis.RedisError:
+            logger.exception("Presence lookup failed")
+            return Response(
+                {"error": "Presence is temporarily unavailable"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response(
+            {
+                "results": [
+                    {
+                        "userId": user_id,
+                        "isOnline": user_id in online_ids if user_id in visible_ids else None,
+                    }
+                    for user_id in user_ids
+                ]
+            }
+        )
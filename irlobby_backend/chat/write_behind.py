@@ -0,0 +1,293 @@
+"""Optional write-behind persistence for websocket chat messages.
+
+With ``CHAT_WRITE_BEHIND_ENABLED`` a consumer builds the ``Message`` in memory,
+with a snowflake id and ``created_at`` assigned on receipt, broadcasts it at
+once and queues it on its event loop's :class:`MessageWriteBuffer`. The buffer
+inserts everything pending with one ``bulk_create`` every
+``CHAT_WRITE_BEHIND_FLUSH_MS`` milliseconds, or as soon as
+``CHAT_WRITE_BEHIND_MAX_BATCH`` messages are waiting.
+
+Durability: a message reaches the room before it is committed.
+
+* A crash or ``SIGKILL`` loses what was accepted since the last flush, at most
+  one flush interval (or ``MAX_BATCH`` messages) per process.
+* A graceful shutdown loses nothing: servers disconnect every socket, each
+  disconnect flushes, and an ``atexit`` hook writes whatever is still queued.
+* A failed flush keeps the batch in order and retries it. Rows that can never
+  be written (the conversation was deleted meanwhile) are logged and dropped.
+* REST posts are always written synchronously.
+
+While the mode is on every new message, REST ones included, takes a snowflake
+id so ids keep growing with time across processes. Snowflake ids fit in 53 bits
+so clients read them as exact JavaScript numbers. Every process needs its own
+``CHAT_SNOWFLAKE_WORKER_ID`` (0-63); startup fails without one, and a value
+shared by two processes yields duplicate ids. Snowflake ids sit far above the
+table's sequence; once the mode is off, every ``migrate`` run advances the
+sequence past ``MAX(id)`` (:func:`advance_message_id_sequence`) so new ids and
+the read pointers in ``ConversationReadState`` stay ordered.
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Message
+from .read_state import count_new_messages
+
+logger = logging.getLogger(__name__)
+
+SNOWFLAKE_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+SNOWFLAKE_WORKER_BITS = 6
+SNOWFLAKE_SEQUENCE_BITS = 6
+FLUSH_RETRY_SECONDS = 1.0
+# How long a snowflake id may still sit in some process's buffer before insert.
+UNWRITTEN_MESSAGE_WINDOW_SECONDS = 30
+
+
+class SnowflakeGenerator:
+    """53-bit ids: milliseconds since 2024 (41 bits) | worker (6 bits) | sequence (6 bits).
+
+    Ids from one generator strictly increase; once 64 ids have been issued in
+    a millisecond, the next millisecond is borrowed rather than waited for.
+    """
+
+    def __init__(self, worker_id):
+        if not 0 <= worker_id < 1 << SNOWFLAKE_WORKER_BITS:
+            raise ValueError(f"Snowflake worker ids must be in [0, {1 << SNOWFLAKE_WORKER_BITS}).")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = max(int(time.time() * 1000), self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) % (1 << SNOWFLAKE_SEQUENCE_BITS)
+                if self._sequence == 0:
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return (
+                (now_ms - SNOWFLAKE_EPOCH_MS) << (SNOWFLAKE_WORKER_BITS + SNOWFLAKE_SEQUENCE_BITS)
+                | self.worker_id << SNOWFLAKE_SEQUENCE_BITS
+                | self._sequence
+            )
+
+
+def get_snowflake_worker_id():
+    """Return ``CHAT_SNOWFLAKE_WORKER_ID``, which write-behind mode requires."""
+    worker_id = getattr(settings, "CHAT_SNOWFLAKE_WORKER_ID", None)
+    if worker_id is None or not 0 <= worker_id < 1 << SNOWFLAKE_WORKER_BITS:
+        raise ImproperlyConfigured(
+            "CHAT_WRITE_BEHIND_ENABLED requires a CHAT_SNOWFLAKE_WORKER_ID between 0 and "
+            f"{(1 << SNOWFLAKE_WORKER_BITS) - 1}, unique to each process."
+        )
+    return worker_id
+
+
+_generator = None
+
+
+def get_snowflake_generator():
+    """Return this process's generator; a forked child starts a fresh one."""
+    global _generator
+    pid = os.getpid()
+    if _generator is None or _generator[0] != pid:
+        _generator = (pid, SnowflakeGenerator(get_snowflake_worker_id()))
+    return _generator[1]
+
+
+def new_message_id():
+    """A snowflake id when write-behind is on, else ``None`` for the table's sequence."""
+    if not settings.CHAT_WRITE_BEHIND_ENABLED:
+        return None
+    return get_snowflake_generator().next_id()
+
+
+def advance_message_id_sequence(using="default"):
+    """Move the message id sequence past ``MAX(id)`` when write-behind is off.
+
+    Without this, a sequence left behind by snowflake ids would hand out ids
+    below messages that are already stored. Returns whether it moved.
+    """
+    if settings.CHAT_WRITE_BEHIND_ENABLED or connections[using].vendor != "postgresql":
+        return False
+    connection = connections[using]
+    table = Message._meta.db_table
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return False
+        cursor.execute(
+            "SELECT setval(seq, max_id) FROM ("
+            "SELECT pg_get_serial_sequence(%s, 'id')::regclass AS seq, MAX(id) AS max_id "
+            f"FROM {connection.ops.quote_name(table)}"
+            ") AS message_ids WHERE max_id > COALESCE(pg_sequence_last_value(seq), 0)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def insert_messages(messages):
+    """Insert ``messages`` with one statement, isolating rows that violate constraints."""
+    try:
+        with transaction.atomic():
+            Message.objects.bulk_create(messages)
+            count_new_messages(messages)
+        return
+    except IntegrityError:
+        pass
+    for message in messages:
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([message])
+                count_new_messages([message])
+        except IntegrityError:
+            logger.exception(
+                "Dropping buffered message %s for conversation %s",
+                message.id,
+                message.conversation_id,
+            )
+
+
+class MessageWriteBuffer:
+    """Per event loop queue of accepted messages awaiting a batched insert."""
+
+    def __init__(self, flush_interval, max_batch):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.pending = []
+        # The batch being inserted right now; no longer pending, not yet committed.
+        self.writing = []
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._tasks = set()
+
+    def add(self, message):
+        self.pending.append(message)
+        if len(self.pending) >= self.max_batch:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.flush_interval)
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Write everything pending in batches of ``max_batch``; False if a batch failed."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self.pending:
+                batch = self.pending[: self.max_batch]
+                del self.pending[: self.max_batch]
+                self.writing = batch
+                try:
+                    await database_sync_to_async(insert_messages)(batch)
+                except Exception:
+                    logger.exception("Flushing %s buffered chat messages failed", len(batch))
+                    self.pending[:0] = batch
+                    self._schedule(max(self.flush_interval, FLUSH_RETRY_SECONDS))
+                    return False
+                finally:
+                    self.writing = []
+        return True
+
+    def holds(self, conversation_id, message_id):
+        return any(
+            message.id == message_id and message.conversation_id == conversation_id
+            for message in (*self.pending, *self.writing)
+        )
+
+    def flush_sync(self):
+        """Write what is pending from outside the event loop (interpreter exit)."""
+        batch, self.pending = self.pending, []
+        for start in range(0, len(batch), self.max_batch):
+            insert_messages(batch[start : start + self.max_batch])
+
+
+_buffers: dict[asyncio.AbstractEventLoop, MessageWriteBuffer] = {}
+
+
+def get_message_buffer():
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        # Buffers of closed loops are kept until empty so the exit hook can write them.
+        for old_loop, old_buffer in list(_buffers.items()):
+            if old_loop.is_closed() and not old_buffer.pending:
+                del _buffers[old_loop]
+        buffer = _buffers[loop] = MessageWriteBuffer(
+            settings.CHAT_WRITE_BEHIND_FLUSH_MS / 1000, settings.CHAT_WRITE_BEHIND_MAX_BATCH
+        )
+    return buffer
+
+
+async def persist_chat_message(conversation_id, sender, text):
+    """Create a message now, or queue it for the next batch in write-behind mode."""
+    if not settings.CHAT_WRITE_BEHIND_ENABLED:
+        return await database_sync_to_async(Message.objects.create)(
+            conversation_id=int(conversation_id), sender=sender, text=text
+        )
+
+    message = Message(
+        id=new_message_id(),
+        conversation_id=int(conversation_id),
+        sender=sender,
+        text=text,
+        created_at=timezone.now(),
+    )
+    get_message_buffer().add(message)
+    return message
+
+
+def may_be_unwritten(conversation_id, message_id):
+    """Whether ``message_id`` can be an accepted message that is not in the table yet.
+
+    True when this event loop still holds it, or, for ids issued in the last
+    ``UNWRITTEN_MESSAGE_WINDOW_SECONDS``, when another process may.
+    """
+    if not settings.CHAT_WRITE_BEHIND_ENABLED:
+        return False
+    buffer = _buffers.get(asyncio.get_running_loop())
+    if buffer is not None and buffer.holds(conversation_id, message_id):
+        return True
+    issued_ms = (
+        message_id >> (SNOWFLAKE_WORKER_BITS + SNOWFLAKE_SEQUENCE_BITS)
+    ) + SNOWFLAKE_EPOCH_MS
+    age_ms = time.time() * 1000 - issued_ms
+    return -1000 <= age_ms <= UNWRITTEN_MESSAGE_WINDOW_SECONDS * 1000
+
+
+async def flush_chat_messages():
+    if settings.CHAT_WRITE_BEHIND_ENABLED:
+        await get_message_buffer().flush()
+
+
+@atexit.register
+def flush_pending_messages_at_exit():
+    for buffer in list(_buffers.values()):
+        if buffer.pending:
+            try:
+                buffer.flush_sync()
+            except Exception:
+                logger.exception("Could not write buffered chat messages at exit")
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 import sys
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 from urllib.parse import urlparse
@@ -190,6 +191,12 @@ WSGI_APPLICATION = "irlobby_backend.wsgi.application"
 ASGI_APPLICATION = "irlobby_backend.asgi.application"
 
 REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+# Shared application pools (utils.redis_pool): at most this many connections per
+# process (and per event loop for asyncio); callers wait REDIS_POOL_TIMEOUT_SECONDS
+# for a free one before failing. Channels and Celery use their own connections.
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", default=50, cast=int)
+REDIS_POOL_TIMEOUT_SECONDS = config("REDIS_POOL_TIMEOUT_SECONDS", default=2.0, cast=float)
+REDIS_SOCKET_TIMEOUT_SECONDS = config("REDIS_SOCKET_TIMEOUT_SECONDS", default=5.0, cast=float)
 
 CHANNEL_LAYERS = {
     "default": {
@@ -222,7 +229,22 @@ DATABASES = {
     )
 }
 
+# Shared cache for per-user lookups (blocked-user sets, OAuth state) so that
+# invalidation in one worker is visible to every other worker.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_URL", default=REDIS_URL),
+    }
+}
+
 if _IS_TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
     # Unit tests run without a Redis service. Use Channels' in-memory layer so
     # WebsocketCommunicator lifecycle tests can connect and disconnect without
     # opening a localhost:6379 connection.
@@ -375,6 +397,28 @@ CELERY_BEAT_SCHEDULE = {
         "task": "activities.tasks.notify_upcoming_activities",
         "schedule": 300.0,
     },
+    "refresh-upcoming-activity-slots": {
+        "task": "activities.tasks.refresh_upcoming_activity_slots",
+        "schedule": 60.0,
+    },
+    "expire-ticket-holds": {
+        "task": "activities.tasks.expire_ticket_holds",
+        "schedule": 60.0,
+    },
+    # Safety net; the webhook view also enqueues a run for each new delivery.
+    "process-stripe-webhook-events": {
+        "task": "activities.tasks.process_stripe_webhook_events",
+        "schedule": 15.0,
+    },
+    "prune-stripe-webhook-events": {
+        "task": "activities.tasks.prune_stripe_webhook_events",
+        "schedule": 3600.0,
+    },
+    # Websocket read receipts wait in Redis until this run writes them to Postgres.
+    "flush-chat-read-pointers": {
+        "task": "chat.tasks.flush_read_pointers",
+        "schedule": 10.0,
+    },
 }
 
 
@@ -384,6 +428,27 @@ CELERY_BEAT_SCHEDULE = {
 STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# Content-addressed ticket QR images (activities.qr). The filesystem backend is
+# served by activities.views.TicketQRImageView; an object-storage backend can be
+# swapped in here and will return its own URLs.
+TICKET_QR_STORAGE_ROOT = config(
+    "TICKET_QR_STORAGE_ROOT", default=os.path.join(BASE_DIR, "media", "ticket-qr")
+)
+if _IS_TESTING:
+    TICKET_QR_STORAGE_ROOT = os.path.join(tempfile.gettempdir(), "irlobby-test-ticket-qr")
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "ticket_qr": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {
+            "location": TICKET_QR_STORAGE_ROOT,
+            "base_url": "/api/activities/tickets/qr/",
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -460,4 +525,22 @@ STRIPE_API_KEY = config("STRIPE_API_KEY", default="")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
 STRIPE_SUCCESS_URL = config("STRIPE_SUCCESS_URL", default="http://localhost:3000/tickets/success")
 STRIPE_CANCEL_URL = config("STRIPE_CANCEL_URL", default="http://localhost:3000/tickets/cancel")
+# Empty uses api.stripe.com; point at a stub (activities.stripe_stub) for load tests.
+STRIPE_API_BASE = config("STRIPE_API_BASE", default="")
+STRIPE_HTTP_POOL_SIZE = config("STRIPE_HTTP_POOL_SIZE", default=10, cast=int)
+STRIPE_CONNECT_TIMEOUT_SECONDS = config("STRIPE_CONNECT_TIMEOUT_SECONDS", default=3.05, cast=float)
+STRIPE_READ_TIMEOUT_SECONDS = config("STRIPE_READ_TIMEOUT_SECONDS", default=15.0, cast=float)
+STRIPE_MAX_NETWORK_RETRIES = config("STRIPE_MAX_NETWORK_RETRIES", default=1, cast=int)
 ENABLE_TICKETING = config("ENABLE_TICKETING", default=True, cast=bool)
+TICKET_HOLD_SECONDS = config("TICKET_HOLD_SECONDS", default=31 * 60, cast=int)
+# Write-behind chat persistence (chat.write_behind): websocket messages are
+# broadcast immediately and inserted in batches. A crash loses at most one
+# flush interval of accepted messages; see the module docstring before enabling.
+# Enabling it requires a CHAT_SNOWFLAKE_WORKER_ID (0-63) unique to each process.
+CHAT_WRITE_BEHIND_ENABLED = config("CHAT_WRITE_BEHIND_ENABLED", default=False, cast=bool)
+CHAT_WRITE_BEHIND_FLUSH_MS = config("CHAT_WRITE_BEHIND_FLUSH_MS", default=50, cast=int)
+CHAT_WRITE_BEHIND_MAX_BATCH = config("CHAT_WRITE_BEHIND_MAX_BATCH", default=200, cast=int)
+CHAT_SNOWFLAKE_WORKER_ID = config("CHAT_SNOWFLAKE_WORKER_ID", default=None, cast=int)
+ACTIVITY_FEED_TILE_CACHE_ENABLED = config(
+    "ACTIVITY_FEED_TILE_CACHE_ENABLED", default=True, cast=bool
+)
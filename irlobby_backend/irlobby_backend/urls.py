@@ -16,11 +16,15 @@ Including another URLconf
 """
 
 import logging
+import time
 
 from django.contrib import admin
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.urls import include, path, re_path
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
 )
@@ -31,6 +35,7 @@ from users.views import (
     password_reset_confirm,
     request_password_reset,
 )
+from utils.redis_pool import get_redis, redis_pool_metrics
 
 
 def home(request):
@@ -58,13 +63,7 @@ def health_check(request):
         return JsonResponse(checks, status=503)
 
     try:
-        import redis as redis_lib
-        from django.conf import settings
-
-        redis_conn = redis_lib.Redis.from_url(
-            getattr(settings, "REDIS_URL", "redis://localhost:6379/0")
-        )
-        redis_conn.ping()
+        get_redis().ping()
     except Exception as exc:
         logger.error("Health check redis failure: %s", exc)
         checks["redis"] = "error"
@@ -74,10 +73,26 @@ def health_check(request):
     return JsonResponse(checks)
 
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def redis_health(request):
+    """Shared Redis pool saturation and command latency for this process."""
+    started = time.perf_counter()
+    try:
+        get_redis().ping()
+    except Exception as exc:
+        logger.error("Redis metrics ping failure: %s", exc)
+        ping_ms = None
+    else:
+        ping_ms = round((time.perf_counter() - started) * 1000, 3)
+    return Response({"pingMs": ping_ms, "pools": redis_pool_metrics()})
+
+
 urlpatterns = [
     path("", home, name="home"),
     path("admin/", admin.site.urls),
     path("api/health/", health_check, name="health"),
+    path("api/health/redis/", redis_health, name="health-redis"),
     path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/token/refresh/", CookieTokenRefreshView.as_view(), name="token_refresh"),
     path("api/auth/logout/", logout_view, name="token_logout"),
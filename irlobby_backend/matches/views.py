@@ -2,29 +2,27 @@ from django.db.models import Q
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 
-from moderation.models import BlockedUser
+from moderation.utils import get_blocked_user_ids
+from utils.fast_serializers import FastReadListMixin
 
 from .models import Match
 from .serializers import MatchSerializer
 from .throttles import MatchReadThrottle
 
 
-class MatchListView(generics.ListAPIView):
+class MatchListView(FastReadListMixin, generics.ListAPIView):
     serializer_class = MatchSerializer
     permission_classes = [IsAuthenticated]
     throttle_classes = [MatchReadThrottle]
 
     def get_queryset(self):
         user = self.request.user
-        blocked_ids = BlockedUser.objects.filter(blocker=user).values_list("blocked_id", flat=True)
-        blocked_by_ids = BlockedUser.objects.filter(blocked=user).values_list(
-            "blocker_id", flat=True
-        )
-        exclude_ids = set(blocked_ids) | set(blocked_by_ids)
+        exclude_ids = get_blocked_user_ids(user)
 
         return (
             Match.objects.filter(Q(user_a=user) | Q(user_b=user))
             .exclude(user_a_id__in=exclude_ids)
             .exclude(user_b_id__in=exclude_ids)
+            .select_related("activity", "user_a", "user_b")
             .order_by("-created_at")
         )
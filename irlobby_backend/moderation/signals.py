@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import BlockedUser
+from .utils import invalidate_blocked_user_ids
+
+
+def _invalidate_pair(blocker_id, blocked_id):
+    invalidate_blocked_user_ids(blocker_id, blocked_id)
+    # Again after commit, in case a concurrent read cached the old set meanwhile.
+    transaction.on_commit(lambda: invalidate_blocked_user_ids(blocker_id, blocked_id), robust=True)
+
+
+@receiver(pre_save, sender=BlockedUser)
+def invalidate_previous_block_pair(sender, instance, raw=False, **kwargs):
+    # An admin edit can move a block to other users; the old pair changes too.
+    if instance.pk is None or raw:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list("blocker_id", "blocked_id").first()
+    if previous is not None and previous != (instance.blocker_id, instance.blocked_id):
+        _invalidate_pair(*previous)
+
+
+@receiver(post_save, sender=BlockedUser)
+@receiver(post_delete, sender=BlockedUser)
+def invalidate_blocked_user_ids_on_change(sender, instance, **kwargs):
+    """Covers the API, the admin and cascade deletes alike."""
+    _invalidate_pair(instance.blocker_id, instance.blocked_id)
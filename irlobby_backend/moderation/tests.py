@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -9,6 +10,7 @@ from activities.models import Activity
 from users.models import User
 
 from .models import AbuseReport, BlockedUser
+from .utils import get_blocked_user_ids
 
 
 class BlockUserTests(APITestCase):
@@ -197,3 +199,55 @@ class BlockedUserActivityFilterTests(APITestCase):
         titles = [a["title"] for a in results]
         self.assertNotIn("Blocked Activity", titles)
         self.assertIn("Normal Activity", titles)
+
+
+class BlockedUserIdsCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="cache-user", email="cache-user@example.com", password="password123"
+        )
+        self.target = User.objects.create_user(
+            username="cache-target", email="cache-target@example.com", password="password123"
+        )
+
+    def test_blocked_ids_include_both_directions(self):
+        BlockedUser.objects.create(blocker=self.target, blocked=self.user)
+
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset({self.target.id}))
+        self.assertEqual(get_blocked_user_ids(self.target), frozenset({self.user.id}))
+
+    def test_cached_blocked_ids_skip_database(self):
+        get_blocked_user_ids(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_blocked_user_ids(self.user), frozenset())
+
+    def test_block_and_unblock_invalidate_cached_ids(self):
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset())
+        self.assertEqual(get_blocked_user_ids(self.target), frozenset())
+
+        self.client.force_authenticate(self.user)
+        self.client.post(reverse("block-user", args=[self.target.id]))
+
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset({self.target.id}))
+        self.assertEqual(get_blocked_user_ids(self.target), frozenset({self.user.id}))
+
+        self.client.delete(reverse("unblock-user", args=[self.target.id]))
+
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset())
+        self.assertEqual(get_blocked_user_ids(self.target), frozenset())
+
+    def test_blocks_changed_outside_the_api_invalidate_cached_ids(self):
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset())
+
+        block = BlockedUser.objects.create(blocker=self.target, blocked=self.user)
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset({self.target.id}))
+
+        block.delete()
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset())
+
+        BlockedUser.objects.create(blocker=self.user, blocked=self.target)
+        self.assertEqual(get_blocked_user_ids(self.target), frozenset({self.user.id}))
+        self.target.delete()
+        self.assertEqual(get_blocked_user_ids(self.user), frozenset())
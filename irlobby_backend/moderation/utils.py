@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import BlockedUser
+
+BLOCKED_USER_IDS_CACHE_TTL_SECONDS = 60 * 10
+
+
+def _blocked_user_ids_cache_key(user_id):
+    return f"moderation:blocked_user_ids:{user_id}"
+
+
+def get_blocked_user_ids(user):
+    """Return ids of users that ``user`` blocked or was blocked by.
+
+    Both directions are resolved with a single query and cached per user, so
+    feed, match and conversation reads do not pay for the lookup on every
+    request. Callers must treat the result as read-only.
+    """
+
+    user_id = getattr(user, "pk", user)
+    cache_key = _blocked_user_ids_cache_key(user_id)
+    cached_ids = cache.get(cache_key)
+    if cached_ids is not None:
+        return frozenset(cached_ids)
+
+    rows = BlockedUser.objects.filter(Q(blocker_id=user_id) | Q(blocked_id=user_id)).values_list(
+        "blocker_id", "blocked_id"
+    )
+    blocked_ids = frozenset(
+        blocked_id if blocker_id == user_id else blocker_id for blocker_id, blocked_id in rows
+    )
+    cache.set(cache_key, list(blocked_ids), BLOCKED_USER_IDS_CACHE_TTL_SECONDS)
+    return blocked_ids
+
+
+def invalidate_blocked_user_ids(*users):
+    """Drop cached blocked-user sets after a block relationship changes."""
+    cache.delete_many([_blocked_user_ids_cache_key(getattr(user, "pk", user)) for user in users])
+
+
+def is_blocked_between(user, other):
+    """Return True when either user has blocked the other."""
+    return getattr(other, "pk", other) in get_blocked_user_ids(user)
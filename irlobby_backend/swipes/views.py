@@ -7,7 +7,7 @@ from rest_framework.response import Response
 
 from activities.models import Activity
 from matches.models import Match
-from moderation.models import BlockedUser
+from moderation.utils import is_blocked_between
 from users.push_notifications import send_new_match_notifications
 
 from .models import Swipe
@@ -39,10 +39,7 @@ def swipe_activity(request, pk):
         return Response({"error": "Invalid direction"}, status=status.HTTP_400_BAD_REQUEST)
 
     # Prevent swiping on activities from/by blocked users
-    if (
-        BlockedUser.objects.filter(blocker=user, blocked=activity.host).exists()
-        or BlockedUser.objects.filter(blocker=activity.host, blocked=user).exists()
-    ):
+    if is_blocked_between(user, activity.host_id):
         return Response(
             {"error": "Cannot interact with this user"}, status=status.HTTP_403_FORBIDDEN
         )
@@ -0,0 +1,197 @@
+"""Shared Redis connection pools for application code.
+
+``get_redis()`` returns a client on the process-wide synchronous pool and
+``get_async_redis()`` one on the running event loop's asyncio pool (asyncio
+connections cannot cross loops). Both are blocking pools capped at
+``REDIS_MAX_CONNECTIONS``: when every connection is busy a caller waits up to
+``REDIS_POOL_TIMEOUT_SECONDS`` for one instead of opening another socket, then
+gets ``redis.ConnectionError``.
+
+Each pool records checkouts, time spent waiting for a connection, exhaustion
+errors and how long each connection was held, which is one command or one
+pipeline round trip. ``redis_pool_metrics()`` reports them. Channels and Celery
+keep their own connections.
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+LATENCY_BUCKETS_MS = (1, 5, 25, 100, 500)
+
+
+class PoolMetrics:
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.exhausted = 0
+        self.commands = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._lock = threading.Lock()
+
+    def checked_out(self, wait_ms):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+
+    def failed(self, error):
+        if "No connection available" in str(error):
+            with self._lock:
+                self.exhausted += 1
+
+    def released(self, held_ms):
+        with self._lock:
+            self.in_use -= 1
+            self.commands += 1
+            self.latency_ms_total += held_ms
+            self.latency_ms_max = max(self.latency_ms_max, held_ms)
+            self.latency_buckets[bisect_left(LATENCY_BUCKETS_MS, held_ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "maxConnections": self.max_connections,
+                "inUse": self.in_use,
+                "peakInUse": self.peak_in_use,
+                "saturation": round(self.in_use / self.max_connections, 3),
+                "checkouts": self.checkouts,
+                "waitMsAvg": (
+                    round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0
+                ),
+                "exhausted": self.exhausted,
+                "commands": self.commands,
+                "latencyMsAvg": (
+                    round(self.latency_ms_total / self.commands, 3) if self.commands else 0.0
+                ),
+                "latencyMsMax": round(self.latency_ms_max, 3),
+                "latencyMsBuckets": {
+                    **{
+                        f"le{bound}": count
+                        for bound, count in zip(LATENCY_BUCKETS_MS, self.latency_buckets)
+                    },
+                    "inf": self.latency_buckets[-1],
+                },
+            }
+
+
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    def reset(self):
+        super().reset()
+        # Also runs after a fork; the child starts with empty counters.
+        self.metrics = PoolMetrics(self.max_connections)
+
+    def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as exc:
+            self.metrics.failed(exc)
+            raise
+        connection.checked_out_at = time.perf_counter()
+        self.metrics.checked_out((connection.checked_out_at - started) * 1000)
+        return connection
+
+    def release(self, connection):
+        checked_out_at = getattr(connection, "checked_out_at", None)
+        super().release(connection)
+        if checked_out_at is not None:
+            connection.checked_out_at = None
+            self.metrics.released((time.perf_counter() - checked_out_at) * 1000)
+
+
+class InstrumentedAsyncBlockingConnectionPool(redis.asyncio.BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics(self.max_connections)
+
+    async def get_connection(self, command_name, *keys, **options):
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as exc:
+            self.metrics.failed(exc)
+            raise
+        connection.checked_out_at = time.perf_counter()
+        self.metrics.checked_out((connection.checked_out_at - started) * 1000)
+        return connection
+
+    async def release(self, connection):
+        checked_out_at = getattr(connection, "checked_out_at", None)
+        await super().release(connection)
+        if checked_out_at is not None:
+            connection.checked_out_at = None
+            self.metrics.released((time.perf_counter() - checked_out_at) * 1000)
+
+
+def _pool_options():
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT_SECONDS,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "decode_responses": True,
+    }
+
+
+_sync_client = None
+_sync_lock = threading.Lock()
+_async_clients: dict[asyncio.AbstractEventLoop, redis.asyncio.Redis] = {}
+
+
+def get_redis():
+    global _sync_client
+    if _sync_client is None:
+        with _sync_lock:
+            if _sync_client is None:
+                pool = InstrumentedBlockingConnectionPool.from_url(
+                    settings.REDIS_URL, **_pool_options()
+                )
+                _sync_client = redis.Redis(connection_pool=pool)
+    return _sync_client
+
+
+def get_async_redis():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        for old_loop in [old_loop for old_loop in _async_clients if old_loop.is_closed()]:
+            del _async_clients[old_loop]
+        pool = InstrumentedAsyncBlockingConnectionPool.from_url(
+            settings.REDIS_URL, **_pool_options()
+        )
+        client = _async_clients[loop] = redis.asyncio.Redis(connection_pool=pool)
+    return client
+
+
+def redis_pool_metrics():
+    """Sync pool metrics and per event loop asyncio pool metrics for this process."""
+    return {
+        "sync": get_redis().connection_pool.metrics.snapshot() if _sync_client else None,
+        "async": [
+            client.connection_pool.metrics.snapshot()
+            for loop, client in list(_async_clients.items())
+            if not loop.is_closed()
+        ],
+    }
+
+
+@receiver(setting_changed)
+def reset_redis_pools(setting, **kwargs):
+    global _sync_client
+    if setting.startswith("REDIS_"):
+        _sync_client = None
+        _async_clients.clear()
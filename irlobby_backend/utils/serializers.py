@@ -0,0 +1,23 @@
+class SparseFieldsetMixin:
+    """Limit read payloads to the comma-separated ``fields`` query parameter.
+
+    ``id`` is always kept so clients can key the returned objects. Writes are
+    never affected, so the same serializer still validates full payloads.
+    """
+
+    always_included_fields = ("id",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or request.method != "GET":
+            return
+
+        requested = request.query_params.get("fields")
+        if not requested:
+            return
+
+        allowed = {name.strip() for name in requested.split(",") if name.strip()}
+        allowed.update(self.always_included_fields)
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
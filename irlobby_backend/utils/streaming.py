@@ -0,0 +1,31 @@
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_SIZE = 500
+
+
+def iter_ndjson(serializer, queryset, chunk_size=NDJSON_CHUNK_SIZE):
+    """Yield NDJSON text one database chunk at a time.
+
+    ``serializer`` is a :class:`utils.fast_serializers.FastReadSerializer`. Rows are
+    read through a server-side cursor, so memory stays bounded by ``chunk_size``.
+    """
+
+    encode = JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    lines = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        lines.append(encode(serializer.to_representation(instance)))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def ndjson_response(serializer, queryset, chunk_size=NDJSON_CHUNK_SIZE):
+    response = StreamingHttpResponse(
+        iter_ndjson(serializer, queryset, chunk_size), content_type=NDJSON_CONTENT_TYPE
+    )
+    response["Cache-Control"] = "no-store"
+    return response
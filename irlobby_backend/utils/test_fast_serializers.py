@@ -0,0 +1,143 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from activities.models import Activity, Ticket
+from activities.serializers import ActivityCardSerializer, ActivitySerializer, TicketSerializer
+from activities.views import with_confirmed_participant_count
+from chat.models import Conversation, Message
+from chat.serializers import MessageSerializer
+from matches.models import Match
+from matches.serializers import MatchSerializer
+from users.models import User
+from utils.fast_serializers import FastReadSerializer
+
+
+class AttributeSourceSerializer(serializers.Serializer):
+    title = serializers.CharField()
+    subtitle = serializers.CharField(default="untitled")
+    label = serializers.CharField(source="get_label")
+    owner_name = serializers.CharField(source="owner.get_name")
+
+
+class FastReadSerializerFallbackTests(SimpleTestCase):
+    def test_defaults_and_callable_sources_match_drf(self):
+        owner = SimpleNamespace(get_name=lambda: "Owner")
+        instances = [
+            SimpleNamespace(title="Full", subtitle="Sub", get_label=lambda: "Label", owner=owner),
+            SimpleNamespace(title="Bare", get_label=lambda: "Other", owner=owner),
+        ]
+
+        expected = AttributeSourceSerializer(instances, many=True).data
+        fast = FastReadSerializer(AttributeSourceSerializer())
+        self.assertEqual(fast.serialize_many(instances), expected)
+        self.assertEqual(expected[1]["subtitle"], "untitled")
+        self.assertEqual(expected[0]["label"], "Label")
+
+
+class FastReadSerializerParityTests(TestCase):
+    def setUp(self):
+        self.host = User.objects.create_user(
+            username="fast-host", email="fast-host@example.com", password="password123"
+        )
+        self.guest = User.objects.create_user(
+            username="fast-guest", email="fast-guest@example.com", password="password123"
+        )
+        self.activity = Activity.objects.create(
+            host=self.host,
+            is_approved=True,
+            title="Trivia Night",
+            description="Teams of four.",
+            location="The Local",
+            latitude=40.0,
+            longitude=-74.0,
+            time=timezone.now() + timedelta(days=2),
+            capacity=8,
+            price=Decimal("12.50"),
+            is_ticketed=True,
+            ticket_price=Decimal("12.50"),
+            tags=["trivia"],
+            images=[],
+        )
+        self.match = Match.objects.create(
+            user_a=self.host, user_b=self.guest, activity=self.activity
+        )
+        self.conversation = Conversation.objects.create(match=self.match)
+
+    def assertParity(self, serializer_class, instances, context=None):
+        expected = serializer_class(instances, many=True, context=context or {}).data
+        fast = FastReadSerializer(serializer_class(context=context or {}))
+        self.assertEqual(fast.serialize_many(instances), expected)
+
+    def test_activity_serializers_match_drf_output(self):
+        activities = list(with_confirmed_participant_count(Activity.objects.all()))
+
+        self.assertParity(ActivitySerializer, activities)
+        self.assertParity(ActivityCardSerializer, activities)
+
+    def test_sparse_fieldsets_are_honoured(self):
+        request = Request(APIRequestFactory().get("/", {"fields": "title,time"}))
+        activities = list(with_confirmed_participant_count(Activity.objects.all()))
+
+        self.assertParity(ActivitySerializer, activities, context={"request": request})
+        fast = FastReadSerializer(ActivitySerializer(context={"request": request}))
+        self.assertEqual(set(fast.to_representation(activities[0])), {"id", "title", "time"})
+
+    def test_ticket_serializer_matches_drf_output(self):
+        Ticket.objects.create(
+            buyer=self.guest,
+            activity=self.activity,
+            status="paid",
+            purchased_at=timezone.now(),
+            qr_code_image="ab/" + "ab" * 32 + ".png",
+        )
+        Ticket.objects.create(buyer=self.guest, activity=self.activity, status="pending")
+
+        self.assertParity(TicketSerializer, list(Ticket.objects.select_related("activity")))
+
+    def test_match_serializer_handles_null_activity(self):
+        Match.objects.create(user_a=self.guest, user_b=self.host, activity=None)
+
+        self.assertParity(MatchSerializer, list(Match.objects.order_by("id")))
+
+    def test_message_serializer_matches_drf_output(self):
+        Message.objects.create(conversation=self.conversation, sender=self.host, text="Hi!")
+        Message.objects.create(conversation=self.conversation, sender=self.guest, text="Hey")
+
+        self.assertParity(MessageSerializer, list(Message.objects.select_related("sender")))
+
+
+class FastReadListEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="fast-list", email="fast-list@example.com", password="password123"
+        )
+        Activity.objects.create(
+            host=self.user,
+            title="Hosted Draft",
+            description="Not yet approved.",
+            location="Gym",
+            latitude=1.0,
+            longitude=2.0,
+            time=timezone.now() + timedelta(days=1),
+            capacity=3,
+            tags=[],
+            images=[],
+        )
+
+    def test_hosted_list_payload_matches_drf_serializer(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("hosted-activities"))
+
+        self.assertEqual(response.status_code, 200)
+        expected = ActivitySerializer(
+            with_confirmed_participant_count(Activity.objects.filter(host=self.user)), many=True
+        ).data
+        self.assertEqual(response.json()["results"], expected)
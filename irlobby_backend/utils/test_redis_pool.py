@@ -0,0 +1,80 @@
+import redis
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from utils.redis_pool import (
+    InstrumentedBlockingConnectionPool,
+    PoolMetrics,
+    get_async_redis,
+    get_redis,
+    redis_pool_metrics,
+)
+
+
+class OfflineConnection(redis.Connection):
+    """Checks out without a server so pool accounting can be exercised."""
+
+    def connect(self):
+        pass
+
+    def can_read(self, timeout=0):
+        return False
+
+    def disconnect(self, *args):
+        pass
+
+
+class PoolMetricsTests(SimpleTestCase):
+    def test_snapshot_reports_saturation_and_latency_buckets(self):
+        metrics = PoolMetrics(max_connections=4)
+        metrics.checked_out(wait_ms=2.0)
+        metrics.checked_out(wait_ms=0.0)
+        metrics.released(held_ms=0.5)
+        metrics.released(held_ms=30.0)
+        metrics.checked_out(wait_ms=1.0)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot["inUse"], 1)
+        self.assertEqual(snapshot["peakInUse"], 2)
+        self.assertEqual(snapshot["saturation"], 0.25)
+        self.assertEqual(snapshot["waitMsAvg"], 1.0)
+        self.assertEqual(snapshot["commands"], 2)
+        self.assertEqual(snapshot["latencyMsMax"], 30.0)
+        self.assertEqual(snapshot["latencyMsBuckets"]["le1"], 1)
+        self.assertEqual(snapshot["latencyMsBuckets"]["le100"], 1)
+
+    def test_exhausted_pool_is_counted(self):
+        pool = InstrumentedBlockingConnectionPool(
+            max_connections=1, timeout=0.01, connection_class=OfflineConnection
+        )
+        connection = pool.get_connection("PING")
+        with self.assertRaises(redis.ConnectionError):
+            pool.get_connection("PING")
+        pool.release(connection)
+
+        snapshot = pool.metrics.snapshot()
+        self.assertEqual(snapshot["exhausted"], 1)
+        self.assertEqual(snapshot["checkouts"], 1)
+        self.assertEqual(snapshot["commands"], 1)
+        self.assertEqual(snapshot["inUse"], 0)
+
+
+@override_settings(REDIS_MAX_CONNECTIONS=7, REDIS_POOL_TIMEOUT_SECONDS=0.5)
+class SharedClientTests(SimpleTestCase):
+    def test_sync_client_is_shared_and_sized_from_settings(self):
+        client = get_redis()
+
+        self.assertIs(get_redis(), client)
+        self.assertEqual(client.connection_pool.max_connections, 7)
+        self.assertEqual(client.connection_pool.timeout, 0.5)
+        self.assertEqual(redis_pool_metrics()["sync"]["maxConnections"], 7)
+
+    def test_async_client_is_shared_within_an_event_loop(self):
+        async def clients():
+            return get_async_redis(), get_async_redis()
+
+        first, second = async_to_sync(clients)()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.connection_pool.max_connections, 7)
@@ -96,7 +96,7 @@ export interface Ticket {
 	status: "pending" | "paid" | "used" | "cancelled";
 	purchasedAt?: string;
 	redeemedAt?: string;
-	qrCodeDataUrl?: string;
+	qrCodeUrl?: string | null;
 	created_at: string;
 }
 